@@ -1,9 +1,113 @@
+from typing import Optional
+
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
-    cloudinary_cloud_name: str
-    cloudinary_api_key: str
-    cloudinary_api_secret: str
+    # Opcionais: sem eles só /cloudinary/signature fica indisponível (503)
+    cloudinary_cloud_name: Optional[str] = None
+    cloudinary_api_key: Optional[str] = None
+    cloudinary_api_secret: Optional[str] = None
+
+    # Banco de dados e pool de conexões
+    database_url: str = ""
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_timeout: float = 30.0
+    db_pool_recycle: int = 1800  # segundos; evita conexões derrubadas pelo proxy do Railway
+    db_pool_pre_ping: bool = True
+    db_statement_timeout_ms: Optional[int] = None
+    db_pgbouncer_mode: bool = False  # NullPool, deixando o pool para o PgBouncer
+
+    # Réplicas de leitura (opcional): rotas só de leitura usam get_read_db
+    database_replica_urls: list[str] = []  # ex.: DATABASE_REPLICA_URLS='["postgresql://replica1/db"]'
+    db_replica_health_check_interval: float = 10.0
+    db_replica_max_lag_seconds: Optional[float] = None  # só Postgres; réplica mais atrasada sai da rotação
+
+    # Geocodificação reversa (Nominatim) e cache por célula geohash
+    nominatim_url: str = "https://nominatim.openstreetmap.org/reverse"
+    nominatim_timeout: float = 10.0
+    # A política de uso do Nominatim exige um User-Agent que identifique a aplicação (com contato)
+    nominatim_user_agent: str = "travelapp-backend"
+    # Intervalo mínimo entre chamadas ao Nominatim (reverse e search), por processo
+    nominatim_min_interval_seconds: float = 1.0
+    geocode_cache_size: int = 4096
+    geocode_cache_precision: int = 6  # ~1.2km x 0.6km por célula
+    geocode_persistent_cache: bool = False  # requer a tabela geocode_cache
+    geocode_nearby_radius_km: float = 0.5  # 0 desativa a busca em fotos existentes
+    photo_batch_max_items: int = 500
+
+    # Chamadas HTTP externas (cliente assíncrono compartilhado) e threadpool das rotas síncronas
+    http_timeout: float = 10.0
+    http_max_connections: int = 100
+    http_max_keepalive_connections: int = 20
+    threadpool_size: int = 40
+
+    # Fila de jobs em background (tabela jobs) e enriquecimento assíncrono dos uploads
+    job_workers: int = 0  # 0 desativa o worker neste processo
+    job_poll_interval: float = 1.0
+    job_batch_size: int = 10
+    job_max_attempts: int = 5
+    job_retry_base_seconds: float = 5.0
+    job_lock_timeout_seconds: int = 300
+    photo_background_enrichment: bool = False
+
+    # Traduções dos nomes de cidades
+    supported_languages: list[str] = ["en", "pt", "ja", "zh"]
+    translation_provider: str = "identity"  # "identity" (offline, copia o nome) ou "nominatim"
+    translation_batch_size: int = 50
+    translations_background: bool = False  # enfileira a tradução ao criar cidades (requer worker)
+    nominatim_search_url: str = "https://nominatim.openstreetmap.org/search"
+
+    # Cache de respostas: "memory" (por processo) ou "redis" (compartilhado entre workers)
+    cache_backend: str = "memory"
+    cache_redis_url: Optional[str] = None
+    cities_cache_ttl: int = 3600
+    city_stats_max_age: int = 60  # segundos que as contagens do catálogo cacheado podem atrasar
+    # Após uma invalidação, o catálogo é reconstruído no primário por esse tempo (deve cobrir o atraso das réplicas)
+    city_catalog_primary_window: int = 30
+
+    # Índice em memória de /cities/search (por processo)
+    city_search_refresh_seconds: int = 60  # cidades novas de outros processos e contagens de fotos
+    city_search_rebuild_seconds: int = 900  # reconstrução completa (traduções alteradas por outros processos)
+    city_search_ready_timeout: float = 10.0  # espera máxima pela primeira montagem antes de responder 503
+
+    # Rate limiting por usuário/IP: "MÉTODO /caminho" -> "N/período" (second, minute, hour, day)
+    rate_limit_enabled: bool = True
+    rate_limit_backend: str = "memory"  # "memory" (por processo) ou "redis" (usa cache_redis_url)
+    # Proxies nossos na frente da API (cada um acrescenta um IP no fim do X-Forwarded-For).
+    # 1 = o proxy da hospedagem; 0 = sem proxy, usa o endereço da conexão.
+    rate_limit_trusted_proxy_hops: int = 1
+    # Requisições autenticadas usam o bucket do usuário; o do IP delas aceita este múltiplo
+    # do limite, para vários usuários atrás do mesmo NAT não dividirem uma cota só
+    rate_limit_authenticated_ip_factor: int = 10
+    rate_limits: dict[str, str] = {
+        "POST /v1/api/photos": "30/minute",
+        "POST /v1/api/photos/batch": "5/minute",
+        "POST /v1/api/cloudinary/signature": "30/minute",
+    }
+
+    # Logs: nível e formato ("text" ou "json", uma linha por evento)
+    log_level: str = "INFO"
+    log_format: str = "text"
+
+    # Verificação de ID tokens do Firebase
+    google_cloud_project: Optional[str] = None
+    firebase_service_account: Optional[str] = None  # JSON do service account; o SDK só é iniciado no primeiro uso
+    firebase_certs_url: str = "https://www.googleapis.com/robot/v1/metadata/x509/securetoken@system.gserviceaccount.com"
+    firebase_certs_file: Optional[str] = None  # JSON kid -> certificado, para rodar sem rede
+    firebase_token_cache_size: int = 10000
+
+    # users.last_login gravado em lote (write-behind) em vez de a cada /users/current
+    last_login_window_seconds: int = 60  # no máximo uma atualização por usuário nessa janela
+    last_login_flush_interval: float = 5.0
+    last_login_max_pending: int = 10000  # buffer cheio força um flush na própria requisição
+
+    # /v1/api/stats/*: só com "Authorization: Bearer <STATS_TOKEN>"; sem token configurado, 404
+    stats_token: Optional[str] = None
+
+    # Startup: aquecimento opcional antes de aceitar requisições
+    startup_warm_db_connections: int = 0  # conexões do pool abertas no startup (até db_pool_size)
+    startup_warm_firebase_keys: bool = False  # baixa as chaves públicas antes da primeira requisição
 
     class Config:
         env_file = ".env"
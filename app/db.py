@@ -1,22 +1,248 @@
-import os
-from sqlalchemy import create_engine
+import itertools
+import logging
+import threading
+import time
+from typing import Optional
+
+from sqlalchemy import create_engine, event, exc
+from sqlalchemy.engine import Engine
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
-from dotenv import load_dotenv
+from sqlalchemy.pool import NullPool, QueuePool
+
+from app.config.config import settings
+
+logger = logging.getLogger("app.db")
+
+# Lê a URL do banco a partir do .env (via Settings)
+SQLALCHEMY_DATABASE_URL = settings.database_url
+
+_pool_stats_lock = threading.Lock()
+_pool_stats = {
+    "connects": 0,
+    "checkouts": 0,
+    "checkout_timeouts": 0,
+    "checkout_wait_seconds_total": 0.0,
+    "checkout_wait_seconds_max": 0.0,
+}
+
+
+def _record_checkout(wait: float, timed_out: bool = False) -> None:
+    with _pool_stats_lock:
+        if timed_out:
+            _pool_stats["checkout_timeouts"] += 1
+        else:
+            _pool_stats["checkouts"] += 1
+        _pool_stats["checkout_wait_seconds_total"] += wait
+        _pool_stats["checkout_wait_seconds_max"] = max(_pool_stats["checkout_wait_seconds_max"], wait)
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool que mede quanto tempo cada checkout esperou por uma conexão livre."""
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            connection = super().connect()
+        except exc.TimeoutError:
+            _record_checkout(time.perf_counter() - start, timed_out=True)
+            raise
+        _record_checkout(time.perf_counter() - start)
+        return connection
+
+
+def create_db_engine(url: str):
+    """
+    Cria o engine com o pool configurado em Settings. No modo PgBouncer o pool
+    fica a cargo do PgBouncer (NullPool) e não se usam parâmetros de startup.
+    """
+    is_postgres = make_url(url).get_backend_name() == "postgresql"
+    kwargs = {}
 
-# Carrega as variáveis de ambiente do .env
-load_dotenv()
+    if settings.db_pgbouncer_mode:
+        kwargs["poolclass"] = NullPool
+    else:
+        kwargs.update(
+            poolclass=InstrumentedQueuePool,
+            pool_size=settings.db_pool_size,
+            max_overflow=settings.db_max_overflow,
+            pool_timeout=settings.db_pool_timeout,
+            pool_recycle=settings.db_pool_recycle,
+            pool_pre_ping=settings.db_pool_pre_ping,
+        )
+        if is_postgres and settings.db_statement_timeout_ms:
+            kwargs["connect_args"] = {"options": f"-c statement_timeout={settings.db_statement_timeout_ms}"}
 
-# Lê a URL do banco a partir do .env
-SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL")
+    engine = create_engine(url, **kwargs)
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        with _pool_stats_lock:
+            _pool_stats["connects"] += 1
+
+    return engine
+
+
+engine = create_db_engine(SQLALCHEMY_DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+if settings.db_pgbouncer_mode and settings.db_statement_timeout_ms:
+    # PgBouncer (transaction pooling) não repassa "options"; aplica por transação
+    @event.listens_for(SessionLocal, "after_begin")
+    def _set_statement_timeout(session, transaction, connection):
+        connection.exec_driver_sql(f"SET LOCAL statement_timeout = {int(settings.db_statement_timeout_ms)}")
+
+
+class ReplicaSet:
+    """
+    Engines das réplicas de leitura, usadas em round-robin entre as saudáveis.
+    Uma thread de fundo testa cada réplica (SELECT 1 e, no Postgres, o atraso de
+    replicação); uma conexão perdida tira a réplica da rotação na hora. Sem
+    nenhuma réplica saudável, pick() devolve None e a leitura vai para o primário.
+    """
+
+    def __init__(self, urls: list[str]):
+        self.engines = [create_db_engine(url) for url in urls]
+        self._healthy = [True] * len(self.engines)
+        self._counter = itertools.count()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        for index, replica in enumerate(self.engines):
+            self._watch_disconnects(index, replica)
+
+    def _watch_disconnects(self, index: int, replica: Engine) -> None:
+        @event.listens_for(replica, "handle_error")
+        def _on_error(context):
+            if context.is_disconnect or context.connection is None:
+                self._mark(index, False, context.original_exception)
+
+    def _mark(self, index: int, healthy: bool, reason=None) -> None:
+        if self._healthy[index] == healthy:
+            return
+        self._healthy[index] = healthy
+        url = self.engines[index].url.render_as_string(hide_password=True)
+        if healthy:
+            logger.info(f"Read replica {url} is healthy again")
+        else:
+            logger.warning(f"Read replica {url} removed from rotation: {reason}")
+
+    def pick(self) -> Optional[Engine]:
+        healthy = [replica for replica, ok in zip(self.engines, self._healthy) if ok]
+        if not healthy:
+            return None
+        return healthy[next(self._counter) % len(healthy)]
+
+    def check(self) -> None:
+        for index, replica in enumerate(self.engines):
+            try:
+                with replica.connect() as connection:
+                    connection.exec_driver_sql("SELECT 1")
+                    lag = _replication_lag(connection)
+                if settings.db_replica_max_lag_seconds is not None and lag is not None \
+                        and lag > settings.db_replica_max_lag_seconds:
+                    self._mark(index, False, f"replication lag {lag:.1f}s")
+                else:
+                    self._mark(index, True)
+            except Exception as e:
+                self._mark(index, False, e)
+
+    def start_health_checks(self) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._check_loop, name="db-replica-health", daemon=True)
+        self._thread.start()
+
+    def stop_health_checks(self) -> None:
+        self._stop.set()
+        self._thread = None
+
+    def _check_loop(self) -> None:
+        while not self._stop.is_set():
+            self.check()
+            self._stop.wait(settings.db_replica_health_check_interval)
+
+    def stats(self) -> list[dict]:
+        return [
+            {"url": replica.url.render_as_string(hide_password=True), "healthy": ok}
+            for replica, ok in zip(self.engines, self._healthy)
+        ]
+
+
+def _replication_lag(connection) -> Optional[float]:
+    # Segundos desde a última transação aplicada na réplica (None fora do Postgres ou no primário)
+    if connection.dialect.name != "postgresql":
+        return None
+    return connection.exec_driver_sql(
+        "SELECT CASE WHEN pg_is_in_recovery() "
+        "THEN EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END"
+    ).scalar()
+
+
+replicas = ReplicaSet(settings.database_replica_urls) if settings.database_replica_urls else None
+
+_read_stats = {"replica_reads": 0, "primary_reads": 0}
+
+
+def get_pool_stats() -> dict:
+    with _pool_stats_lock:
+        stats = {**_pool_stats, **_read_stats}
+    pool = engine.pool
+    if isinstance(pool, QueuePool):
+        stats.update(
+            pool_size=pool.size(),
+            checked_in=pool.checkedin(),
+            checked_out=pool.checkedout(),
+            overflow=pool.overflow(),
+        )
+    if replicas:
+        stats["replicas"] = replicas.stats()
+    return stats
+
+
+def warm_up_pool(connections: int) -> int:
+    """
+    Abre até `connections` conexões do pool (limitado a db_pool_size) e as devolve,
+    para que as primeiras requisições não paguem o connect. Retorna quantas abriu.
+    """
+    if settings.db_pgbouncer_mode or connections <= 0:
+        return 0
+    opened = []
+    try:
+        for _ in range(min(connections, settings.db_pool_size)):
+            connection = engine.connect()
+            opened.append(connection)
+            connection.exec_driver_sql("SELECT 1")
+    finally:
+        for connection in opened:
+            connection.close()
+    return len(opened)
+
+
 def get_db():
+    # A Session só pega uma conexão do pool na primeira query; rotas que
+    # respondem do cache não chegam a ocupar conexão
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+
+
+def get_read_db():
+    """
+    Session para rotas só de leitura: uma réplica saudável (round-robin) quando
+    database_replica_urls está configurado, senão o primário. Rotas que escrevem,
+    ou que precisam ler o que acabaram de escrever, continuam com get_db.
+    """
+    replica = replicas.pick() if replicas else None
+    with _pool_stats_lock:
+        _read_stats["replica_reads" if replica is not None else "primary_reads"] += 1
+    db = SessionLocal(bind=replica) if replica is not None else SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
@@ -1,8 +1,77 @@
-from fastapi import FastAPI
+import time
+
+_import_start = time.perf_counter()
+
+from contextlib import asynccontextmanager
+
+import anyio
+from fastapi import FastAPI, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from app.routers import cities, photos, users, cloudinary
+from app.routers import cities, photos, users, cloudinary, stats
+from app.config.config import settings
+from app.db import replicas, warm_up_pool
+from app.utils.firebase_utils import key_store
+from app.utils.http_utils import close_http_client
+from app.utils.logging_utils import configure_logging
+from app.utils.metrics_utils import MetricsMiddleware, render_metrics
+from app.utils.city_search import start_search_index, stop_search_index
+from app.utils.job_queue import create_worker, unconsumed_job_settings
+from app.utils.last_login_utils import LastLoginFlusher
+from app.utils.rate_limit_utils import RateLimitMiddleware
+from app.utils.response_utils import FastJSONResponse
+from app.utils import startup_utils
+
+startup_utils.mark_start(_import_start)
+startup_utils.record("imports", time.perf_counter() - _import_start)
+
+configure_logging()
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Nada de rede na importação: clientes (Firebase Admin, Cloudinary, HTTP) são
+    # criados no primeiro uso; aqui só o aquecimento opcional e os serviços de fundo
+    with startup_utils.timed("threadpool"):
+        # Limite do threadpool usado pelas rotas síncronas e pelo trabalho de banco das assíncronas
+        anyio.to_thread.current_default_thread_limiter().total_tokens = settings.threadpool_size
+    if settings.startup_warm_db_connections:
+        with startup_utils.timed("db_warm_up"):
+            await run_in_threadpool(warm_up_pool, settings.startup_warm_db_connections)
+    if replicas:
+        # Testa as réplicas já no startup e depois a cada db_replica_health_check_interval
+        replicas.start_health_checks()
+    if settings.google_cloud_project:
+        if settings.startup_warm_firebase_keys:
+            # Sem isso a primeira verificação de token espera o download das chaves
+            with startup_utils.timed("firebase_keys"):
+                await run_in_threadpool(key_store.get_certs)
+        # Chaves públicas do Firebase são baixadas/renovadas fora do caminho das requisições
+        key_store.start_background_refresh()
+    with startup_utils.timed("job_worker"):
+        worker = create_worker()
+        if worker:
+            worker.start()
+    for name in unconsumed_job_settings():
+        startup_utils.warn(
+            f"{name} is enabled but JOB_WORKERS=0: jobs stay queued unless another process runs workers"
+        )
+    # Índice de /cities/search montado em background; as buscas não esperam por ele depois do startup
+    start_search_index()
+    last_login_flusher = LastLoginFlusher(settings.last_login_flush_interval)
+    last_login_flusher.start()
+    startup_utils.mark_ready()
+    yield
+    if worker:
+        await worker.stop()
+    await last_login_flusher.stop()
+    stop_search_index()
+    key_store.stop_background_refresh()
+    if replicas:
+        replicas.stop_health_checks()
+    await close_http_client()
+
+# Respostas JSON codificadas com orjson (cai na stdlib se não estiver instalado)
+app = FastAPI(lifespan=lifespan, default_response_class=FastJSONResponse)
 
 v1_prefix = "/v1/api"
 
@@ -11,6 +80,11 @@ app.include_router(cities.router, prefix=v1_prefix, tags=["CitiesRouter"])
 app.include_router(photos.router, prefix=v1_prefix, tags=["PhotosRouter"])
 app.include_router(users.router, prefix=v1_prefix, tags=["UsersRouter"])
 app.include_router(cloudinary.router, prefix=v1_prefix, tags=["CloudinaryRouter"])
+app.include_router(stats.router, prefix=v1_prefix, tags=["StatsRouter"])
+
+# Limites por usuário/IP nas rotas caras (settings.rate_limits); adicionado antes
+# do CORS para que as respostas 429 também levem os headers de CORS
+app.add_middleware(RateLimitMiddleware)
 
 # Configurar o middleware CORS
 app.add_middleware(
@@ -19,8 +93,17 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "Link"],  # paginação das listagens
 )
 
+# Mais externo de todos: mede inclusive as respostas 429 e as de CORS
+app.add_middleware(MetricsMiddleware)
+
+# Métricas no formato do Prometheus (por worker)
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    return Response(render_metrics(), media_type="text/plain; version=0.0.4")
+
 # Rota simples de teste
 @app.get("/")
 def read_root():
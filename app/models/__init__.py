@@ -0,0 +1,3 @@
+# Importar o pacote registra todos os modelos no Base: relationship("CityStats") e
+# afins resolvem seja qual for o primeiro módulo de modelo importado
+from app.models import city, city_stats, geocode_cache, job, photo, translation_memo, user, user_provider
@@ -13,6 +13,10 @@ class City(Base):
 
     cover_photo = relationship("Photo", foreign_keys=[cover_photo_id], uselist=False)
     translations = relationship("CityTranslation", back_populates="city", cascade="all, delete-orphan")
+    stats = relationship("CityStats", uselist=False, passive_deletes=True)
+
+    # Também serve de índice para a busca por (name, country) no upload
+    __table_args__ = (UniqueConstraint("name", "country", name="uix_city_name_country"),)
 
 class CityTranslation(Base):
     __tablename__ = "city_translations"
@@ -0,0 +1,31 @@
+from sqlalchemy import Column, Integer, Float, DateTime, ForeignKey
+from sqlalchemy.sql import func
+from app.db import Base
+
+class CityStats(Base):
+    """
+    Agregados por cidade mantidos incrementalmente a cada foto criada
+    (ver city_stats_utils), para que /cities não precise varrer photos.
+    """
+    __tablename__ = "city_stats"
+
+    city_id = Column(Integer, ForeignKey("cities.id", ondelete="CASCADE"), primary_key=True)
+    photo_count = Column(Integer, nullable=False, server_default="0")
+    contributor_count = Column(Integer, nullable=False, server_default="0")
+    min_latitude = Column(Float, nullable=True)
+    max_latitude = Column(Float, nullable=True)
+    min_longitude = Column(Float, nullable=True)
+    max_longitude = Column(Float, nullable=True)
+    # Somas para o centróide (média das coordenadas das fotos)
+    sum_latitude = Column(Float, nullable=False, server_default="0")
+    sum_longitude = Column(Float, nullable=False, server_default="0")
+    # Sem índices de ordenação: /cities ordena coalesce(contagem, 0) sobre o outer join
+    # com cities, que nenhum índice daqui atende; o catálogo montado fica em cache
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+class CityContributor(Base):
+    # Um registro por (cidade, usuário): permite contar colaboradores distintos sem COUNT(DISTINCT)
+    __tablename__ = "city_contributors"
+
+    city_id = Column(Integer, ForeignKey("cities.id", ondelete="CASCADE"), primary_key=True)
+    user_id = Column(Integer, primary_key=True)
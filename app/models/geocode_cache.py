@@ -0,0 +1,12 @@
+from sqlalchemy import Column, String, DateTime
+from sqlalchemy.sql import func
+from app.db import Base
+
+class GeocodeCache(Base):
+    __tablename__ = "geocode_cache"
+
+    # Prefixo geohash da célula (precisão definida em settings.geocode_cache_precision)
+    geohash = Column(String(12), primary_key=True)
+    city = Column(String, nullable=False)
+    country = Column(String, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
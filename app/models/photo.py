@@ -1,6 +1,11 @@
-from sqlalchemy import Column, Integer, String, Float
+from sqlalchemy import Column, Integer, String, Float, Index
 from app.db import Base
 
+# Fotos enviadas com enriquecimento em background ficam "pending" até o worker resolver a cidade
+PHOTO_PENDING = "pending"
+PHOTO_RESOLVED = "resolved"
+PHOTO_FAILED = "failed"
+
 class Photo(Base):
     __tablename__ = "photos"
 
@@ -10,3 +15,13 @@ class Photo(Base):
     latitude = Column(Float, nullable=False)
     longitude = Column(Float, nullable=False)
     user_id = Column(Integer, nullable=True)
+    geohash = Column(String(12), nullable=True)  # preenchido na criação (ver geo_utils)
+    status = Column(String(20), nullable=False, default=PHOTO_RESOLVED, server_default=PHOTO_RESOLVED)
+
+    __table_args__ = (
+        # text_pattern_ops permite usar o índice em "geohash LIKE 'prefixo%'" no Postgres
+        Index("ix_photos_geohash", "geohash", postgresql_ops={"geohash": "text_pattern_ops"}),
+        Index("ix_photos_lat_lon", "latitude", "longitude"),
+        # Paginação por cursor em /photos/by_city: WHERE city_id = ? AND id > ? ORDER BY id
+        Index("ix_photos_city_id_id", "city_id", "id"),
+    )
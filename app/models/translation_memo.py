@@ -0,0 +1,17 @@
+from sqlalchemy import Column, Integer, String, DateTime, UniqueConstraint
+from sqlalchemy.sql import func
+from app.db import Base
+
+class TranslationMemo(Base):
+    """Traduções já obtidas do provedor, reaproveitadas entre cidades e reprocessamentos."""
+    __tablename__ = "translation_memo"
+
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String, nullable=False)
+    country = Column(String, nullable=False)
+    language = Column(String, nullable=False)
+    translated_name = Column(String, nullable=False)
+    provider = Column(String(50), nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (UniqueConstraint("name", "country", "language", name="uix_translation_memo_key"),)
@@ -1,35 +1,91 @@
-from fastapi import APIRouter, Depends, Query
-from sqlalchemy.orm import Session, joinedload
-from app.db import get_db
-from app.models.city import City
-from app.schemas.city import CityResponse, TranslationResponse
+from itertools import groupby
+from typing import Optional, Union
+
+from fastapi import APIRouter, Depends, Header, Query, Response
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from app.db import get_read_db
+from app.models.city import City, CityTranslation
+from app.models.photo import Photo
+from app.schemas.city import CityResponse, CitySearchResult, LocalizedCityResponse
+from app.utils.cloudinary_utils import VariantSet
+from app.utils.city_catalog import CitySort, etag_matches, get_city_catalog
+from app.utils.city_search import search_cities
+from app.utils.language_utils import negotiate_language
+from app.utils.response_utils import FastJSONResponse
+from app.utils.streaming_utils import ExportFormat, export_response
 
 router = APIRouter()
 
-@router.get("/cities", response_model=list[CityResponse])
+@router.get("/cities", response_model=Union[list[LocalizedCityResponse], list[CityResponse]])
 def get_all_cities(
-    db: Session = Depends(get_db)
+    lang: Optional[str] = Query(None, description="Idioma da resposta (ex: pt, ja); 'all' traz todas as traduções"),
+    variants: Optional[VariantSet] = Query(None, description="URLs redimensionadas da capa: map, grid, detail, all"),
+    sort: Optional[CitySort] = Query(None, description="name, photo_count ou contributor_count (decrescente)"),
+    accept_language: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_read_db)
+):
+    # Com ?lang= ou Accept-Language, cada cidade vem só com o nome no idioma resolvido
+    language = negotiate_language(lang, accept_language)
+
+    # O catálogo só muda quando uma cidade é criada ou ganha foto de capa,
+    # então é servido já serializado a partir do cache
+    body, etag = get_city_catalog(db, language, variants, sort)
+    headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept-Language"}
+
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+
+    if language:
+        headers["Content-Language"] = language
+    return Response(content=body, media_type="application/json", headers=headers)
+
+@router.get("/cities/search", response_model=list[CitySearchResult])
+def search_cities_endpoint(
+    q: str = Query(..., min_length=1, max_length=100, description="Começo do nome, em qualquer idioma (sem acentos também)"),
+    lang: Optional[str] = Query(None, description="Idioma de display_name (ex: pt, ja)"),
+    limit: int = Query(10, ge=1, le=50),
+    accept_language: Optional[str] = Header(None)
 ):
-    # Carregar todas as cidades, incluindo as traduções e as fotos
-    cities = db.query(City).options(joinedload(City.cover_photo), joinedload(City.translations)).all()
-
-    result = []
-
-    for city in cities:
-        # Criar uma lista de traduções para a cidade
-        translations = [
-            TranslationResponse(language=t.language, translated_name=t.translated_name)
-            for t in city.translations
-        ]
-        
-        result.append(
-            CityResponse(
-                id=city.id,
-                name=city.name,
-                country=city.country,
-                cover_photo_url=city.cover_photo.image_url if city.cover_photo else None,
-                translations=translations  # Retornando todas as traduções
-            )
+    """
+    Autocomplete de cidades: casa prefixos de nome, país e traduções (CJK inclusive),
+    ignorando acentos e tolerando um erro de digitação. As mais fotografadas vêm primeiro.
+    """
+    language = negotiate_language(lang, accept_language)
+    return FastJSONResponse(search_cities(q, language, limit))
+
+@router.get("/cities/export")
+def export_cities(format: ExportFormat = "ndjson"):
+    """Exporta todas as cidades (com capa e traduções) em streaming."""
+    # Uma linha por tradução, ordenada por cidade; o agrupamento é feito enquanto lê
+    statement = (
+        select(
+            City.id,
+            City.name,
+            City.country,
+            Photo.image_url,
+            CityTranslation.language,
+            CityTranslation.translated_name,
         )
-    
-    return result
+        .outerjoin(Photo, Photo.id == City.cover_photo_id)
+        .outerjoin(CityTranslation, CityTranslation.city_id == City.id)
+        .order_by(City.id, CityTranslation.language)
+    )
+    return export_response(statement, format, _group_city_rows)
+
+def _group_city_rows(rows):
+    for city_id, city_rows in groupby(rows, key=lambda row: row.id):
+        city_rows = list(city_rows)
+        first = city_rows[0]
+        yield {
+            "id": city_id,
+            "name": first.name,
+            "country": first.country,
+            "cover_photo_url": first.image_url,
+            "translations": [
+                {"language": row.language, "translated_name": row.translated_name}
+                for row in city_rows
+                if row.language is not None
+            ],
+        }
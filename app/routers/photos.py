@@ -1,120 +1,410 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from app.db import get_db
-from app.models.photo import Photo
-from app.models.city import City, CityTranslation
-from app.schemas.photo import PhotoResponse, PhotoCreate
-import httpx  # for external calls
+import logging
 from typing import Optional
 
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import func, insert, or_, select
+from sqlalchemy.orm import Session
+from app.db import get_db, get_read_db
+from app.models.photo import Photo, PHOTO_PENDING
+from app.config.config import settings
+from app.schemas.photo import (
+    PhotoBatchCreate,
+    PhotoBatchItemResult,
+    PhotoBatchResponse,
+    PhotoCluster,
+    PhotoCreate,
+    PhotoDistanceResponse,
+    PhotoResponse,
+)
+from app.utils.city_catalog import invalidate_city_catalog, mark_city_stats_changed
+from app.utils.city_search import mark_cities_changed
+from app.utils.city_stats_utils import record_photos
+from app.utils.cloudinary_utils import VariantSet, build_variant_urls
+from app.utils.city_utils import get_or_create_city, get_or_create_cities, set_city_cover_if_missing
+from app.utils.geocoding_utils import geocode_cell, get_city_and_country, resolve_cells
+from app.utils.pagination_utils import keyset_page, page_headers, parse_fields
+from app.utils.photo_tasks import enqueue_photo_resolution
+from app.utils.response_utils import FastJSONResponse, rows_response
+from app.utils.streaming_utils import ExportFormat, export_response
+from app.utils.geo_utils import (
+    PHOTO_GEOHASH_PRECISION,
+    approx_distance_sq,
+    geohash_cell_size_km,
+    geohash_encode,
+    geohash_neighbors,
+    geohash_precision_for_zoom,
+    haversine_km,
+)
+
+logger = logging.getLogger("app.routers.photos")
+
 router = APIRouter()
 
+PHOTO_FIELDS = ("id", "image_url", "city_id", "latitude", "longitude", "user_id", "status")
+
 @router.get("/photos/by_city/{city_id}", response_model=list[PhotoResponse])
-def get_photos_by_city(city_id: int, db: Session = Depends(get_db)):
-    print(f"Fetching photos for city_id: {city_id}")
-    photos = db.query(Photo).filter(Photo.city_id == city_id).all()
+def get_photos_by_city(
+    request: Request,
+    city_id: int,
+    limit: Optional[int] = Query(None, ge=1, le=1000, description="Pagina o resultado; a próxima página vem no header X-Next-Cursor"),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = Query(None, description="Ex: id,image_url"),
+    variants: Optional[VariantSet] = Query(None, description="URLs redimensionadas: map, grid, detail, all"),
+    db: Session = Depends(get_read_db)
+):
+    columns = [getattr(Photo, f) for f in parse_fields(fields, PHOTO_FIELDS)]
+    query = db.query(*columns).filter(Photo.city_id == city_id)
+    items, next_cursor = keyset_page(query, Photo.id, cursor, limit)
+    if variants:
+        for item in items:
+            if "image_url" in item:
+                item["variants"] = build_variant_urls(item["image_url"], variants)
 
-    if not photos:
-        print(f"No photos found for city_id: {city_id}")
+    if not items and cursor is None:
+        logger.debug("No photos found for city", extra={"city_id": city_id})
         raise HTTPException(status_code=404, detail="No photos found for this city.")
 
-    print(f"Found {len(photos)} photos for city_id: {city_id}")
-    return [
-        PhotoResponse.from_orm(photo)
-        for photo in photos
-    ]
+    logger.debug("Fetched photos for city", extra={"city_id": city_id, "count": len(items)})
+    return rows_response(items, headers=page_headers(request, next_cursor))
+
+@router.get("/photos/by_city/{city_id}/export")
+def export_photos_by_city(city_id: int, format: ExportFormat = "ndjson"):
+    """Exporta todas as fotos da cidade em streaming (NDJSON ou array JSON)."""
+    statement = (
+        select(*[getattr(Photo, f) for f in PHOTO_FIELDS])
+        .where(Photo.city_id == city_id)
+        .order_by(Photo.id)
+    )
+    return export_response(statement, format)
+
+@router.get("/photos/within", response_model=list[PhotoDistanceResponse])
+def get_photos_within_bbox(
+    min_lat: float = Query(..., ge=-90, le=90),
+    min_lon: float = Query(..., ge=-180, le=180),
+    max_lat: float = Query(..., ge=-90, le=90),
+    max_lon: float = Query(..., ge=-180, le=180),
+    limit: int = Query(100, ge=1, le=500),
+    offset: int = Query(0, ge=0),
+    variants: Optional[VariantSet] = Query(None, description="URLs redimensionadas: map, grid, detail, all"),
+    db: Session = Depends(get_read_db)
+):
+    """
+    Fotos dentro do retângulo visível do mapa, ordenadas pela distância ao centro.
+    min_lon > max_lon indica um retângulo que cruza o antimeridiano.
+    """
+    if min_lat > max_lat:
+        raise HTTPException(status_code=400, detail="min_lat must be less than or equal to max_lat")
+
+    center_lat = (min_lat + max_lat) / 2
+    if min_lon <= max_lon:
+        center_lon = (min_lon + max_lon) / 2
+        lon_filter = Photo.longitude.between(min_lon, max_lon)
+    else:
+        center_lon = ((min_lon + max_lon + 360) / 2 + 180) % 360 - 180
+        lon_filter = or_(Photo.longitude >= min_lon, Photo.longitude <= max_lon)
+
+    photos = (
+        db.query(Photo)
+        .filter(Photo.latitude.between(min_lat, max_lat), lon_filter)
+        .order_by(_approx_distance(center_lat, center_lon), Photo.id)
+        .offset(offset)
+        .limit(limit)
+        .all()
+    )
+    return FastJSONResponse([_with_distance(photo, center_lat, center_lon, variants) for photo in photos])
+
+@router.get("/photos/clusters", response_model=list[PhotoCluster])
+def get_photo_clusters(
+    bbox: str = Query(..., description="min_lon,min_lat,max_lon,max_lat"),
+    zoom: int = Query(..., ge=0, le=22),
+    limit: int = Query(1000, ge=1, le=5000),
+    variants: Optional[VariantSet] = Query(None, description="URLs redimensionadas: map, grid, detail, all"),
+    db: Session = Depends(get_read_db)
+):
+    """
+    Marcadores agrupados para o mapa: as fotos do retângulo são agregadas no banco
+    por prefixo geohash (precisão derivada do zoom), com contagem, centróide e uma
+    foto de amostra por grupo. Os grupos mais populosos vêm primeiro.
+    """
+    try:
+        min_lon, min_lat, max_lon, max_lat = (float(v) for v in bbox.split(","))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="bbox must be min_lon,min_lat,max_lon,max_lat")
+    if not (-90 <= min_lat <= max_lat <= 90 and -180 <= min_lon <= 180 and -180 <= max_lon <= 180):
+        raise HTTPException(status_code=400, detail="bbox out of range")
+
+    if min_lon <= max_lon:
+        lon_filter = Photo.longitude.between(min_lon, max_lon)
+    else:
+        # Retângulo cruzando o antimeridiano
+        lon_filter = or_(Photo.longitude >= min_lon, Photo.longitude <= max_lon)
+
+    cell = func.substr(Photo.geohash, 1, geohash_precision_for_zoom(zoom)).label("cell")
+    count = func.count().label("count")
+    clusters = db.execute(
+        select(
+            cell,
+            count,
+            func.avg(Photo.latitude).label("latitude"),
+            func.avg(Photo.longitude).label("longitude"),
+            func.min(Photo.id).label("sample_id"),
+        )
+        .where(Photo.latitude.between(min_lat, max_lat), lon_filter, Photo.geohash.is_not(None))
+        .group_by(cell)
+        .order_by(count.desc(), cell)
+        .limit(limit)
+    ).all()
+
+    sample_ids = [c.sample_id for c in clusters]
+    samples = {photo.id: photo for photo in db.query(Photo).filter(Photo.id.in_(sample_ids))} if sample_ids else {}
+
+    return FastJSONResponse([
+        {
+            "geohash": c.cell,
+            "count": c.count,
+            "latitude": c.latitude,
+            "longitude": c.longitude,
+            "sample": _photo_dict(samples[c.sample_id], variants),
+        }
+        for c in clusters
+    ])
+
+@router.get("/photos/nearest", response_model=list[PhotoDistanceResponse])
+def get_nearest_photos(
+    lat: float = Query(..., ge=-90, le=90),
+    lon: float = Query(..., ge=-180, le=180),
+    limit: int = Query(20, ge=1, le=200),
+    offset: int = Query(0, ge=0),
+    max_distance_km: Optional[float] = Query(None, gt=0),
+    variants: Optional[VariantSet] = Query(None, description="URLs redimensionadas: map, grid, detail, all"),
+    db: Session = Depends(get_read_db)
+):
+    """
+    N fotos mais próximas do ponto. Busca na célula geohash do ponto e nas 8 vizinhas
+    (índice ix_photos_geohash), reduzindo a precisão até que o resultado seja exato.
+    """
+    needed = offset + limit
+    photos = []
+
+    for precision in range(7, 0, -1):
+        cell = geohash_encode(lat, lon, precision)
+        height_km, width_km = geohash_cell_size_km(cell)
+        # Qualquer ponto a menos desta distância está dentro do bloco 3x3 de células
+        covered_km = min(height_km, width_km)
+
+        photos = (
+            db.query(Photo)
+            .filter(or_(*[Photo.geohash.like(f"{prefix}%") for prefix in geohash_neighbors(cell)]))
+            .order_by(_approx_distance(lat, lon), Photo.id)
+            .limit(needed)
+            .all()
+        )
+
+        if max_distance_km is not None and covered_km >= max_distance_km:
+            break
+        if len(photos) >= needed and haversine_km(lat, lon, photos[-1].latitude, photos[-1].longitude) <= covered_km:
+            break
+    else:
+        if max_distance_km is None and len(photos) < needed:
+            # Ponto muito isolado: nem o bloco de precisão 1 basta, ordena a tabela toda
+            photos = db.query(Photo).order_by(_approx_distance(lat, lon), Photo.id).limit(needed).all()
+
+    results = [_with_distance(photo, lat, lon, variants) for photo in photos[offset:]]
+    if max_distance_km is not None:
+        results = [r for r in results if r["distance_km"] <= max_distance_km]
+    results.sort(key=lambda r: (r["distance_km"], r["id"]))
+    return FastJSONResponse(results)
 
 @router.post("/photos", response_model=PhotoResponse)
-def create_photo(photo_data: PhotoCreate, db: Session = Depends(get_db)):
-    print(f"Starting photo creation process for coordinates: ({photo_data.latitude}, {photo_data.longitude})")
-    city_name, country_name = get_city_and_country(photo_data.latitude, photo_data.longitude)
-    print(f"Got city and country from API: city='{city_name}', country='{country_name}'")
+async def create_photo(photo_data: PhotoCreate, response: Response, db: Session = Depends(get_db)):
+    # Rota assíncrona: a espera pelo Nominatim não ocupa uma thread do pool;
+    # só o trabalho no banco vai para o threadpool
+    if settings.photo_background_enrichment:
+        # Aceita já e deixa geocoding, cidade e capa para o worker (status "pending")
+        response.status_code = 202
+        return await run_in_threadpool(_save_pending_photo, db, photo_data)
+    location = await get_city_and_country(photo_data.latitude, photo_data.longitude, db)
 
-    if not city_name or not country_name:
-        print("City or country not found for given coordinates")
+    if not location:
+        logger.info(
+            "City or country not found for given coordinates",
+            extra={"latitude": photo_data.latitude, "longitude": photo_data.longitude}
+        )
         raise HTTPException(status_code=400, detail="City not found for given coordinates")
 
-    city = db.query(City).filter(
-        City.name == city_name,
-        City.country == country_name
-    ).first()
-
-    if not city:
-        print(f"City '{city_name}' in country '{country_name}' not found in DB. Creating new city.")
-        # Cria cidade sem cover_photo_id
-        city = City(name=city_name, country=country_name, cover_photo_id=None)
-        db.add(city)
-        db.commit()
-        db.refresh(city)
-        print(f"Created city with ID: {city.id}")
-
-        # Criar traduções da cidade
-        translations = create_city_translations(city_name, city.id)
-        db.add_all(translations)
-        db.commit()
-        print(f"Created {len(translations)} translations for city ID {city.id}")
-    else:
-        print(f"City found in DB with ID: {city.id}")
-
-    # Cria foto vinculada à cidade
-    new_photo = Photo(
-        image_url=photo_data.image_url,
-        latitude=photo_data.latitude,
-        longitude=photo_data.longitude,
-        city_id=city.id,
-        user_id=photo_data.user_id
+    city_name, country_name = location
+    logger.debug("Resolved city and country", extra={"city": city_name, "country": country_name})
+
+    return await run_in_threadpool(_save_photo, db, photo_data, city_name, country_name)
+
+@router.post("/photos/batch", response_model=PhotoBatchResponse)
+async def create_photos_batch(batch: PhotoBatchCreate, db: Session = Depends(get_db)):
+    """
+    Upload de um álbum inteiro. Coordenadas são agrupadas por célula geohash (uma
+    geocodificação por célula), cidades faltantes são criadas em lote e as fotos
+    entram num único INSERT de várias linhas. Retorna o status de cada item.
+    """
+    if not batch.items:
+        raise HTTPException(status_code=400, detail="Batch must contain at least one photo")
+    if len(batch.items) > settings.photo_batch_max_items:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch too large: at most {settings.photo_batch_max_items} photos per request"
+        )
+
+    cells = [geocode_cell(item.latitude, item.longitude) for item in batch.items]
+    points = {}
+    for cell, item in zip(cells, batch.items):
+        points.setdefault(cell, (item.latitude, item.longitude))
+
+    locations = await resolve_cells(points, db)
+    logger.debug("Resolved photo batch cells", extra={"photos": len(batch.items), "cells": len(points)})
+
+    results = [None] * len(batch.items)
+    resolved = []
+    for index, (cell, item) in enumerate(zip(cells, batch.items)):
+        location = locations.get(cell)
+        if location:
+            resolved.append((index, item, location))
+        else:
+            results[index] = PhotoBatchItemResult(
+                index=index, status="failed", error="City not found for given coordinates"
+            )
+
+    if resolved:
+        try:
+            saved = await run_in_threadpool(_save_photo_batch, db, resolved)
+        except Exception as e:
+            await run_in_threadpool(db.rollback)
+            logger.exception("Error saving photo batch", extra={"photos": len(resolved)})
+            saved = {
+                index: PhotoBatchItemResult(index=index, status="failed", error="Error saving photo")
+                for index, _, _ in resolved
+            }
+        for index, result in saved.items():
+            results[index] = result
+
+    created = sum(1 for r in results if r.status == "created")
+    return PhotoBatchResponse(created=created, failed=len(results) - created, results=results)
+
+def _save_photo_batch(db: Session, resolved: list) -> dict[int, PhotoBatchItemResult]:
+    cities = get_or_create_cities(db, {location for _, _, location in resolved})
+
+    rows = []
+    for _, item, location in resolved:
+        rows.append({
+            "image_url": item.image_url,
+            "latitude": item.latitude,
+            "longitude": item.longitude,
+            "city_id": cities[location][0],
+            "user_id": item.user_id,
+            "geohash": geohash_encode(item.latitude, item.longitude, PHOTO_GEOHASH_PRECISION),
+        })
+
+    # Multi-row INSERT; sort_by_parameter_order garante o RETURNING na ordem dos itens
+    photos = db.execute(
+        insert(Photo).returning(*[getattr(Photo, f) for f in PHOTO_FIELDS], sort_by_parameter_order=True),
+        rows
+    ).all()
+
+    # Primeira foto de cada cidade sem capa vira a capa
+    has_cover = {city_id: has for city_id, has, _ in cities.values()}
+    covers = {}
+    for photo in photos:
+        if not has_cover[photo.city_id] and photo.city_id not in covers:
+            covers[photo.city_id] = photo.id
+    for city_id, photo_id in covers.items():
+        set_city_cover_if_missing(db, city_id, photo_id)
+    record_photos(db, [(p.city_id, p.user_id, p.latitude, p.longitude) for p in photos])
+
+    db.commit()
+    logger.info("Created photo batch", extra={"photos": len(photos)})
+    mark_city_stats_changed()
+
+    created_cities = [city_id for city_id, _, created in cities.values() if created]
+    if created_cities:
+        mark_cities_changed(created_cities)
+    if covers or created_cities:
+        invalidate_city_catalog()
+
+    return {
+        index: PhotoBatchItemResult(index=index, status="created", photo=PhotoResponse(**photo._asdict()))
+        for (index, _, _), photo in zip(resolved, photos)
+    }
+
+def _save_pending_photo(db: Session, photo_data: PhotoCreate) -> PhotoResponse:
+    statement = (
+        insert(Photo)
+        .values(
+            image_url=photo_data.image_url,
+            latitude=photo_data.latitude,
+            longitude=photo_data.longitude,
+            city_id=None,
+            user_id=photo_data.user_id,
+            geohash=geohash_encode(photo_data.latitude, photo_data.longitude, PHOTO_GEOHASH_PRECISION),
+            status=PHOTO_PENDING
+        )
+        .returning(*[getattr(Photo, f) for f in PHOTO_FIELDS])
     )
-    db.add(new_photo)
+    new_photo = db.execute(statement).one()
+    # Job na mesma transação: ou a foto e o job existem, ou nenhum dos dois
+    enqueue_photo_resolution(db, new_photo.id)
     db.commit()
-    db.refresh(new_photo)
-    print(f"Created photo with ID: {new_photo.id} for city ID: {city.id}")
+    logger.info("Accepted photo, location pending", extra={"photo_id": new_photo.id})
+    return PhotoResponse(**new_photo._asdict())
+
+def _save_photo(db: Session, photo_data: PhotoCreate, city_name: str, country_name: str) -> PhotoResponse:
+    # Cidade, traduções, foto e capa numa única transação, com um só commit
+    city_id, has_cover, city_created = get_or_create_city(db, city_name, country_name)
+
+    statement = (
+        insert(Photo)
+        .values(
+            image_url=photo_data.image_url,
+            latitude=photo_data.latitude,
+            longitude=photo_data.longitude,
+            city_id=city_id,
+            user_id=photo_data.user_id,
+            geohash=geohash_encode(photo_data.latitude, photo_data.longitude, PHOTO_GEOHASH_PRECISION)
+        )
+        .returning(*[getattr(Photo, f) for f in PHOTO_FIELDS])
+    )
+    new_photo = db.execute(statement).one()
 
     # Atualiza cover_photo_id da cidade com o id da foto recém criada, se estiver nulo
-    if city.cover_photo_id is None:
-        city.cover_photo_id = new_photo.id
-        db.commit()
-        db.refresh(city)
-        print(f"Updated city ID {city.id} cover_photo_id to photo ID {new_photo.id}")
-
-    return PhotoResponse.from_orm(new_photo)
-
-
-def create_city_translations(city_name: str, city_id: int) -> list[CityTranslation]:
-    print(f"Creating translations for city '{city_name}' (ID: {city_id})")
-    languages = ["en", "pt", "ja", "zh"]
-    translations = []
-
-    # Para todas as línguas, salva o nome em inglês mesmo
-    for lang in languages:
-        translations.append(CityTranslation(city_id=city_id, language=lang, translated_name=city_name))
-
-    print(f"Translations created: {[t.language for t in translations]}")
-    return translations
-
-def get_city_and_country(latitude: float, longitude: float) -> Optional[tuple[str, str]]:
-    print(f"Fetching city and country for lat={latitude}, lon={longitude} from Nominatim API")
-    url = "https://nominatim.openstreetmap.org/reverse"
-    params = {
-        "lat": latitude,
-        "lon": longitude,
-        "format": "json",
-        "accept-language": "en"  # idioma inglês
-    }
+    cover_updated = not has_cover and set_city_cover_if_missing(db, city_id, new_photo.id)
+    record_photos(db, [(city_id, new_photo.user_id, new_photo.latitude, new_photo.longitude)])
 
-    try:
-        response = httpx.get(url, params=params, timeout=10)
-        response.raise_for_status()
-        data = response.json()
+    db.commit()
+    logger.info("Created photo", extra={"photo_id": new_photo.id, "city_id": city_id})
+    mark_city_stats_changed()
 
-        address = data.get("address", {})
-        city = address.get("city") or address.get("town") or address.get("village")
-        country = address.get("country")
+    if city_created:
+        mark_cities_changed([city_id])
+    if city_created or cover_updated:
+        invalidate_city_catalog()
 
-        print(f"Received address info: city='{city}', country='{country}'")
+    return PhotoResponse(**new_photo._asdict())
 
-        if city and country:
-            return city, country
-    except Exception as e:
-        print(f"Error fetching city and country: {e}")
 
-    return None
+def _approx_distance(latitude: float, longitude: float):
+    return approx_distance_sq(Photo.latitude, Photo.longitude, latitude, longitude)
+
+def _photo_dict(photo: Photo, variants: Optional[str] = None) -> dict:
+    # Mesmo formato de PhotoResponse, montado direto para FastJSONResponse
+    return {
+        "id": photo.id,
+        "image_url": photo.image_url,
+        "city_id": photo.city_id,
+        "latitude": photo.latitude,
+        "longitude": photo.longitude,
+        "user_id": photo.user_id,
+        "status": photo.status,
+        "variants": build_variant_urls(photo.image_url, variants),
+    }
+
+def _with_distance(photo: Photo, latitude: float, longitude: float, variants: Optional[str] = None) -> dict:
+    item = _photo_dict(photo, variants)
+    item["distance_km"] = round(haversine_km(latitude, longitude, photo.latitude, photo.longitude), 4)
+    return item
@@ -0,0 +1,40 @@
+from fastapi import APIRouter, Depends
+from app.db import get_pool_stats
+from app.utils.firebase_utils import get_token_cache_stats
+from app.utils.geocoding_utils import get_geocode_stats
+from app.utils.last_login_utils import get_last_login_stats
+from app.utils.metrics_utils import require_stats_token
+from app.utils.rate_limit_utils import get_rate_limit_stats
+from app.utils.startup_utils import get_startup_report
+
+router = APIRouter(dependencies=[Depends(require_stats_token)])
+
+@router.get("/stats/geocode")
+def get_geocode_cache_stats():
+    # Contadores de acerto/erro do cache de geocodificação reversa (por worker)
+    return get_geocode_stats()
+
+@router.get("/stats/firebase-tokens")
+def get_firebase_token_cache_stats():
+    # Taxa de acerto do cache de ID tokens e tempo gasto na verificação
+    return get_token_cache_stats()
+
+@router.get("/stats/db-pool")
+def get_db_pool_stats():
+    # Checkouts, espera por conexão livre e ocupação atual do pool
+    return get_pool_stats()
+
+@router.get("/stats/rate-limit")
+def get_rate_limit_counters():
+    # Requisições permitidas/rejeitadas por rota limitada (por worker)
+    return get_rate_limit_stats()
+
+@router.get("/stats/startup")
+def get_startup_stats():
+    # Tempo de cada fase do startup deste worker (imports, aquecimento, worker de jobs)
+    return get_startup_report()
+
+@router.get("/stats/last-login")
+def get_last_login_counters():
+    # Logins registrados, descartados pela janela e gravados em lote (por worker)
+    return get_last_login_stats()
@@ -1,14 +1,13 @@
-import json
-import os
+import logging
 from datetime import datetime
+from typing import Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Header
+from fastapi import APIRouter, Depends, HTTPException, Header, Query, Request
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from dotenv import load_dotenv
 
-from app.db import get_db
+from app.db import get_db, get_read_db
 from app.models.user import User
-from app.models.user_provider import UserProvider
 from app.schemas.user import (
     UserResponse,
     UserCreate,
@@ -17,33 +16,13 @@ from app.schemas.user import (
     UserByFirebaseResponse,
     UserUpdateRequest
 )
-from app.schemas.user_provider import UserProviderCreate
-
-import firebase_admin
-from firebase_admin import credentials, auth as firebase_auth
-import logging
+from app.utils.firebase_utils import verify_id_token
+from app.utils.last_login_utils import record_login
+from app.utils.pagination_utils import keyset_page, page_headers, parse_fields
+from app.utils.response_utils import rows_response
+from app.utils.user_utils import insert_user, raise_for_unique_violation
 
-# Configura logging
 logger = logging.getLogger("app.routers.users")
-logging.basicConfig(level=logging.INFO)
-
-# Carrega variáveis do .env
-load_dotenv()
-FIREBASE_SERVICE_ACCOUNT = os.environ.get("FIREBASE_SERVICE_ACCOUNT")
-GOOGLE_CLOUD_PROJECT = os.environ.get("GOOGLE_CLOUD_PROJECT")
-
-# Inicializa Firebase Admin SDK com service account
-if not firebase_admin._apps:
-    if FIREBASE_SERVICE_ACCOUNT:
-        try:
-            cred_dict = json.loads(FIREBASE_SERVICE_ACCOUNT)
-            cred = credentials.Certificate(cred_dict)
-            firebase_admin.initialize_app(cred, {"projectId": GOOGLE_CLOUD_PROJECT})
-            logger.info("Firebase Admin initialized successfully")
-        except Exception as e:
-            logger.error(f"Failed to initialize Firebase Admin: {str(e)}")
-    else:
-        logger.error("FIREBASE_SERVICE_ACCOUNT is not set in environment variables")
 
 router = APIRouter()
 
@@ -51,12 +30,21 @@ router = APIRouter()
 # Endpoints
 # ---------------------------
 
+USER_FIELDS = ("id", "username", "email", "name")
+
 @router.get("/users", response_model=list[UserResponse])
-def get_users(db: Session = Depends(get_db)):
-    users = db.query(User).all()
-    if not users:
+def get_users(
+    request: Request,
+    limit: Optional[int] = Query(None, ge=1, le=1000, description="Pagina o resultado; a próxima página vem no header X-Next-Cursor"),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = Query(None, description="Ex: id,username"),
+    db: Session = Depends(get_read_db)
+):
+    columns = [getattr(User, f) for f in parse_fields(fields, USER_FIELDS)]
+    items, next_cursor = keyset_page(db.query(*columns), User.id, cursor, limit)
+    if not items and cursor is None:
         raise HTTPException(status_code=404, detail="No users found.")
-    return [UserResponse(id=u.id, username=u.username, email=u.email) for u in users]
+    return rows_response(items, headers=page_headers(request, next_cursor))
 
 @router.get("/users/check-email", response_model=EmailCheckResponse)
 def check_email_exists(email: str, db: Session = Depends(get_db)):
@@ -87,64 +75,43 @@ def create_user_from_firebase(
     id_token = authorization.split("Bearer ")[1]
 
     try:
-        decoded_token = firebase_auth.verify_id_token(id_token)
+        decoded_token = verify_id_token(id_token)
         firebase_uid = decoded_token["uid"]  # UID confiável do token
         logger.info(f"Firebase ID token verified for UID: {firebase_uid}")
     except Exception as e:
         logger.error(f"Failed to verify Firebase ID token: {str(e)}")
         raise HTTPException(status_code=401, detail=f"Invalid Firebase ID token: {str(e)}")
 
-    existing_user = db.query(User).filter(User.firebase_uid == firebase_uid).first()
-    if existing_user:
-        logger.warning(f"Firebase UID already exists: {firebase_uid}")
-        raise HTTPException(status_code=400, detail="Firebase UID already exists")
-
-    existing_email = db.query(User).filter(User.email == user_data.email).first()
-    if existing_email:
-        logger.warning(f"Email already exists: {user_data.email}")
-        raise HTTPException(status_code=400, detail="Email already exists")
-
-    username = user_data.username
-    if not username or username.strip() == "":
-        username = f"user_{firebase_uid[:6]}"
-        logger.info(f"No username provided, generated provisional username: {username}")
-
-    if db.query(User).filter(User.username == username).first():
-        logger.warning(f"Generated username already exists: {username}")
-        raise HTTPException(status_code=400, detail="Generated username already exists, try again")
-
+    # Sem SELECTs prévios: os índices únicos de users decidem (ver user_utils.insert_user).
+    # Sem username informado, gera "user_<uid>" e tenta com sufixo se já existir
     try:
-        new_user = User(
-            firebase_uid=firebase_uid,
+        user_id, username = insert_user(
+            db,
             email=user_data.email,
-            username=username,
-            last_login=datetime.utcnow()
-        )
-        db.add(new_user)
-        db.flush()
-        logger.info(f"User object added to session: {username}")
-
-        user_provider = UserProvider(
-            user_id=new_user.id,
+            username=user_data.username,
+            username_base=f"user_{firebase_uid[:6]}",
+            firebase_uid=firebase_uid,
             provider=user_data.provider,
-            provider_uid=firebase_uid
+            name=user_data.name,
+            last_login=datetime.utcnow()
         )
-        db.add(user_provider)
         db.commit()
-        db.refresh(new_user)
-        logger.info(f"User successfully created in DB: {username} (UID: {firebase_uid})")
-
-        return {
-            "message": "User created successfully",
-            "user_id": new_user.id,
-            "username": username,
-            "firebase_uid": new_user.firebase_uid
-        }
+    except HTTPException as e:
+        logger.warning(f"Rejected user creation for UID {firebase_uid}: {e.detail}")
+        raise
     except Exception as e:
         db.rollback()
         logger.error(f"Error creating user: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error creating user: {str(e)}")
 
+    logger.info(f"User successfully created in DB: {username} (UID: {firebase_uid})")
+    return {
+        "message": "User created successfully",
+        "user_id": user_id,
+        "username": username,
+        "firebase_uid": firebase_uid
+    }
+
 @router.get("/users/current", response_model=UserByFirebaseResponse)
 def get_current_user(
     authorization: str = Header(...),
@@ -156,7 +123,7 @@ def get_current_user(
     id_token = authorization.split(" ")[1]
 
     try:
-        decoded_token = firebase_auth.verify_id_token(id_token)
+        decoded_token = verify_id_token(id_token)
         firebase_uid = decoded_token["uid"]
         logger.info(f"Current user token verified for UID: {firebase_uid}")
     except Exception as e:
@@ -167,14 +134,13 @@ def get_current_user(
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
-    user.last_login = datetime.utcnow()
-    db.commit()
-    db.refresh(user)
+    # Só leitura aqui: last_login vai para o buffer e é gravado em lote (last_login_utils)
+    record_login(user.id)
 
     return user
 
 @router.get("/users/{user_id}/complete", response_model=UserCompleteResponse)
-def get_user_complete(user_id: int, db: Session = Depends(get_db)):
+def get_user_complete(user_id: int, db: Session = Depends(get_read_db)):
     user = db.query(User).filter(User.id == user_id).first()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
@@ -182,25 +148,19 @@ def get_user_complete(user_id: int, db: Session = Depends(get_db)):
 
 @router.post("/users/create", status_code=201)
 def create_user(user_data: UserCreate, db: Session = Depends(get_db)):
-    existing_user = db.query(User).filter(User.email == user_data.email).first()
-    if existing_user:
-        raise HTTPException(status_code=400, detail="Email already exists")
-
-    username = user_data.username
-    if username and db.query(User).filter(User.username == username).first():
-        raise HTTPException(status_code=400, detail="Username already exists")
-
-    new_user = User(
-        firebase_uid=user_data.firebase_uid,
+    # provider vai para user_providers (User não tem essa coluna)
+    user_id, username = insert_user(
+        db,
         email=user_data.email,
-        username=username,
-        provider=user_data.provider
+        username=user_data.username,
+        username_base=f"user_{(user_data.firebase_uid or user_data.email.split('@')[0])[:6]}",
+        firebase_uid=user_data.firebase_uid,
+        provider=user_data.provider,
+        name=user_data.name
     )
-    db.add(new_user)
     db.commit()
-    db.refresh(new_user)
 
-    return {"message": "User created successfully", "user_id": new_user.id, "username": username}
+    return {"message": "User created successfully", "user_id": user_id, "username": username}
 
 @router.patch("/users/update", response_model=UserResponse)
 def update_user(
@@ -220,15 +180,8 @@ def update_user(
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
-    # Atualiza campos se fornecidos
+    # Atualiza campos se fornecidos; username repetido é barrado pelo índice único no commit
     if user_update.username:
-        existing_user = (
-            db.query(User)
-            .filter(User.username == user_update.username, User.id != user.id)
-            .first()
-        )
-        if existing_user:
-            raise HTTPException(status_code=400, detail="Username already exists")
         user.username = user_update.username
 
     if user_update.name:
@@ -239,6 +192,9 @@ def update_user(
     try:
         db.commit()
         db.refresh(user)
+    except IntegrityError as e:
+        db.rollback()
+        raise_for_unique_violation(e)
     except Exception as e:
         db.rollback()
         logger.error(f"Error updating user: {str(e)}")
@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import Optional, List
+from pydantic import BaseModel, Field
+from typing import Dict, Optional, List
 
 class CityBase(BaseModel):
     name: str
@@ -9,10 +9,35 @@ class TranslationResponse(BaseModel):
     language: str
     translated_name: str
 
+class CityStatsResponse(BaseModel):
+    photo_count: int = 0
+    contributor_count: int = 0
+    centroid_latitude: Optional[float] = None
+    centroid_longitude: Optional[float] = None
+    min_latitude: Optional[float] = None
+    max_latitude: Optional[float] = None
+    min_longitude: Optional[float] = None
+    max_longitude: Optional[float] = None
+
 class CityResponse(CityBase):
     id: int
     cover_photo_url: Optional[str] = None
+    cover_photo_variants: Optional[Dict[str, str]] = None  # só quando pedido com ?variants=
     translations: Optional[List[TranslationResponse]] = []  # Lista de traduções
+    stats: CityStatsResponse = Field(default_factory=CityStatsResponse)  # Agregados de city_stats (zerados se ainda não há fotos)
 
     class Config:
         from_attributes = True
+
+class CitySearchResult(BaseModel):
+    id: int
+    name: str
+    country: str
+    display_name: str  # no idioma negociado, com fallback para inglês
+    language: str
+    photo_count: int = 0
+
+class LocalizedCityResponse(CityResponse):
+    # Nome já resolvido no idioma negociado (com fallback para inglês)
+    display_name: str
+    language: str
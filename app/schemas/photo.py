@@ -1,13 +1,15 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import Dict, List, Optional
 
 class PhotoResponse(BaseModel):
     id: int
     image_url: str
-    city_id: int
+    city_id: Optional[int] = None  # nulo enquanto a foto está "pending"
     latitude: float
     longitude: float
     user_id: int
+    status: str = "resolved"
+    variants: Optional[Dict[str, str]] = None  # só quando pedido com ?variants=
 
     class Config:
         from_attributes = True
@@ -18,3 +20,27 @@ class PhotoCreate(BaseModel):
     longitude: float
     city_id: Optional[int] = None
     user_id: int
+
+class PhotoDistanceResponse(PhotoResponse):
+    distance_km: float
+
+class PhotoCluster(BaseModel):
+    geohash: str  # célula que originou o agrupamento
+    count: int
+    latitude: float  # centróide das fotos da célula
+    longitude: float
+    sample: PhotoResponse  # foto de menor id da célula, usada como miniatura do marcador
+
+class PhotoBatchCreate(BaseModel):
+    items: List[PhotoCreate]
+
+class PhotoBatchItemResult(BaseModel):
+    index: int  # posição do item na requisição
+    status: str  # "created" | "failed"
+    photo: Optional[PhotoResponse] = None
+    error: Optional[str] = None
+
+class PhotoBatchResponse(BaseModel):
+    created: int
+    failed: int
+    results: List[PhotoBatchItemResult]
@@ -0,0 +1,258 @@
+import hashlib
+import logging
+import time
+from typing import Literal, Optional
+
+from pydantic import TypeAdapter
+from sqlalchemy import and_, func, select
+from sqlalchemy.orm import Session, aliased, contains_eager, joinedload
+
+from app.config.config import settings
+from app.db import SessionLocal, engine, replicas
+from app.models.city import City, CityTranslation
+from app.models.city_stats import CityStats
+from app.models.photo import Photo
+from app.schemas.city import CityResponse, CityStatsResponse, LocalizedCityResponse, TranslationResponse
+from app.utils.cache_utils import get_cache_backend
+from app.utils.cloudinary_utils import VARIANT_SETS, build_variant_urls
+from app.utils.language_utils import DEFAULT_LANGUAGE
+
+logger = logging.getLogger("app.utils.city_catalog")
+
+CATALOG_KEY = "cities:catalog"  # + ":<idioma>:<variantes>:<ordem>"
+# Presente por city_catalog_primary_window segundos depois de cada invalidação
+INVALIDATED_KEY = "cities:catalog_invalidated"
+# Horário (epoch) da última alteração de city_stats; ver mark_city_stats_changed
+STATS_CHANGED_KEY = "cities:stats_changed"
+
+CitySort = Literal["name", "photo_count", "contributor_count"]
+CITY_SORTS = ("name", "photo_count", "contributor_count")
+
+_catalog_adapter = TypeAdapter(list[CityResponse])
+_localized_adapter = TypeAdapter(list[LocalizedCityResponse])
+
+
+def _order_by(sort: Optional[str]) -> list:
+    # Ordena só pela tabela city_stats (sem varrer photos); cidades sem linha contam como 0
+    if sort == "name":
+        return [City.name, City.id]
+    if sort in ("photo_count", "contributor_count"):
+        return [func.coalesce(getattr(CityStats, sort), 0).desc(), City.id]
+    return [City.id]
+
+
+def _stats_response(stats) -> CityStatsResponse:
+    if stats is None or not stats.photo_count:
+        return CityStatsResponse()
+    return CityStatsResponse(
+        photo_count=stats.photo_count,
+        contributor_count=stats.contributor_count,
+        centroid_latitude=stats.sum_latitude / stats.photo_count,
+        centroid_longitude=stats.sum_longitude / stats.photo_count,
+        min_latitude=stats.min_latitude,
+        max_latitude=stats.max_latitude,
+        min_longitude=stats.min_longitude,
+        max_longitude=stats.max_longitude,
+    )
+
+
+def build_city_catalog(
+    db: Session,
+    variant_set: Optional[str] = None,
+    sort: Optional[str] = None
+) -> list[CityResponse]:
+    # Carregar todas as cidades, incluindo as traduções, as fotos e os agregados
+    cities = (
+        db.query(City)
+        .outerjoin(City.stats)
+        .options(joinedload(City.cover_photo), joinedload(City.translations), contains_eager(City.stats))
+        .order_by(*_order_by(sort))
+        .all()
+    )
+
+    result = []
+
+    for city in cities:
+        # Criar uma lista de traduções para a cidade
+        translations = [
+            TranslationResponse(language=t.language, translated_name=t.translated_name)
+            for t in city.translations
+        ]
+        cover_photo_url = city.cover_photo.image_url if city.cover_photo else None
+
+        result.append(
+            CityResponse(
+                id=city.id,
+                name=city.name,
+                country=city.country,
+                cover_photo_url=cover_photo_url,
+                cover_photo_variants=build_variant_urls(cover_photo_url, variant_set),
+                translations=translations,  # Retornando todas as traduções
+                stats=_stats_response(city.stats)
+            )
+        )
+
+    return result
+
+
+def build_localized_city_catalog(
+    db: Session,
+    language: str,
+    variant_set: Optional[str] = None,
+    sort: Optional[str] = None
+) -> list[LocalizedCityResponse]:
+    """
+    Catálogo com só uma tradução por cidade: junta apenas a linha do idioma pedido
+    e a de inglês (fallback), em vez de carregar todas as traduções.
+    """
+    requested = aliased(CityTranslation)
+    fallback = aliased(CityTranslation)
+    rows = db.execute(
+        select(City.id, City.name, City.country, Photo.image_url,
+               requested.translated_name.label("requested_name"),
+               fallback.translated_name.label("fallback_name"),
+               CityStats)
+        .outerjoin(Photo, Photo.id == City.cover_photo_id)
+        .outerjoin(CityStats, CityStats.city_id == City.id)
+        .outerjoin(requested, and_(requested.city_id == City.id, requested.language == language))
+        .outerjoin(fallback, and_(fallback.city_id == City.id, fallback.language == DEFAULT_LANGUAGE))
+        .order_by(*_order_by(sort))
+    )
+
+    result = []
+    for row in rows:
+        if row.requested_name is not None:
+            resolved_language, display_name = language, row.requested_name
+        else:
+            resolved_language, display_name = DEFAULT_LANGUAGE, row.fallback_name or row.name
+        result.append(
+            LocalizedCityResponse(
+                id=row.id,
+                name=row.name,
+                country=row.country,
+                cover_photo_url=row.image_url,
+                cover_photo_variants=build_variant_urls(row.image_url, variant_set),
+                translations=[TranslationResponse(language=resolved_language, translated_name=display_name)],
+                stats=_stats_response(row.CityStats),
+                display_name=display_name,
+                language=resolved_language
+            )
+        )
+    return result
+
+
+def _catalog_key(language: Optional[str], variant_set: Optional[str] = None, sort: Optional[str] = None) -> str:
+    return f"{CATALOG_KEY}:{language or 'all'}:{variant_set or 'none'}:{sort or 'id'}"
+
+
+def get_city_catalog(
+    db: Session,
+    language: Optional[str] = None,
+    variant_set: Optional[str] = None,
+    sort: Optional[str] = None
+) -> tuple[bytes, str]:
+    """
+    Retorna (json, etag) do catálogo de cidades, completo ou só no idioma pedido
+    (um cache por idioma, conjunto de variantes e ordem). O valor guardado no cache
+    é "<etag> <montado_em>\\n<json>", para que etag e corpo sejam lidos/gravados juntos.
+    A entrada vale até invalidate_city_catalog ou cities_cache_ttl. As contagens de
+    city_stats mudam a cada upload e não invalidam o cache: uma entrada com mais de
+    city_stats_max_age só é remontada se mark_city_stats_changed foi chamado depois
+    de ela ser montada (no máximo uma remontagem por combinação a cada city_stats_max_age).
+    Logo depois de uma invalidação, um catálogo pedido numa réplica é reconstruído
+    no primário, já que a réplica pode ainda não ter a escrita que o invalidou.
+    """
+    backend = get_cache_backend()
+    key = _catalog_key(language, variant_set, sort)
+    cached = _safe_get(backend, key)
+    if cached:
+        header, _, body = cached.partition(b"\n")
+        etag, _, built_at = header.decode().partition(" ")
+        if not _stats_changed_since(backend, float(built_at or 0)):
+            return body, etag
+
+    built_at = time.time()
+    from_replica = db.get_bind() is not engine
+    if from_replica and _recently_invalidated(backend):
+        # A réplica pode ainda não ter a escrita que invalidou o cache: reconstrói no primário
+        primary = SessionLocal()
+        try:
+            body = _build_catalog(primary, language, variant_set, sort)
+        finally:
+            primary.close()
+        from_replica = False
+    else:
+        body = _build_catalog(db, language, variant_set, sort)
+    etag = f'"{hashlib.sha1(body).hexdigest()}"'
+
+    if from_replica and _recently_invalidated(backend):
+        # Invalidado enquanto lia da réplica: responde, mas não cacheia um catálogo talvez velho
+        return body, etag
+    try:
+        backend.set(key, f"{etag} {built_at}\n".encode() + body, ttl=settings.cities_cache_ttl)
+    except Exception as e:
+        logger.warning(f"Failed to store city catalog in cache: {e}")
+    return body, etag
+
+
+def _build_catalog(db: Session, language: Optional[str], variant_set: Optional[str], sort: Optional[str]) -> bytes:
+    if language:
+        return _localized_adapter.dump_json(build_localized_city_catalog(db, language, variant_set, sort))
+    return _catalog_adapter.dump_json(build_city_catalog(db, variant_set, sort))
+
+
+def _recently_invalidated(backend) -> bool:
+    return _safe_get(backend, INVALIDATED_KEY) is not None
+
+
+def _stats_changed_since(backend, built_at: float) -> bool:
+    # Entrada recente: contagens podem atrasar até city_stats_max_age sem olhar o marcador
+    if time.time() - built_at < settings.city_stats_max_age:
+        return False
+    changed_at = _safe_get(backend, STATS_CHANGED_KEY)
+    return changed_at is not None and float(changed_at) >= built_at
+
+
+def mark_city_stats_changed() -> None:
+    """Chamado depois do commit que alterou city_stats (fotos novas, refresh)."""
+    try:
+        get_cache_backend().set(STATS_CHANGED_KEY, str(time.time()).encode(), ttl=settings.cities_cache_ttl)
+    except Exception as e:
+        # Sem o marcador, as contagens atrasam no máximo cities_cache_ttl
+        logger.warning(f"Failed to mark city stats as changed: {e}")
+
+
+def invalidate_city_catalog() -> None:
+    try:
+        languages = [None, DEFAULT_LANGUAGE, *settings.supported_languages]
+        variant_sets = [None, *VARIANT_SETS]
+        sorts = [None, *CITY_SORTS]
+        keys = {
+            _catalog_key(lang, variant_set, sort)
+            for lang in languages for variant_set in variant_sets for sort in sorts
+        }
+        backend = get_cache_backend()
+        if replicas is not None:
+            # Marca antes de apagar, para nenhuma leitura da réplica recriar o catálogo velho
+            backend.set(INVALIDATED_KEY, b"1", ttl=settings.city_catalog_primary_window)
+        backend.delete(*keys)
+    except Exception as e:
+        # O TTL garante que um catálogo velho não fica para sempre
+        logger.error(f"Failed to invalidate city catalog cache: {e}")
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return etag in candidates
+
+
+def _safe_get(backend, key: str) -> Optional[bytes]:
+    try:
+        return backend.get(key)
+    except Exception as e:
+        logger.warning(f"City catalog cache unavailable, rebuilding: {e}")
+        return None
@@ -0,0 +1,368 @@
+"""
+Busca de cidades para autocomplete (GET /cities/search).
+
+Índice de prefixos em memória (por processo) sobre City.name, City.country e
+todas as CityTranslation.translated_name:
+
+  - termos normalizados sem acento e sem caixa ("São Paulo" -> "sao", "paulo")
+  - nomes CJK/hangul (sem espaços) indexados por todos os sufixos, para que
+    "京都" encontre "東京都"
+  - consulta com várias palavras: todas precisam casar (a última como prefixo)
+  - sem nenhum resultado, uma segunda passada aceita um erro de digitação por palavra
+
+Resultados ordenados por número de fotos (city_stats). O índice é montado e
+mantido por uma thread em background iniciada no startup, fora do caminho das
+requisições: cidades criadas/traduzidas neste processo são reindexadas logo
+depois (mark_cities_changed); escritas de outros processos entram pela
+atualização periódica (cidades novas e contagens, a cada city_search_refresh_seconds)
+e pela reconstrução completa (city_search_rebuild_seconds).
+"""
+import heapq
+import logging
+import re
+import threading
+import time
+import unicodedata
+from bisect import bisect_left, insort
+from typing import Iterable, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.config.config import settings
+from app.db import SessionLocal
+from app.models.city import City, CityTranslation
+from app.models.city_stats import CityStats
+from app.utils.language_utils import DEFAULT_LANGUAGE
+
+logger = logging.getLogger("app.utils.city_search")
+
+# Letras que a decomposição Unicode não separa do "acento"
+_FOLD = str.maketrans({"ø": "o", "ł": "l", "đ": "d", "ħ": "h", "ı": "i", "æ": "ae", "œ": "oe", "þ": "th"})
+
+_WORD = re.compile(r"\w+")
+
+# Scripts sem espaço entre palavras: ideogramas CJK, kana e hangul (sílabas e jamo)
+_CJK = re.compile(r"[ᄀ-ᇿ぀-ヿ㄰-㆏㐀-䶿一-鿿가-힯豈-﫿]")
+
+_MAX_CHAR = chr(0x10FFFF)
+
+# Sufixos CJK mais longos que isso não ajudam no autocomplete e só incham o índice
+MAX_CJK_TERM = 8
+
+# Teto de cidades por palavra na passada tolerante a erros: uma palavra curta casa com
+# boa parte do índice, e o resultado só é usado para os primeiros `limit`
+MAX_FUZZY_MATCHES = 500
+
+
+def normalize(text: str) -> str:
+    """Minúsculas, sem acentos e com formas de largura total convertidas ("Ｔｏｋｙｏ" -> "tokyo")."""
+    if text.isascii():
+        return text.lower()
+    decomposed = unicodedata.normalize("NFKD", text.casefold())
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c)).translate(_FOLD)
+    # Recompõe o que não é acento (ex.: sílabas hangul, decompostas em jamo pelo NFKD)
+    return unicodedata.normalize("NFC", stripped)
+
+
+def _terms(text: str) -> set[str]:
+    terms = set()
+    for word in _WORD.findall(normalize(text)):
+        terms.add(word)
+        if _CJK.search(word):
+            terms.update(word[i:i + MAX_CJK_TERM] for i in range(1, len(word)))
+    return terms
+
+
+def _city_terms(name: str, country: str, translations: dict[str, str]) -> set[str]:
+    terms = _terms(name) | _terms(country)
+    for translated_name in translations.values():
+        terms |= _terms(translated_name)
+    return terms
+
+
+def _within_one_edit(a: str, b: str) -> bool:
+    if abs(len(a) - len(b)) > 1:
+        return False
+    if len(a) > len(b):
+        a, b = b, a
+    i = j = edits = 0
+    while i < len(a) and j < len(b):
+        if a[i] != b[j]:
+            edits += 1
+            if edits > 1:
+                return False
+            if len(a) == len(b):
+                i += 1
+            j += 1
+        else:
+            i += 1
+            j += 1
+    return edits + (len(b) - j) <= 1
+
+
+class CitySearchIndex:
+    """Lista ordenada de (termo, city_id): a busca por prefixo é um bisect e uma varredura curta."""
+
+    def __init__(self):
+        self._entries: list[tuple[str, int]] = []
+        self._city_terms: dict[int, set[str]] = {}
+        self.cities: dict[int, tuple[str, str, dict[str, str]]] = {}  # id -> (name, country, traduções)
+        self.photo_counts: dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.cities)
+
+    @classmethod
+    def from_cities(cls, cities: dict[int, tuple[str, str, dict[str, str]]]) -> "CitySearchIndex":
+        """Monta o índice inteiro de uma vez: junta todos os termos e ordena uma só vez."""
+        index = cls()
+        for city_id, city in cities.items():
+            terms = _city_terms(*city)
+            index._entries.extend((term, city_id) for term in terms)
+            index._city_terms[city_id] = terms
+            index.cities[city_id] = city
+        index._entries.sort()
+        return index
+
+    @property
+    def max_city_id(self) -> int:
+        return max(self.cities, default=0)
+
+    def set_city(self, city_id: int, name: str, country: str, translations: dict[str, str]) -> None:
+        # Só para atualizações pontuais: cada insort desloca a lista (O(n) por termo)
+        terms = _city_terms(name, country, translations)
+        with self._lock:
+            self._remove_terms(city_id)
+            for term in terms:
+                insort(self._entries, (term, city_id))
+            self._city_terms[city_id] = terms
+            self.cities[city_id] = (name, country, translations)
+
+    def remove_city(self, city_id: int) -> None:
+        with self._lock:
+            self._remove_terms(city_id)
+            self.cities.pop(city_id, None)
+
+    def _remove_terms(self, city_id: int) -> None:
+        for term in self._city_terms.pop(city_id, ()):
+            position = bisect_left(self._entries, (term, city_id))
+            if position < len(self._entries) and self._entries[position] == (term, city_id):
+                del self._entries[position]
+
+    def _prefix_matches(self, prefix: str) -> set[int]:
+        # Todos os termos com o prefixo ficam entre (prefix,) e (prefix + maior code point,)
+        start = bisect_left(self._entries, (prefix,))
+        end = bisect_left(self._entries, (prefix + _MAX_CHAR,), start)
+        return {city_id for _, city_id in self._entries[start:end]}
+
+    def _fuzzy_matches(self, word: str) -> set[int]:
+        # Mantém a primeira letra (erros nela são raros) e compara o começo de cada termo
+        matches = set()
+        sizes = (len(word) - 1, len(word), len(word) + 1)
+        last_head, last_verdict = None, False
+        position = bisect_left(self._entries, (word[0],))
+        while position < len(self._entries) and self._entries[position][0].startswith(word[0]):
+            term, city_id = self._entries[position]
+            position += 1
+            if len(term) < len(word) - 1:
+                continue
+            # A comparação só depende de term[:len(word) + 1]; termos vizinhos costumam repeti-lo
+            head = term[:len(word) + 1]
+            if head != last_head:
+                last_head = head
+                last_verdict = any(_within_one_edit(word, head[:size]) for size in sizes)
+            if last_verdict:
+                matches.add(city_id)
+                if len(matches) >= MAX_FUZZY_MATCHES:
+                    break
+        return matches
+
+    def _match(self, words: list[str], fuzzy: bool) -> set[int]:
+        result = None
+        for word in words:
+            matches = self._fuzzy_matches(word) if fuzzy else self._prefix_matches(word)
+            result = matches if result is None else result & matches
+            if not result:
+                return set()
+        return result or set()
+
+    def search(self, query: str, limit: int) -> list[tuple[int, tuple[str, str, dict[str, str]], int]]:
+        """
+        (id, (name, country, traduções), fotos) das cidades que casam com a consulta,
+        das mais fotografadas para as menos. Os dados saem sob o lock: uma cidade
+        removida pela thread do índice no meio da busca não aparece pela metade.
+        """
+        words = _WORD.findall(normalize(query))
+        if not words:
+            return []
+        counts = self.photo_counts
+        with self._lock:
+            matches = self._match(words, fuzzy=False)
+            if not matches and all(len(word) >= 3 and not _CJK.search(word) for word in words):
+                matches = self._match(words, fuzzy=True)
+            ranked = heapq.nsmallest(limit, matches, key=lambda city_id: (-counts.get(city_id, 0), city_id))
+            return [(city_id, self.cities[city_id], counts.get(city_id, 0)) for city_id in ranked]
+
+
+def _load_cities(db: Session, city_ids: Optional[Iterable[int]] = None, after_id: Optional[int] = None) -> dict:
+    city_filter = []
+    if city_ids is not None:
+        city_filter.append(City.id.in_(list(city_ids)))
+    if after_id is not None:
+        city_filter.append(City.id > after_id)
+
+    cities = {
+        row.id: (row.name, row.country, {})
+        for row in db.execute(select(City.id, City.name, City.country).where(*city_filter))
+    }
+    if cities:
+        translation_filter = [CityTranslation.city_id.in_(list(cities))] if city_filter else []
+        rows = db.execute(
+            select(CityTranslation.city_id, CityTranslation.language, CityTranslation.translated_name)
+            .where(*translation_filter)
+        )
+        for row in rows:
+            if row.city_id in cities:
+                cities[row.city_id][2][row.language] = row.translated_name
+    return cities
+
+
+def _load_photo_counts(db: Session, city_ids: Optional[Iterable[int]] = None) -> dict[int, int]:
+    statement = select(CityStats.city_id, CityStats.photo_count)
+    if city_ids is not None:
+        statement = statement.where(CityStats.city_id.in_(list(city_ids)))
+    return dict(db.execute(statement).all())
+
+
+_index: Optional[CitySearchIndex] = None
+_ready = threading.Event()
+_wake = threading.Event()
+_stop = threading.Event()
+_thread: Optional[threading.Thread] = None
+_pending: set[int] = set()
+_pending_lock = threading.Lock()
+
+# Espera entre tentativas quando a montagem inicial falha (ex.: banco ainda subindo)
+RETRY_SECONDS = 5
+
+
+def mark_cities_changed(city_ids: Iterable[int]) -> None:
+    """Cidades criadas ou com traduções alteradas: reindexadas logo em seguida pela thread do índice."""
+    with _pending_lock:
+        _pending.update(city_ids)
+    _wake.set()
+
+
+def build_search_index(db: Session) -> CitySearchIndex:
+    start = time.perf_counter()
+    index = CitySearchIndex.from_cities(_load_cities(db))
+    index.photo_counts = _load_photo_counts(db)
+    logger.info("Built city search index", extra={
+        "cities": len(index), "seconds": round(time.perf_counter() - start, 3)
+    })
+    return index
+
+
+def _take_pending() -> set[int]:
+    global _pending
+    with _pending_lock:
+        pending, _pending = _pending, set()
+    return pending
+
+
+def _apply_changes(db: Session, index: CitySearchIndex, refresh: bool) -> None:
+    changed = _take_pending()
+    loaded = {}
+    if refresh:
+        # Cidades criadas por outros processos desde a última atualização
+        loaded = _load_cities(db, after_id=index.max_city_id)
+        index.photo_counts = _load_photo_counts(db)
+    if changed - loaded.keys():
+        loaded.update(_load_cities(db, city_ids=changed - loaded.keys()))
+        index.photo_counts.update(_load_photo_counts(db, changed))
+    for city_id in changed | loaded.keys():
+        if city_id in loaded:
+            index.set_city(city_id, *loaded[city_id])
+        else:
+            index.remove_city(city_id)
+
+
+def _maintain() -> None:
+    """
+    Thread do índice: monta, aplica mark_cities_changed e faz as atualizações
+    periódicas, sempre pelo primário (SessionLocal). Cidades recém-criadas podem
+    ainda não ter chegado a uma réplica, e seriam tiradas do índice.
+    """
+    global _index
+    built_at = refreshed_at = 0.0
+    while not _stop.is_set():
+        db = SessionLocal()
+        try:
+            now = time.monotonic()
+            if _index is None or now - built_at > settings.city_search_rebuild_seconds:
+                _take_pending()
+                _index = build_search_index(db)
+                built_at = refreshed_at = now
+                _ready.set()
+            else:
+                refresh = now - refreshed_at > settings.city_search_refresh_seconds
+                _apply_changes(db, _index, refresh)
+                if refresh:
+                    refreshed_at = now
+        except Exception as e:
+            logger.error(f"Failed to update city search index: {e}")
+        finally:
+            db.close()
+        _wake.wait(RETRY_SECONDS if _index is None else settings.city_search_refresh_seconds)
+        _wake.clear()
+
+
+def start_search_index() -> None:
+    """Monta o índice em background (chamado no startup; idempotente)."""
+    global _thread
+    if _thread is not None:
+        return
+    _stop.clear()
+    _thread = threading.Thread(target=_maintain, name="city-search-index", daemon=True)
+    _thread.start()
+
+
+def stop_search_index() -> None:
+    global _thread
+    _stop.set()
+    _wake.set()
+    _thread = None
+
+
+def get_search_index() -> CitySearchIndex:
+    """
+    Índice deste processo. As requisições nunca montam nem atualizam o índice;
+    só esperam a primeira montagem se ela ainda não terminou (ex.: logo após o startup).
+    """
+    if _thread is None:
+        start_search_index()
+    if not _ready.wait(settings.city_search_ready_timeout):
+        raise HTTPException(status_code=503, detail="City search index is not ready, try again")
+    return _index
+
+
+def search_cities(query: str, language: Optional[str] = None, limit: int = 10) -> list[dict]:
+    results = []
+    for city_id, (name, country, translations), photo_count in get_search_index().search(query, limit):
+        if language and language in translations:
+            resolved_language, display_name = language, translations[language]
+        else:
+            resolved_language = DEFAULT_LANGUAGE
+            display_name = translations.get(DEFAULT_LANGUAGE, name)
+        results.append({
+            "id": city_id,
+            "name": name,
+            "country": country,
+            "display_name": display_name,
+            "language": resolved_language,
+            "photo_count": photo_count,
+        })
+    return results
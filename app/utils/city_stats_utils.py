@@ -0,0 +1,177 @@
+"""
+Agregados por cidade (tabela city_stats): número de fotos, colaboradores,
+bounding box e centróide.
+
+Mantidos incrementalmente na mesma transação que cria as fotos; o job
+refresh_city_stats recalcula a partir de photos (ex.: após importar dados).
+
+Uso para recalcular tudo: python -m app.utils.city_stats_utils refresh
+"""
+import logging
+import sys
+from typing import Iterable, Optional
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import case, func, select
+from sqlalchemy.orm import Session
+
+from app.db import SessionLocal
+from app.models.city_stats import CityContributor, CityStats
+from app.models.photo import Photo, PHOTO_RESOLVED
+from app.utils.city_catalog import mark_city_stats_changed
+from app.utils.db_utils import dialect_insert
+from app.utils.job_queue import enqueue, task
+
+logger = logging.getLogger("app.utils.city_stats_utils")
+
+REFRESH_CITY_STATS = "refresh_city_stats"
+
+# (city_id, user_id, latitude, longitude)
+PhotoPoint = tuple[int, Optional[int], float, float]
+
+
+def _least(current, new):
+    # LEAST/GREATEST não existem no SQLite; CASE funciona nos dois
+    return case((current < new, current), else_=new)
+
+
+def _greatest(current, new):
+    return case((current > new, current), else_=new)
+
+
+def record_photos(db: Session, photos: Iterable[PhotoPoint]) -> None:
+    """
+    Soma as fotos novas aos agregados das cidades, sem fazer commit. Um upsert
+    por cidade com "photo_count = photo_count + n": seguro com uploads simultâneos.
+    """
+    aggregates: dict[int, dict] = {}
+    contributors: set[tuple[int, int]] = set()
+    for city_id, user_id, latitude, longitude in photos:
+        entry = aggregates.get(city_id)
+        if entry is None:
+            entry = aggregates[city_id] = {
+                "city_id": city_id, "photo_count": 0, "contributor_count": 0,
+                "min_latitude": latitude, "max_latitude": latitude,
+                "min_longitude": longitude, "max_longitude": longitude,
+                "sum_latitude": 0.0, "sum_longitude": 0.0,
+            }
+        entry["photo_count"] += 1
+        entry["min_latitude"] = min(entry["min_latitude"], latitude)
+        entry["max_latitude"] = max(entry["max_latitude"], latitude)
+        entry["min_longitude"] = min(entry["min_longitude"], longitude)
+        entry["max_longitude"] = max(entry["max_longitude"], longitude)
+        entry["sum_latitude"] += latitude
+        entry["sum_longitude"] += longitude
+        if user_id is not None:
+            contributors.add((city_id, user_id))
+
+    if not aggregates:
+        return
+
+    if contributors:
+        # Só as linhas realmente inseridas voltam no RETURNING: são os colaboradores novos
+        new_contributors = db.execute(
+            dialect_insert(db, CityContributor)
+            .on_conflict_do_nothing(index_elements=["city_id", "user_id"])
+            .returning(CityContributor.city_id),
+            [{"city_id": city_id, "user_id": user_id} for city_id, user_id in sorted(contributors)]
+        ).scalars().all()
+        for city_id in new_contributors:
+            aggregates[city_id]["contributor_count"] += 1
+
+    table = CityStats.__table__.c
+    statement = dialect_insert(db, CityStats)
+    excluded = statement.excluded
+    db.execute(
+        statement.on_conflict_do_update(
+            index_elements=["city_id"],
+            set_={
+                "photo_count": table.photo_count + excluded.photo_count,
+                "contributor_count": table.contributor_count + excluded.contributor_count,
+                "min_latitude": _least(table.min_latitude, excluded.min_latitude),
+                "max_latitude": _greatest(table.max_latitude, excluded.max_latitude),
+                "min_longitude": _least(table.min_longitude, excluded.min_longitude),
+                "max_longitude": _greatest(table.max_longitude, excluded.max_longitude),
+                "sum_latitude": table.sum_latitude + excluded.sum_latitude,
+                "sum_longitude": table.sum_longitude + excluded.sum_longitude,
+                "updated_at": func.now(),
+            }
+        ),
+        # Ordem fixa de city_id: dois lotes nunca travam as mesmas linhas em ordens diferentes
+        [aggregates[city_id] for city_id in sorted(aggregates)]
+    )
+
+
+def refresh_city_stats(db: Session, city_ids: Optional[list[int]] = None) -> int:
+    """Recalcula os agregados a partir de photos (todas as cidades ou só city_ids). Faz commit."""
+    photo_filter = [Photo.city_id.is_not(None), Photo.status == PHOTO_RESOLVED]
+    if city_ids is not None:
+        photo_filter.append(Photo.city_id.in_(city_ids))
+
+    db.execute(
+        dialect_insert(db, CityContributor)
+        .from_select(
+            ["city_id", "user_id"],
+            select(Photo.city_id, Photo.user_id).where(*photo_filter, Photo.user_id.is_not(None)).distinct()
+        )
+        .on_conflict_do_nothing(index_elements=["city_id", "user_id"])
+    )
+
+    rows = db.execute(
+        select(
+            Photo.city_id,
+            func.count().label("photo_count"),
+            func.count(Photo.user_id.distinct()).label("contributor_count"),
+            func.min(Photo.latitude).label("min_latitude"),
+            func.max(Photo.latitude).label("max_latitude"),
+            func.min(Photo.longitude).label("min_longitude"),
+            func.max(Photo.longitude).label("max_longitude"),
+            func.sum(Photo.latitude).label("sum_latitude"),
+            func.sum(Photo.longitude).label("sum_longitude"),
+        )
+        .where(*photo_filter)
+        .group_by(Photo.city_id)
+        .order_by(Photo.city_id)
+    ).mappings().all()
+
+    if rows:
+        statement = dialect_insert(db, CityStats)
+        columns = [key for key in rows[0].keys() if key != "city_id"]
+        db.execute(
+            statement.on_conflict_do_update(
+                index_elements=["city_id"],
+                set_={**{key: statement.excluded[key] for key in columns}, "updated_at": func.now()}
+            ),
+            [dict(row) for row in rows]
+        )
+    db.commit()
+    mark_city_stats_changed()
+    return len(rows)
+
+
+def enqueue_city_stats_refresh(db: Session, city_ids: Optional[list[int]] = None) -> None:
+    payload = {"city_ids": sorted(city_ids) if city_ids is not None else None}
+    enqueue(db, REFRESH_CITY_STATS, payload)
+
+
+def _refresh(city_ids: Optional[list[int]]) -> int:
+    db = SessionLocal()
+    try:
+        return refresh_city_stats(db, city_ids)
+    finally:
+        db.close()
+
+
+@task(REFRESH_CITY_STATS)
+async def refresh_city_stats_task(payload: dict) -> None:
+    refreshed = await run_in_threadpool(_refresh, payload.get("city_ids"))
+    logger.info(f"Refreshed stats for {refreshed} cities")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    if sys.argv[1:] == ["refresh"]:
+        logger.info(f"Refreshed stats for {_refresh(None)} cities")
+    else:
+        print("Usage: python -m app.utils.city_stats_utils refresh")
+        sys.exit(1)
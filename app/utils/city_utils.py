@@ -0,0 +1,113 @@
+import logging
+
+from sqlalchemy import select, tuple_, update
+from sqlalchemy.orm import Session
+
+from app.config.config import settings
+from app.models.city import City, CityTranslation
+from app.utils.db_utils import dialect_insert
+from app.utils.translation_utils import enqueue_city_translation
+
+logger = logging.getLogger("app.utils.city_utils")
+
+def get_or_create_city(db: Session, city_name: str, country_name: str) -> tuple[int, bool, bool]:
+    """
+    Retorna (city_id, tem_capa, criada_agora) sem fazer commit.
+    A maioria dos uploads cai em cidades já existentes, então primeiro tenta o SELECT;
+    se a cidade não existe, INSERT ... ON CONFLICT DO NOTHING RETURNING sobre o índice
+    único (name, country) resolve a corrida entre uploads simultâneos.
+    """
+    lookup = select(City.id, City.cover_photo_id).where(City.name == city_name, City.country == country_name)
+    row = db.execute(lookup).first()
+    if row:
+        return row.id, row.cover_photo_id is not None, False
+
+    statement = (
+        dialect_insert(db, City)
+        .values(name=city_name, country=country_name, cover_photo_id=None)
+        .on_conflict_do_nothing(index_elements=["name", "country"])
+        .returning(City.id)
+    )
+    city_id = db.execute(statement).scalar()
+    if city_id is None:
+        # Outro upload criou a mesma cidade entre o SELECT e o INSERT
+        row = db.execute(lookup).first()
+        return row.id, row.cover_photo_id is not None, False
+
+    logger.info(f"Created city '{city_name}' in country '{country_name}' with ID: {city_id}")
+    db.execute(
+        dialect_insert(db, CityTranslation).on_conflict_do_nothing(index_elements=["city_id", "language"]),
+        create_city_translations(city_name, city_id)
+    )
+    if settings.translations_background:
+        enqueue_city_translation(db, [city_id])
+    return city_id, False, True
+
+
+def get_or_create_cities(
+    db: Session,
+    locations: set[tuple[str, str]]
+) -> dict[tuple[str, str], tuple[int, bool, bool]]:
+    """
+    Versão em lote de get_or_create_city: um SELECT para as cidades existentes,
+    um INSERT de várias linhas para as que faltam e um INSERT das traduções.
+    """
+    if not locations:
+        return {}
+
+    def lookup(pairs):
+        rows = db.execute(
+            select(City.id, City.name, City.country, City.cover_photo_id)
+            .where(tuple_(City.name, City.country).in_(list(pairs)))
+        ).all()
+        return {(r.name, r.country): (r.id, r.cover_photo_id is not None, False) for r in rows}
+
+    cities = lookup(locations)
+    missing = locations - cities.keys()
+    if not missing:
+        return cities
+
+    inserted = db.execute(
+        dialect_insert(db, City)
+        .on_conflict_do_nothing(index_elements=["name", "country"])
+        .returning(City.id, City.name, City.country),
+        [{"name": name, "country": country, "cover_photo_id": None} for name, country in missing]
+    ).all()
+
+    translations = []
+    for row in inserted:
+        cities[(row.name, row.country)] = (row.id, False, True)
+        translations.extend(create_city_translations(row.name, row.id))
+    logger.info(f"Created {len(inserted)} cities in batch")
+
+    if translations:
+        db.execute(
+            dialect_insert(db, CityTranslation).on_conflict_do_nothing(index_elements=["city_id", "language"]),
+            translations
+        )
+    if settings.translations_background:
+        enqueue_city_translation(db, [row.id for row in inserted])
+
+    # Cidades criadas por outra requisição entre o SELECT e o INSERT
+    raced = missing - cities.keys()
+    if raced:
+        cities.update(lookup(raced))
+    return cities
+
+
+def set_city_cover_if_missing(db: Session, city_id: int, photo_id: int) -> bool:
+    """Define a capa só se a cidade ainda não tiver uma. Retorna se atualizou."""
+    result = db.execute(
+        update(City)
+        .where(City.id == city_id, City.cover_photo_id.is_(None))
+        .values(cover_photo_id=photo_id)
+    )
+    return result.rowcount > 0
+
+
+def create_city_translations(city_name: str, city_id: int) -> list[dict]:
+    # Para todas as línguas, salva o nome em inglês; a tradução real vem depois (translation_utils)
+    return [
+        {"city_id": city_id, "language": lang, "translated_name": city_name}
+        for lang in settings.supported_languages
+    ]
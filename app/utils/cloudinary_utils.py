@@ -1,8 +1,17 @@
 import time
 import hashlib
+import re
+from functools import lru_cache
+from typing import Literal, Optional
+
+from fastapi import HTTPException
+
 from app.config.config import settings
 
 def generate_signature(folder: str = "travelapp", public_id: str | None = None):
+    if not (settings.cloudinary_cloud_name and settings.cloudinary_api_key and settings.cloudinary_api_secret):
+        raise HTTPException(status_code=503, detail="Cloudinary is not configured")
+
     timestamp = int(time.time())
 
     # Parâmetros que vão ser assinados (Cloudinary exige ordem alfabética)
@@ -28,3 +37,72 @@ def generate_signature(folder: str = "travelapp", public_id: str | None = None):
         "folder": folder,
         "public_id": public_id
     }
+
+# Transformações no formato de URL da Cloudinary; geradas sem chamar a API
+VARIANT_TRANSFORMATIONS = {
+    "thumb": "c_fill,g_auto,w_200,h_200,q_auto,f_auto",
+    "medium": "c_limit,w_800,q_auto,f_auto",
+    "large": "c_limit,w_1600,q_auto,f_auto",
+    "webp": "c_limit,w_1600,q_auto,f_webp",
+    "avif": "c_limit,w_1600,q_auto,f_avif",
+}
+
+VariantSet = Literal["map", "grid", "detail", "all"]
+
+VARIANT_SETS = {
+    "map": ("thumb",),
+    "grid": ("thumb", "medium"),
+    "detail": ("medium", "large", "webp", "avif"),
+    "all": tuple(VARIANT_TRANSFORMATIONS),
+}
+
+_UPLOAD_MARKER = "/image/upload/"
+_VERSION_SEGMENT = re.compile(r"^v\d+$")
+# Segmento de transformação: componentes "<parâmetro>_<valor>" separados por vírgula
+# (c_fill,w_200 / t_nome / $var_10). Só parâmetros conhecidos, para uma pasta como
+# "my_photos" não ser confundida com transformação.
+_TRANSFORMATION_COMPONENT = (
+    r"(?:a|ac|af|ar|b|bo|br|c|co|cs|d|dl|dn|dpr|du|e|eo|f|fl|fn|fps|g|h|if|ki|l|o|"
+    r"p|pg|q|r|so|sp|t|u|vc|vs|w|x|y|z|\$\w+)_[^,/]+"
+)
+_TRANSFORMATION_SEGMENT = re.compile(rf"^{_TRANSFORMATION_COMPONENT}(?:,{_TRANSFORMATION_COMPONENT})*$")
+
+
+def _transformed_url(image_url: str, transformation: str) -> Optional[str]:
+    prefix, marker, rest = image_url.partition(_UPLOAD_MARKER)
+    if not marker:
+        return None
+
+    # Transformações já presentes na URL ficam antes da nossa (a Cloudinary aplica em cadeia)
+    segments = rest.split("/")
+    insert_at = next((i for i, segment in enumerate(segments) if _VERSION_SEGMENT.match(segment)), None)
+    if insert_at is None:
+        # Sem versão: logo depois das transformações do início (o último segmento é sempre o public_id)
+        insert_at = 0
+        while insert_at < len(segments) - 1 and _TRANSFORMATION_SEGMENT.match(segments[insert_at]):
+            insert_at += 1
+    segments.insert(insert_at, transformation)
+    return f"{prefix}{marker}{'/'.join(segments)}"
+
+
+@lru_cache(maxsize=16384)
+def _variant_urls(image_url: str, variant_set: str) -> tuple[tuple[str, str], ...]:
+    variants = []
+    for name in VARIANT_SETS[variant_set]:
+        url = _transformed_url(image_url, VARIANT_TRANSFORMATIONS[name])
+        if url is None:
+            return ()
+        variants.append((name, url))
+    return tuple(variants)
+
+
+def build_variant_urls(image_url: Optional[str], variant_set: Optional[str]) -> Optional[dict[str, str]]:
+    """
+    URLs das variantes (miniatura, média, webp/avif...) derivadas da URL original.
+    Memoizado por (url, conjunto), então é barato mesmo em listas grandes.
+    Retorna None para URLs que não são da Cloudinary ou sem conjunto pedido.
+    """
+    if not image_url or not variant_set:
+        return None
+    variants = _variant_urls(image_url, variant_set)
+    return dict(variants) if variants else None
@@ -0,0 +1,12 @@
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+
+def dialect_insert(db: Session, model):
+    """
+    INSERT com suporte a ON CONFLICT do dialeto em uso (Postgres em produção,
+    SQLite nos benchmarks locais). Ambos expõem on_conflict_do_nothing/do_update.
+    """
+    if db.get_bind().dialect.name == "sqlite":
+        return sqlite.insert(model)
+    return postgresql.insert(model)
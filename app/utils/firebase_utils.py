@@ -0,0 +1,268 @@
+import hashlib
+import json
+import logging
+import re
+import threading
+import time
+from typing import Callable, Optional
+
+import httpx
+
+from app.config.config import settings
+from app.utils.cache_utils import LRUCache
+from app.utils.metrics_utils import track_external_call
+
+logger = logging.getLogger("app.utils.firebase_utils")
+
+FIREBASE_ISSUER_PREFIX = "https://securetoken.google.com/"
+
+# Mesmo limite de tolerância de relógio aceito pelo firebase_admin
+CLOCK_SKEW_SECONDS = 10
+
+# Token com kid desconhecido baixa as chaves de novo no máximo uma vez nesse intervalo
+UNKNOWN_KID_REFETCH_SECONDS = 60
+
+
+class PublicKeyStore:
+    """
+    Certificados públicos (kid -> PEM) usados para assinar os ID tokens do Firebase.
+    São renovados em background antes de expirar (Cache-Control: max-age), de forma
+    que nenhuma requisição precise esperar o download das chaves.
+    """
+
+    def __init__(self, url: str, certs_file: Optional[str] = None):
+        self.url = url
+        self.certs_file = certs_file
+        self._certs: dict[str, str] = {}
+        self._expires_at = 0.0
+        self._unknown_kid_fetched_at = float("-inf")
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def get_certs(self) -> dict[str, str]:
+        if not self._certs:
+            # Só acontece se a renovação em background ainda não rodou
+            with self._lock:
+                if not self._certs:
+                    self.refresh()
+        return self._certs
+
+    def get_certs_for(self, kid: str) -> dict[str, str]:
+        """
+        Certificados que devem conter o kid. O Google publica uma chave nova antes de
+        usá-la, mas um kid desconhecido ainda pode chegar antes da próxima renovação:
+        nesse caso baixa as chaves de novo, limitado a UNKNOWN_KID_REFETCH_SECONDS
+        (tokens forjados com kids aleatórios não viram um download por requisição).
+        """
+        certs = self.get_certs()
+        if kid in certs or self.certs_file:
+            return certs
+        with self._lock:
+            now = time.monotonic()
+            if kid not in self._certs and now - self._unknown_kid_fetched_at >= UNKNOWN_KID_REFETCH_SECONDS:
+                self._unknown_kid_fetched_at = now
+                logger.info(f"Unknown Firebase key id {kid!r}, fetching public keys again")
+                self.refresh()
+        return self._certs
+
+    def refresh(self) -> None:
+        if self.certs_file:
+            with open(self.certs_file) as f:
+                self._certs = json.load(f)
+            self._expires_at = float("inf")
+            return
+
+        with track_external_call("firebase_certs"):
+            response = httpx.get(self.url, timeout=10)
+            response.raise_for_status()
+        self._certs = response.json()
+        max_age = _parse_max_age(response.headers.get("cache-control", ""))
+        self._expires_at = time.time() + max_age
+        logger.info(f"Fetched {len(self._certs)} Firebase public keys (max-age={max_age}s)")
+
+    def start_background_refresh(self) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._refresh_loop, name="firebase-key-refresh", daemon=True)
+        self._thread.start()
+
+    def stop_background_refresh(self) -> None:
+        self._stop.set()
+        self._thread = None
+
+    def _refresh_loop(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.refresh()
+                # Renova 5 minutos antes de expirar
+                delay = max(self._expires_at - time.time() - 300, 60)
+            except Exception as e:
+                logger.error(f"Failed to refresh Firebase public keys: {e}")
+                delay = 30
+            if delay == float("inf"):
+                return
+            self._stop.wait(delay)
+
+
+def _parse_max_age(cache_control: str) -> int:
+    match = re.search(r"max-age=(\d+)", cache_control)
+    return int(match.group(1)) if match else 3600
+
+
+key_store = PublicKeyStore(settings.firebase_certs_url, settings.firebase_certs_file)
+
+
+_firebase_app = None
+_firebase_app_lock = threading.Lock()
+
+
+def get_firebase_app():
+    """
+    App do Firebase Admin, iniciado no primeiro uso (e não na importação dos routers).
+    Usa o service account de settings.firebase_service_account quando configurado;
+    sem ele, o SDK recorre às credenciais padrão do ambiente.
+    """
+    global _firebase_app
+    if _firebase_app is not None:
+        return _firebase_app
+    with _firebase_app_lock:
+        if _firebase_app is None:
+            import firebase_admin
+            from firebase_admin import credentials
+
+            if firebase_admin._apps:
+                _firebase_app = firebase_admin.get_app()
+            else:
+                credential = None
+                if settings.firebase_service_account:
+                    credential = credentials.Certificate(json.loads(settings.firebase_service_account))
+                else:
+                    logger.warning("FIREBASE_SERVICE_ACCOUNT is not set, using default credentials")
+                options = {"projectId": settings.google_cloud_project} if settings.google_cloud_project else None
+                _firebase_app = firebase_admin.initialize_app(credential, options)
+                logger.info("Firebase Admin initialized")
+    return _firebase_app
+
+
+def verify_with_public_keys(id_token: str) -> dict:
+    """Verifica assinatura e claims localmente, com as mesmas regras do firebase_admin."""
+    from google.auth import jwt as google_jwt
+
+    project_id = settings.google_cloud_project
+    header = google_jwt.decode_header(id_token)
+    if header.get("alg") != "RS256" or not header.get("kid"):
+        raise ValueError("Firebase ID token has incorrect algorithm or no 'kid' header")
+
+    claims = google_jwt.decode(
+        id_token,
+        certs=key_store.get_certs_for(header["kid"]),
+        audience=project_id,
+        clock_skew_in_seconds=CLOCK_SKEW_SECONDS
+    )
+
+    if claims.get("iss") != FIREBASE_ISSUER_PREFIX + project_id:
+        raise ValueError("Firebase ID token has incorrect 'iss' (issuer) claim")
+    subject = claims.get("sub")
+    if not isinstance(subject, str) or not subject or len(subject) > 128:
+        raise ValueError("Firebase ID token has an invalid 'sub' (subject) claim")
+
+    claims["uid"] = subject
+    return claims
+
+
+def _default_verifier(id_token: str) -> dict:
+    if settings.google_cloud_project:
+        return verify_with_public_keys(id_token)
+    # Sem project id configurado, delega ao SDK (que descobre pelo service account)
+    from firebase_admin import auth as firebase_auth
+
+    return firebase_auth.verify_id_token(id_token, app=get_firebase_app())
+
+
+_verifier: Callable[[str], dict] = _default_verifier
+
+# Cache de tokens já verificados: sha256(token) -> claims
+_token_cache = LRUCache(maxsize=settings.firebase_token_cache_size)
+
+_stats_lock = threading.Lock()
+_stats = {
+    "hits": 0,
+    "misses": 0,
+    "failures": 0,
+    "verify_count": 0,
+    "verify_seconds_total": 0.0,
+    "verify_seconds_max": 0.0,
+}
+
+
+def set_token_verifier(verifier: Optional[Callable[[str], dict]]) -> None:
+    """Troca a função de verificação (ex.: verificador falso em testes/benchmarks)."""
+    global _verifier
+    _verifier = verifier or _default_verifier
+    _token_cache.clear()
+
+
+def _token_key(id_token: str) -> str:
+    return hashlib.sha256(id_token.encode()).hexdigest()
+
+
+def peek_verified_token(id_token: str) -> Optional[dict]:
+    """Claims do token se ele já estiver verificado no cache e ainda válido."""
+    claims = _token_cache.get(_token_key(id_token))
+    if claims and claims.get("exp", 0) > time.time():
+        return claims
+    return None
+
+
+def verify_id_token(id_token: str) -> dict:
+    """
+    Verifica o ID token usando o cache. A entrada vale até o claim exp do
+    próprio token, então um token expirado nunca é aceito a partir do cache.
+    """
+    key = _token_key(id_token)
+    claims = _token_cache.get(key)
+    if claims is not None:
+        if claims.get("exp", 0) > time.time():
+            _count("hits")
+            return claims
+        _token_cache.pop(key)
+
+    _count("misses")
+    start = time.perf_counter()
+    try:
+        with track_external_call("firebase_verify"):
+            claims = _verifier(id_token)
+    except Exception:
+        _count("failures")
+        raise
+    finally:
+        _record_verify_time(time.perf_counter() - start)
+
+    _token_cache.set(key, claims)
+    return claims
+
+
+def _count(key: str) -> None:
+    with _stats_lock:
+        _stats[key] += 1
+
+
+def _record_verify_time(seconds: float) -> None:
+    with _stats_lock:
+        _stats["verify_count"] += 1
+        _stats["verify_seconds_total"] += seconds
+        _stats["verify_seconds_max"] = max(_stats["verify_seconds_max"], seconds)
+
+
+def get_token_cache_stats() -> dict:
+    with _stats_lock:
+        stats = dict(_stats)
+    lookups = stats["hits"] + stats["misses"]
+    stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+    stats["verify_seconds_avg"] = (
+        stats["verify_seconds_total"] / stats["verify_count"] if stats["verify_count"] else 0.0
+    )
+    stats["cached_tokens"] = len(_token_cache)
+    return stats
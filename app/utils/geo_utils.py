@@ -0,0 +1,162 @@
+import math
+
+from sqlalchemy import case, func
+
+_GEOHASH_ALPHABET = "0123456789bcdefghjkmnpqrstuvwxyz"
+_GEOHASH_INDEX = {c: i for i, c in enumerate(_GEOHASH_ALPHABET)}
+
+EARTH_RADIUS_KM = 6371.0088
+
+# Precisão gravada em photos.geohash (~5m); prefixos menores servem às consultas por área
+PHOTO_GEOHASH_PRECISION = 9
+
+
+def geohash_encode(latitude: float, longitude: float, precision: int = 9) -> str:
+    # Intercala bits de longitude/latitude (começando pela longitude), 5 bits por caractere
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    chars = []
+    bit = 0
+    value = 0
+    even = True
+
+    while len(chars) < precision:
+        if even:
+            mid = (lon_range[0] + lon_range[1]) / 2
+            if longitude >= mid:
+                value = (value << 1) | 1
+                lon_range[0] = mid
+            else:
+                value <<= 1
+                lon_range[1] = mid
+        else:
+            mid = (lat_range[0] + lat_range[1]) / 2
+            if latitude >= mid:
+                value = (value << 1) | 1
+                lat_range[0] = mid
+            else:
+                value <<= 1
+                lat_range[1] = mid
+        even = not even
+        bit += 1
+        if bit == 5:
+            chars.append(_GEOHASH_ALPHABET[value])
+            bit = 0
+            value = 0
+
+    return "".join(chars)
+
+
+def geohash_bounds(geohash: str) -> tuple[float, float, float, float]:
+    """Retorna (min_lat, min_lon, max_lat, max_lon) da célula."""
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    even = True
+
+    for char in geohash:
+        value = _GEOHASH_INDEX[char]
+        for shift in range(4, -1, -1):
+            bit = (value >> shift) & 1
+            target = lon_range if even else lat_range
+            mid = (target[0] + target[1]) / 2
+            if bit:
+                target[0] = mid
+            else:
+                target[1] = mid
+            even = not even
+
+    return lat_range[0], lon_range[0], lat_range[1], lon_range[1]
+
+
+def geohash_decode(geohash: str) -> tuple[float, float]:
+    """Retorna o centro (lat, lon) da célula."""
+    min_lat, min_lon, max_lat, max_lon = geohash_bounds(geohash)
+    return (min_lat + max_lat) / 2, (min_lon + max_lon) / 2
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lon2 - lon1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def approx_distance_sq(lat_column, lon_column, latitude: float, longitude: float):
+    """
+    Expressão SQL com a distância equiretangular ao quadrado até o ponto: só serve
+    para ordenar (ORDER BY ... LIMIT), e roda no próprio banco. A diferença de
+    longitude dá a volta no antimeridiano (179.9 e -179.9 estão a 0.2 grau).
+    """
+    lon_scale = math.cos(math.radians(latitude))
+    d_lat = lat_column - latitude
+    abs_lon = func.abs(lon_column - longitude)
+    d_lon = case((abs_lon > 180, 360 - abs_lon), else_=abs_lon) * lon_scale
+    return d_lat * d_lat + d_lon * d_lon
+
+
+def bounding_box(latitude: float, longitude: float, radius_km: float) -> tuple[float, float, float, float]:
+    """
+    Caixa (min_lat, min_lon, max_lat, max_lon) que contém o círculo de raio radius_km.
+    Se o círculo cruza o antimeridiano, min_lon > max_lon (mesma convenção do bbox de /photos/within).
+    """
+    d_lat = math.degrees(radius_km / EARTH_RADIUS_KM)
+    cos_lat = max(math.cos(math.radians(latitude)), 1e-6)
+    d_lon = math.degrees(radius_km / (EARTH_RADIUS_KM * cos_lat))
+    if d_lon >= 180.0:
+        min_lon, max_lon = -180.0, 180.0
+    else:
+        min_lon = (longitude - d_lon + 180) % 360 - 180
+        max_lon = (longitude + d_lon + 180) % 360 - 180
+    return (
+        max(latitude - d_lat, -90.0),
+        min_lon,
+        min(latitude + d_lat, 90.0),
+        max_lon,
+    )
+
+
+def geohash_neighbors(geohash: str) -> list[str]:
+    """Célula e suas 8 vizinhas (mesma precisão)."""
+    min_lat, min_lon, max_lat, max_lon = geohash_bounds(geohash)
+    d_lat = max_lat - min_lat
+    d_lon = max_lon - min_lon
+    center_lat = (min_lat + max_lat) / 2
+    center_lon = (min_lon + max_lon) / 2
+
+    cells = []
+    for i in (-1, 0, 1):
+        lat = center_lat + i * d_lat
+        if lat > 90 or lat < -90:
+            continue
+        for j in (-1, 0, 1):
+            lon = center_lon + j * d_lon
+            # Dá a volta no antimeridiano
+            lon = (lon + 180) % 360 - 180
+            cell = geohash_encode(lat, lon, len(geohash))
+            if cell not in cells:
+                cells.append(cell)
+    return cells
+
+
+def geohash_cell_size_km(geohash: str) -> tuple[float, float]:
+    """Retorna (altura, largura) aproximadas da célula em km."""
+    min_lat, min_lon, max_lat, max_lon = geohash_bounds(geohash)
+    km_per_degree = math.radians(EARTH_RADIUS_KM)
+    center_lat = (min_lat + max_lat) / 2
+    height = (max_lat - min_lat) * km_per_degree
+    width = (max_lon - min_lon) * km_per_degree * math.cos(math.radians(center_lat))
+    return height, width
+
+
+def geohash_precision_for_zoom(zoom: int, cells_per_tile: int = 8) -> int:
+    """
+    Precisão geohash para agrupar marcadores no zoom do mapa (tiles Web Mercator):
+    a menor precisão cuja célula cabe cells_per_tile vezes na largura de um tile.
+    """
+    tile_width = 360.0 / (2 ** zoom)
+    for precision in range(1, PHOTO_GEOHASH_PRECISION + 1):
+        lon_bits = (5 * precision + 1) // 2
+        if 360.0 / (2 ** lon_bits) <= tile_width / cells_per_tile:
+            return precision
+    return PHOTO_GEOHASH_PRECISION
@@ -0,0 +1,237 @@
+import logging
+import threading
+from typing import Optional
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+
+from app.config.config import settings
+from app.models.city import City
+from app.models.geocode_cache import GeocodeCache
+from app.models.photo import Photo
+from app.utils.cache_utils import LRUCache
+from app.utils.geo_utils import approx_distance_sq, bounding_box, geohash_encode, haversine_km
+from app.utils.http_utils import get_http_client, nominatim_throttle
+from app.utils.metrics_utils import track_external_call
+
+logger = logging.getLogger("app.utils.geocoding_utils")
+
+# Camada em memória: célula geohash -> (city, country)
+_cell_cache = LRUCache(maxsize=settings.geocode_cache_size)
+
+_stats_lock = threading.Lock()
+_stats = {
+    "memory_hits": 0,
+    "db_hits": 0,
+    "nearby_hits": 0,
+    "misses": 0,
+    "nominatim_errors": 0,
+}
+
+
+def _count(key: str) -> None:
+    with _stats_lock:
+        _stats[key] += 1
+
+
+def get_geocode_stats() -> dict:
+    with _stats_lock:
+        stats = dict(_stats)
+    stats["memory_entries"] = len(_cell_cache)
+    return stats
+
+
+def geocode_cell(latitude: float, longitude: float) -> str:
+    return geohash_encode(latitude, longitude, settings.geocode_cache_precision)
+
+
+async def get_city_and_country(
+    latitude: float,
+    longitude: float,
+    db: Optional[Session] = None
+) -> Optional[tuple[str, str]]:
+    """
+    Resolve (cidade, país) para as coordenadas, consultando em ordem:
+    cache em memória, tabela geocode_cache, fotos já cadastradas num raio
+    configurável e, por último, a API do Nominatim.
+    Consultas ao banco rodam no threadpool; a chamada HTTP não bloqueia nenhuma thread.
+    """
+    cell = geocode_cell(latitude, longitude)
+
+    cached = _cell_cache.get(cell)
+    if cached:
+        _count("memory_hits")
+        return cached
+
+    if db is not None:
+        cached = await run_in_threadpool(lookup_stored_location, db, cell, latitude, longitude)
+        if cached:
+            _cell_cache.set(cell, cached)
+            return cached
+
+    _count("misses")
+    result = await fetch_from_nominatim(latitude, longitude)
+    if result:
+        _cell_cache.set(cell, result)
+        if db is not None and settings.geocode_persistent_cache:
+            await run_in_threadpool(_store_persistent, db, cell, result)
+    return result
+
+
+async def resolve_cells(
+    points: dict[str, tuple[float, float]],
+    db: Optional[Session] = None
+) -> dict[str, Optional[tuple[str, str]]]:
+    """
+    Resolve várias células de uma vez (upload em lote). As consultas ao banco
+    rodam em sequência numa única ida ao threadpool, pois a Session não pode ser
+    usada por duas threads. As células que faltam vão ao Nominatim uma a uma, no
+    ritmo do nominatim_throttle (a política de uso não permite paralelizar).
+    """
+    results: dict[str, Optional[tuple[str, str]]] = {}
+    pending = {}
+    for cell, point in points.items():
+        cached = _cell_cache.get(cell)
+        if cached:
+            _count("memory_hits")
+            results[cell] = cached
+        else:
+            pending[cell] = point
+
+    if db is not None and pending:
+        def lookup_all():
+            return {cell: lookup_stored_location(db, cell, *point) for cell, point in pending.items()}
+
+        for cell, found in (await run_in_threadpool(lookup_all)).items():
+            if found:
+                _cell_cache.set(cell, found)
+                results[cell] = found
+                del pending[cell]
+
+    fetched = []
+    for cell, point in pending.items():
+        _count("misses")
+        fetched.append((cell, await fetch_from_nominatim(*point)))
+    for cell, found in fetched:
+        results[cell] = found
+        if found:
+            _cell_cache.set(cell, found)
+
+    if db is not None and settings.geocode_persistent_cache:
+        def store_all():
+            for cell, found in fetched:
+                if found:
+                    _store_persistent(db, cell, found)
+
+        await run_in_threadpool(store_all)
+
+    return results
+
+
+def lookup_stored_location(
+    db: Session,
+    cell: str,
+    latitude: float,
+    longitude: float
+) -> Optional[tuple[str, str]]:
+    cached = _lookup_persistent(db, cell)
+    if cached:
+        _count("db_hits")
+        return cached
+
+    nearby = _lookup_nearby_photo(db, latitude, longitude)
+    if nearby:
+        _count("nearby_hits")
+    return nearby
+
+
+def _lookup_persistent(db: Session, cell: str) -> Optional[tuple[str, str]]:
+    if not settings.geocode_persistent_cache:
+        return None
+    try:
+        entry = db.get(GeocodeCache, cell)
+    except Exception as e:
+        logger.warning(f"Geocode cache lookup failed: {e}")
+        db.rollback()
+        return None
+    if entry:
+        return entry.city, entry.country
+    return None
+
+
+def _store_persistent(db: Session, cell: str, result: tuple[str, str]) -> None:
+    if not settings.geocode_persistent_cache:
+        return
+    try:
+        db.merge(GeocodeCache(geohash=cell, city=result[0], country=result[1]))
+        db.commit()
+    except Exception as e:
+        logger.warning(f"Failed to persist geocode cache entry {cell}: {e}")
+        db.rollback()
+
+
+def _lookup_nearby_photo(db: Session, latitude: float, longitude: float) -> Optional[tuple[str, str]]:
+    radius_km = settings.geocode_nearby_radius_km
+    if radius_km <= 0:
+        return None
+
+    min_lat, min_lon, max_lat, max_lon = bounding_box(latitude, longitude, radius_km)
+    if min_lon <= max_lon:
+        lon_filter = Photo.longitude.between(min_lon, max_lon)
+    else:
+        lon_filter = or_(Photo.longitude >= min_lon, Photo.longitude <= max_lon)
+    rows = (
+        db.query(Photo.latitude, Photo.longitude, City.name, City.country)
+        .join(City, City.id == Photo.city_id)
+        .filter(Photo.latitude.between(min_lat, max_lat), lon_filter)
+        # As mais próximas primeiro: o limite não pode descartar a foto mais perto numa área densa
+        .order_by(approx_distance_sq(Photo.latitude, Photo.longitude, latitude, longitude))
+        .limit(50)
+        .all()
+    )
+
+    best = None
+    best_distance = radius_km
+    for lat, lon, city_name, country in rows:
+        distance = haversine_km(latitude, longitude, lat, lon)
+        if distance <= best_distance:
+            best, best_distance = (city_name, country), distance
+    return best
+
+
+async def fetch_from_nominatim(latitude: float, longitude: float) -> Optional[tuple[str, str]]:
+    logger.debug("Fetching city and country from Nominatim", extra={"latitude": latitude, "longitude": longitude})
+    params = {
+        "lat": latitude,
+        "lon": longitude,
+        "format": "json",
+        "accept-language": "en"  # idioma inglês
+    }
+
+    try:
+        await nominatim_throttle.wait(settings.nominatim_min_interval_seconds)
+        with track_external_call("nominatim"):
+            response = await get_http_client().get(
+                settings.nominatim_url,
+                params=params,
+                headers={"User-Agent": settings.nominatim_user_agent},
+                timeout=settings.nominatim_timeout
+            )
+            response.raise_for_status()
+        return parse_nominatim_address(response.json())
+    except Exception as e:
+        _count("nominatim_errors")
+        logger.error(f"Error fetching city and country: {e}")
+
+    return None
+
+
+def parse_nominatim_address(data: dict) -> Optional[tuple[str, str]]:
+    address = data.get("address", {})
+    city = address.get("city") or address.get("town") or address.get("village")
+    country = address.get("country")
+
+    if city and country:
+        return city, country
+    return None
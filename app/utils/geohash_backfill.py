@@ -0,0 +1,44 @@
+"""
+Preenche photos.geohash para fotos cadastradas antes da coluna existir.
+
+A coluna precisa existir antes (migrations/0001_photo_geohash.sql, rodada antes
+do deploy); este backfill roda depois do deploy e pode ser repetido.
+
+Uso: python -m app.utils.geohash_backfill
+"""
+import logging
+
+from app.db import SessionLocal
+from app.models.photo import Photo
+from app.utils.geo_utils import PHOTO_GEOHASH_PRECISION, geohash_encode
+
+logger = logging.getLogger("app.utils.geohash_backfill")
+
+
+def backfill_photo_geohashes(batch_size: int = 1000) -> int:
+    updated = 0
+    db = SessionLocal()
+    try:
+        while True:
+            photos = (
+                db.query(Photo)
+                .filter(Photo.geohash.is_(None))
+                .order_by(Photo.id)
+                .limit(batch_size)
+                .all()
+            )
+            if not photos:
+                break
+            for photo in photos:
+                photo.geohash = geohash_encode(photo.latitude, photo.longitude, PHOTO_GEOHASH_PRECISION)
+            db.commit()
+            updated += len(photos)
+            logger.info(f"Backfilled geohash for {updated} photos")
+    finally:
+        db.close()
+    return updated
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    backfill_photo_geohashes()
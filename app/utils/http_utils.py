@@ -0,0 +1,56 @@
+import asyncio
+import time
+from typing import Optional
+
+import httpx
+
+from app.config.config import settings
+
+_client: Optional[httpx.AsyncClient] = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Cliente HTTP assíncrono compartilhado, com pool de conexões keep-alive."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            timeout=settings.http_timeout,
+            limits=httpx.Limits(
+                max_connections=settings.http_max_connections,
+                max_keepalive_connections=settings.http_max_keepalive_connections,
+            ),
+        )
+    return _client
+
+
+async def close_http_client() -> None:
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+class MinIntervalThrottle:
+    """Espaça chamadas em pelo menos `interval` segundos entre si (dentro do processo)."""
+
+    def __init__(self):
+        self._lock: Optional[asyncio.Lock] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._last_call = 0.0
+
+    async def wait(self, interval: float) -> None:
+        # Um asyncio.Lock só serve ao loop em que foi usado (o backfill roda no seu próprio)
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._lock, self._loop = asyncio.Lock(), loop
+        # O lock fica preso durante o sleep: as chamadas saem uma de cada vez, na ordem
+        async with self._lock:
+            delay = self._last_call + interval - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self._last_call = time.monotonic()
+
+
+# Todas as chamadas ao Nominatim do processo (reverse e search): a política de uso
+# pede no máximo 1 requisição por segundo
+nominatim_throttle = MinIntervalThrottle()
@@ -0,0 +1,205 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Optional
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Session
+
+from app.config.config import settings
+from app.db import SessionLocal
+from app.models.job import Job, JOB_DONE, JOB_FAILED, JOB_PENDING, JOB_RUNNING
+from app.utils.db_utils import dialect_insert
+
+logger = logging.getLogger("app.utils.job_queue")
+
+TaskHandler = Callable[[dict], Awaitable[None]]
+FailureHandler = Callable[[dict, str], Awaitable[None]]
+
+# kind -> (handler, on_failure)
+_tasks: dict[str, tuple[TaskHandler, Optional[FailureHandler]]] = {}
+
+
+def task(kind: str, on_failure: Optional[FailureHandler] = None):
+    """
+    Registra um handler de job. Handlers precisam ser idempotentes: um job pode
+    rodar de novo se o worker cair depois de executar e antes de marcar como feito.
+    on_failure roda uma vez, quando o job esgota as tentativas.
+    """
+    def decorator(handler: TaskHandler) -> TaskHandler:
+        _tasks[kind] = (handler, on_failure)
+        return handler
+    return decorator
+
+
+def enqueue(db: Session, kind: str, payload: dict, dedupe_key: Optional[str] = None) -> None:
+    """
+    Enfileira sem fazer commit, para o job entrar na mesma transação que o gerou.
+    Com dedupe_key, enfileirar a mesma tarefa de novo não faz nada.
+    """
+    statement = dialect_insert(db, Job).values(
+        kind=kind,
+        payload=payload,
+        dedupe_key=dedupe_key,
+        max_attempts=settings.job_max_attempts,
+    )
+    if dedupe_key:
+        statement = statement.on_conflict_do_nothing(index_elements=["dedupe_key"])
+    db.execute(statement)
+
+
+def claim_jobs(db: Session, limit: int) -> list[dict]:
+    """
+    Pega até limit jobs prontos com SELECT ... FOR UPDATE SKIP LOCKED, de forma que
+    vários workers (e vários processos) nunca peguem o mesmo job. Jobs "running"
+    há mais de job_lock_timeout_seconds são de um worker que morreu e voltam à fila.
+    """
+    now = datetime.utcnow()
+    stale_before = now - timedelta(seconds=settings.job_lock_timeout_seconds)
+    jobs = (
+        db.query(Job)
+        .filter(or_(
+            and_(Job.status == JOB_PENDING, Job.run_after <= now),
+            and_(Job.status == JOB_RUNNING, Job.locked_at < stale_before),
+        ))
+        .order_by(Job.run_after)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+        .all()
+    )
+
+    claimed = []
+    for job in jobs:
+        job.status = JOB_RUNNING
+        job.attempts += 1
+        job.locked_at = now
+        claimed.append({
+            "id": job.id,
+            "kind": job.kind,
+            "payload": job.payload,
+            "attempts": job.attempts,
+            "max_attempts": job.max_attempts,
+        })
+    db.commit()
+    return claimed
+
+
+def _finish_job(job_id: int, error: Optional[str], final: bool, attempts: int) -> None:
+    db = SessionLocal()
+    try:
+        job = db.get(Job, job_id)
+        if job is None:
+            return
+        if error is None:
+            job.status = JOB_DONE
+        elif final:
+            job.status = JOB_FAILED
+        else:
+            # Backoff exponencial: base, 2*base, 4*base...
+            delay = settings.job_retry_base_seconds * (2 ** (attempts - 1))
+            job.status = JOB_PENDING
+            job.run_after = datetime.utcnow() + timedelta(seconds=delay)
+        job.last_error = error
+        job.locked_at = None
+        db.commit()
+    finally:
+        db.close()
+
+
+def _claim(limit: int) -> list[dict]:
+    db = SessionLocal()
+    try:
+        return claim_jobs(db, limit)
+    finally:
+        db.close()
+
+
+async def run_job(job: dict) -> None:
+    handler, on_failure = _tasks.get(job["kind"], (None, None))
+    error = None
+    if handler is None:
+        error = f"No handler registered for job kind '{job['kind']}'"
+    else:
+        try:
+            await handler(job["payload"])
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+
+    final = error is not None and (handler is None or job["attempts"] >= job["max_attempts"])
+    if error:
+        logger.warning(f"Job {job['id']} ({job['kind']}) attempt {job['attempts']} failed: {error}")
+    await run_in_threadpool(_finish_job, job["id"], error, final, job["attempts"])
+
+    if final and on_failure is not None:
+        try:
+            await on_failure(job["payload"], error)
+        except Exception as e:
+            logger.error(f"on_failure for job {job['id']} ({job['kind']}) failed: {e}")
+
+
+class JobWorker:
+    """
+    Pool de workers rodando como tasks no event loop da aplicação. Os handlers são
+    assíncronos (I/O externo); o acesso ao banco deles vai para o threadpool.
+    """
+
+    def __init__(self, concurrency: int, poll_interval: float, batch_size: int):
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        self._tasks: list[asyncio.Task] = []
+        self._stopping = asyncio.Event()
+
+    def start(self) -> None:
+        self._stopping.clear()
+        self._tasks = [asyncio.create_task(self._loop(i)) for i in range(self.concurrency)]
+        logger.info(f"Started {self.concurrency} job workers")
+
+    async def stop(self) -> None:
+        self._stopping.set()
+        for t in self._tasks:
+            t.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _loop(self, worker_id: int) -> None:
+        while not self._stopping.is_set():
+            try:
+                jobs = await run_in_threadpool(_claim, self.batch_size)
+            except Exception as e:
+                logger.error(f"Job worker {worker_id} failed to claim jobs: {e}")
+                jobs = []
+
+            for job in jobs:
+                await run_job(job)
+
+            if not jobs:
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+
+
+def create_worker() -> Optional[JobWorker]:
+    if settings.job_workers <= 0:
+        return None
+    # Registra os handlers de tarefas antes de começar a consumir a fila
+    import app.utils.city_stats_utils  # noqa: F401
+    import app.utils.photo_tasks  # noqa: F401
+    import app.utils.translation_utils  # noqa: F401
+    return JobWorker(settings.job_workers, settings.job_poll_interval, settings.job_batch_size)
+
+
+def unconsumed_job_settings() -> list[str]:
+    """
+    Opções que enfileiram jobs ligadas num processo sem worker. Pode ser de propósito
+    (workers em outro processo), mas se nenhum consumir a fila as fotos ficam "pending".
+    """
+    if settings.job_workers > 0:
+        return []
+    enabled = {
+        "PHOTO_BACKGROUND_ENRICHMENT": settings.photo_background_enrichment,
+        "TRANSLATIONS_BACKGROUND": settings.translations_background,
+    }
+    return [name for name, on in enabled.items() if on]
@@ -0,0 +1,57 @@
+from typing import Optional
+
+from app.config.config import settings
+
+DEFAULT_LANGUAGE = "en"
+
+
+def _candidates(value: str) -> list[str]:
+    """'pt-BR' -> ['pt-br', 'pt']"""
+    value = value.strip().lower().replace("_", "-")
+    if not value:
+        return []
+    base = value.split("-")[0]
+    return [value] if base == value else [value, base]
+
+
+def parse_accept_language(header: str) -> list[str]:
+    """Idiomas do header Accept-Language em ordem de preferência (q decrescente)."""
+    weighted = []
+    for position, part in enumerate(header.split(",")):
+        tag, _, params = part.partition(";")
+        quality = 1.0
+        if params.strip().startswith("q="):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        if tag.strip() and tag.strip() != "*" and quality > 0:
+            weighted.append((-quality, position, tag))
+
+    languages = []
+    for _, _, tag in sorted(weighted):
+        for candidate in _candidates(tag):
+            if candidate not in languages:
+                languages.append(candidate)
+    return languages
+
+
+def negotiate_language(lang: Optional[str], accept_language: Optional[str]) -> Optional[str]:
+    """
+    Escolhe o idioma da resposta: ?lang= tem prioridade sobre Accept-Language e
+    o primeiro idioma suportado da cadeia vence; sem nenhum suportado, "en".
+    Retorna None quando o cliente pede todas as traduções (sem preferência ou lang=all).
+    """
+    if lang:
+        if lang.strip().lower() == "all":
+            return None
+        preferences = _candidates(lang)
+    elif accept_language:
+        preferences = parse_accept_language(accept_language)
+    else:
+        return None
+
+    for candidate in preferences:
+        if candidate in settings.supported_languages:
+            return candidate
+    return DEFAULT_LANGUAGE
@@ -0,0 +1,173 @@
+"""
+Write-behind de users.last_login.
+
+/users/current é chamado o tempo todo; gravar last_login (UPDATE + commit) em
+cada chamada transformava uma rota de leitura na maior fonte de escrita e de
+locks em users. Agora a rota só registra o login neste buffer (em memória, por
+processo) e um flush periódico grava tudo de uma vez:
+
+  - no máximo uma atualização por usuário a cada last_login_window_seconds
+  - um UPDATE ... FROM (VALUES ...) por lote no Postgres (executemany no SQLite)
+  - nunca volta o horário para trás (só grava se for mais recente que o do banco)
+  - o lifespan faz o último flush no shutdown
+"""
+import asyncio
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Optional
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import DateTime, Integer, bindparam, column, or_, update, values
+from sqlalchemy.orm import Session
+
+from app.config.config import settings
+from app.db import SessionLocal
+from app.models.user import User
+from app.utils.cache_utils import LRUCache
+
+logger = logging.getLogger("app.utils.last_login_utils")
+
+FLUSH_CHUNK = 1000
+
+
+class LastLoginBuffer:
+    def __init__(self, window_seconds: int, max_pending: int):
+        self.window = timedelta(seconds=window_seconds)
+        self.max_pending = max_pending
+        self._pending: dict[int, datetime] = {}
+        # user_id -> último horário aceito, para descartar repetições dentro da janela
+        self._recent = LRUCache(maxsize=max_pending * 4)
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stats = {"recorded": 0, "coalesced": 0, "flushes": 0, "rows_flushed": 0, "flush_failures": 0}
+
+    def record(self, user_id: int, at: Optional[datetime] = None) -> None:
+        at = at or datetime.utcnow()
+        previous = self._recent.get(user_id)
+        if previous is not None and at - previous < self.window:
+            with self._lock:
+                self._stats["coalesced"] += 1
+            return
+        self._recent.set(user_id, at)
+        with self._lock:
+            self._pending[user_id] = at
+            self._stats["recorded"] += 1
+            full = len(self._pending) >= self.max_pending
+        if full:
+            # Sem o flusher rodando (ou atrasado), o buffer não cresce sem limite
+            self.flush()
+
+    def _take(self) -> dict[int, datetime]:
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        return pending
+
+    def _restore(self, pending: dict[int, datetime]) -> None:
+        # Devolve um lote que falhou sem sobrescrever logins mais novos registrados nesse meio tempo
+        with self._lock:
+            for user_id, at in pending.items():
+                current = self._pending.get(user_id)
+                if current is None or at > current:
+                    self._pending[user_id] = at
+
+    def flush(self) -> int:
+        """Grava o que está pendente. Retorna quantos usuários foram enviados ao banco."""
+        with self._flush_lock:
+            pending = self._take()
+            if not pending:
+                return 0
+            db = SessionLocal()
+            try:
+                rows = sorted(pending.items())
+                for start in range(0, len(rows), FLUSH_CHUNK):
+                    write_last_logins(db, rows[start:start + FLUSH_CHUNK])
+                db.commit()
+            except Exception as e:
+                db.rollback()
+                self._restore(pending)
+                with self._lock:
+                    self._stats["flush_failures"] += 1
+                logger.error(f"Failed to flush last_login updates: {e}")
+                return 0
+            finally:
+                db.close()
+            with self._lock:
+                self._stats["flushes"] += 1
+                self._stats["rows_flushed"] += len(rows)
+            return len(rows)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self._stats, "pending": len(self._pending)}
+
+
+def write_last_logins(db: Session, rows: list[tuple[int, datetime]]) -> None:
+    """Um UPDATE para o lote todo, sem fazer commit. rows: (user_id, last_login) em ordem de id."""
+    if db.get_bind().dialect.name == "postgresql":
+        logins = values(
+            column("user_id", Integer), column("last_login", DateTime(timezone=True)), name="logins"
+        ).data(rows)
+        db.execute(
+            update(User)
+            .where(
+                User.id == logins.c.user_id,
+                or_(User.last_login.is_(None), User.last_login < logins.c.last_login)
+            )
+            .values(last_login=logins.c.last_login)
+        )
+        return
+
+    # SQLite não aceita VALUES com nomes de coluna no FROM; executemany na mesma transação
+    # (pela tabela, para a Session não tratar a lista como bulk update do ORM)
+    users = User.__table__
+    db.execute(
+        update(users)
+        .where(
+            users.c.id == bindparam("user_id"),
+            or_(users.c.last_login.is_(None), users.c.last_login < bindparam("login_at"))
+        )
+        .values(last_login=bindparam("login_at")),
+        [{"user_id": user_id, "login_at": at} for user_id, at in rows]
+    )
+
+
+last_logins = LastLoginBuffer(settings.last_login_window_seconds, settings.last_login_max_pending)
+
+
+def record_login(user_id: int) -> None:
+    last_logins.record(user_id)
+
+
+def get_last_login_stats() -> dict:
+    return last_logins.stats()
+
+
+class LastLoginFlusher:
+    """Task no event loop que esvazia o buffer a cada last_login_flush_interval."""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = asyncio.Event()
+
+    def start(self) -> None:
+        self._stopping.clear()
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        self._stopping.set()
+        if self._task:
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        # Último flush: nada registrado antes do shutdown fica só na memória
+        flushed = await run_in_threadpool(last_logins.flush)
+        if flushed:
+            logger.info(f"Flushed {flushed} pending last_login updates on shutdown")
+
+    async def _loop(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                await asyncio.wait_for(self._stopping.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                await run_in_threadpool(last_logins.flush)
@@ -0,0 +1,199 @@
+"""
+Métricas no formato texto do Prometheus, sem dependências externas.
+
+Os valores são por processo (cada worker do uvicorn expõe os seus); o Prometheus
+agrega entre workers/instâncias.
+"""
+import contextvars
+import secrets
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Optional
+
+from fastapi import Header, HTTPException
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.config.config import settings
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+def _format_labels(names: tuple[str, ...], values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values: dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount: float = 1) -> None:
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def value(self, *label_values) -> float:
+        with self._lock:
+            return self._values.get(label_values, 0)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for label_values, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labels, label_values)} {value}")
+        return lines
+
+
+class Histogram:
+    """Histograma com buckets fixos; observe() é O(log buckets) sob um lock curto."""
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = (), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        # label_values -> [contagem por bucket..., +Inf], soma
+        self._values: dict[tuple, tuple[list[int], list[float]]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(label_values)
+            if entry is None:
+                entry = self._values[label_values] = ([0] * (len(self.buckets) + 1), [0.0])
+            entry[0][index] += 1
+            entry[1][0] += value
+
+    @contextmanager
+    def time(self, *label_values):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *label_values)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = {key: (list(counts), total[0]) for key, (counts, total) in self._values.items()}
+        for label_values, (counts, total) in sorted(snapshot.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                labels = _format_labels(self.labels, label_values, f'le="{bound}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            cumulative += counts[-1]
+            labels = _format_labels(self.labels, label_values, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            plain = _format_labels(self.labels, label_values)
+            lines.append(f"{self.name}_sum{plain} {total}")
+            lines.append(f"{self.name}_count{plain} {cumulative}")
+        return lines
+
+
+request_latency = Histogram(
+    "http_request_duration_seconds", "Latência das requisições por rota",
+    labels=("method", "route", "status"),
+)
+request_queries = Histogram(
+    "http_request_db_queries", "Queries SQL executadas por requisição",
+    labels=("method", "route"), buckets=QUERY_COUNT_BUCKETS,
+)
+external_latency = Histogram(
+    "external_call_duration_seconds", "Duração das chamadas a serviços externos",
+    labels=("service", "outcome"),
+)
+db_queries = Counter("db_queries_total", "Queries SQL executadas (inclusive fora de requisições)")
+
+_registry = [request_latency, request_queries, external_latency, db_queries]
+
+
+def render_metrics() -> str:
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+@contextmanager
+def track_external_call(service: str):
+    """Mede uma chamada externa (nominatim, firebase...) com outcome ok/error."""
+    start = time.perf_counter()
+    outcome = "error"
+    try:
+        yield
+        outcome = "ok"
+    finally:
+        external_latency.observe(time.perf_counter() - start, service, outcome)
+
+
+# Contador de queries da requisição atual. É uma lista para que as threads do
+# threadpool (que recebem uma cópia do contexto) incrementem o mesmo objeto.
+_request_queries: contextvars.ContextVar[Optional[list[int]]] = contextvars.ContextVar(
+    "request_queries", default=None
+)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _count_query(conn, cursor, statement, parameters, context, executemany):
+    db_queries.inc()
+    counter = _request_queries.get()
+    if counter is not None:
+        counter[0] += 1
+
+
+class MetricsMiddleware:
+    """
+    Middleware ASGI que mede latência e número de queries por rota. A rota é o
+    template do path ("/v1/api/photos/by_city/{city_id}"), para não criar uma
+    série por id; paths sem rota (404) entram como "unmatched".
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status = [500]
+        counter = [0]
+        token = _request_queries.set(counter)
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            _request_queries.reset(token)
+            route = scope.get("route")
+            route_path = getattr(route, "path", "unmatched")
+            request_latency.observe(elapsed, scope["method"], route_path, status[0])
+            request_queries.observe(counter[0], scope["method"], route_path)
+
+
+def require_stats_token(authorization: Optional[str] = Header(None)) -> None:
+    """
+    Dependência das rotas /stats: expõem contadores internos (pool, tokens, rate limit),
+    então só respondem com o STATS_TOKEN. Sem ele configurado as rotas nem aparecem (404).
+    """
+    if not settings.stats_token:
+        raise HTTPException(status_code=404, detail="Not Found")
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not secrets.compare_digest(token.encode(), settings.stats_token.encode()):
+        raise HTTPException(status_code=401, detail="Invalid stats token")
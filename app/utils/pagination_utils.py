@@ -0,0 +1,70 @@
+import base64
+import json
+from typing import Optional
+
+from fastapi import HTTPException, Request
+
+
+def encode_cursor(last_id: int) -> str:
+    raw = json.dumps({"id": last_id}, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[int]:
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        return int(json.loads(base64.urlsafe_b64decode(padded))["id"])
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def parse_fields(fields: Optional[str], allowed: tuple[str, ...]) -> list[str]:
+    """
+    Converte "id,image_url" na lista de colunas a selecionar.
+    O id entra sempre, pois é a chave do cursor.
+    """
+    if not fields:
+        return list(allowed)
+
+    requested = [f.strip() for f in fields.split(",") if f.strip()]
+    invalid = [f for f in requested if f not in allowed]
+    if invalid:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid fields: {', '.join(invalid)}. Allowed: {', '.join(allowed)}"
+        )
+
+    selected = ["id"] + [f for f in requested if f != "id"]
+    return list(dict.fromkeys(selected))
+
+
+def keyset_page(query, id_column, cursor: Optional[str], limit: Optional[int]) -> tuple[list[dict], Optional[str]]:
+    """
+    Executa a query ordenada por id a partir do cursor. Busca limit + 1 linhas
+    só para saber se existe próxima página. Sem limit, devolve tudo (sem cursor).
+    """
+    after_id = decode_cursor(cursor)
+    if after_id is not None:
+        query = query.filter(id_column > after_id)
+
+    query = query.order_by(id_column)
+    if limit is None:
+        return [row._asdict() for row in query.all()], None
+
+    rows = query.limit(limit + 1).all()
+    items = [row._asdict() for row in rows[:limit]]
+    next_cursor = encode_cursor(items[-1]["id"]) if len(rows) > limit else None
+    return items, next_cursor
+
+
+def page_headers(request: Request, next_cursor: Optional[str]) -> dict[str, str]:
+    """
+    O corpo das listagens continua sendo a lista (compatível com os clientes
+    antigos); a próxima página vai nos headers X-Next-Cursor e Link (rel="next").
+    """
+    if not next_cursor:
+        return {}
+    next_url = request.url.include_query_params(cursor=next_cursor)
+    return {"X-Next-Cursor": next_cursor, "Link": f'<{next_url}>; rel="next"'}
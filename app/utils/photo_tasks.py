@@ -0,0 +1,92 @@
+import logging
+from typing import Optional
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+from app.db import SessionLocal
+from app.models.photo import Photo, PHOTO_FAILED, PHOTO_PENDING, PHOTO_RESOLVED
+from app.utils.city_catalog import invalidate_city_catalog, mark_city_stats_changed
+from app.utils.city_search import mark_cities_changed
+from app.utils.city_stats_utils import record_photos
+from app.utils.city_utils import get_or_create_city, set_city_cover_if_missing
+from app.utils.geocoding_utils import get_city_and_country
+from app.utils.job_queue import enqueue, task
+
+logger = logging.getLogger("app.utils.photo_tasks")
+
+RESOLVE_PHOTO_LOCATION = "resolve_photo_location"
+
+
+def enqueue_photo_resolution(db: Session, photo_id: int) -> None:
+    enqueue(db, RESOLVE_PHOTO_LOCATION, {"photo_id": photo_id}, dedupe_key=f"{RESOLVE_PHOTO_LOCATION}:{photo_id}")
+
+
+def _load_pending_photo(db: Session, photo_id: int) -> Optional[tuple[float, float]]:
+    photo = db.get(Photo, photo_id)
+    if photo is None or photo.status != PHOTO_PENDING:
+        return None
+    return photo.latitude, photo.longitude
+
+
+def _attach_city(db: Session, photo_id: int, city_name: str, country_name: str) -> None:
+    city_id, has_cover, city_created = get_or_create_city(db, city_name, country_name)
+    photo = db.execute(
+        update(Photo)
+        .where(Photo.id == photo_id, Photo.status == PHOTO_PENDING)
+        .values(city_id=city_id, status=PHOTO_RESOLVED)
+        .returning(Photo.user_id, Photo.latitude, Photo.longitude)
+    ).first()
+    if photo is None:
+        # Outra execução do mesmo job já resolveu a foto
+        db.rollback()
+        return
+
+    cover_updated = not has_cover and set_city_cover_if_missing(db, city_id, photo_id)
+    record_photos(db, [(city_id, photo.user_id, photo.latitude, photo.longitude)])
+    db.commit()
+    logger.info(f"Resolved photo {photo_id} to city ID {city_id}")
+    mark_city_stats_changed()
+
+    if city_created:
+        mark_cities_changed([city_id])
+    if city_created or cover_updated:
+        invalidate_city_catalog()
+
+
+def _mark_photo_failed(photo_id: int) -> None:
+    db = SessionLocal()
+    try:
+        db.execute(
+            update(Photo)
+            .where(Photo.id == photo_id, Photo.status == PHOTO_PENDING)
+            .values(status=PHOTO_FAILED)
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+async def _on_resolve_failure(payload: dict, error: str) -> None:
+    await run_in_threadpool(_mark_photo_failed, payload["photo_id"])
+
+
+@task(RESOLVE_PHOTO_LOCATION, on_failure=_on_resolve_failure)
+async def resolve_photo_location(payload: dict) -> None:
+    """Geocodifica uma foto "pending", liga à cidade (criando se preciso) e define a capa."""
+    photo_id = payload["photo_id"]
+    db = SessionLocal()
+    try:
+        point = await run_in_threadpool(_load_pending_photo, db, photo_id)
+        if point is None:
+            return
+
+        location = await get_city_and_country(*point, db)
+        if not location:
+            # Pode ser falha temporária do Nominatim: deixa a fila tentar de novo
+            raise LookupError("City not found for given coordinates")
+
+        await run_in_threadpool(_attach_city, db, photo_id, *location)
+    finally:
+        db.close()
@@ -0,0 +1,219 @@
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from fastapi.concurrency import run_in_threadpool
+
+from app.config.config import settings
+from app.utils.firebase_utils import verify_id_token
+
+logger = logging.getLogger("app.utils.rate_limit_utils")
+
+_PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+
+class RateLimit:
+    """Limite "N/período" como token bucket: rajada de até N, reposição contínua de N por período."""
+
+    def __init__(self, capacity: int, period_seconds: float):
+        self.capacity = capacity
+        self.refill_rate = capacity / period_seconds
+
+    @classmethod
+    def parse(cls, value: str) -> "RateLimit":
+        # Ex.: "30/minute", "5/second"
+        try:
+            count, period = value.split("/")
+            return cls(int(count), _PERIODS[period.strip().rstrip("s")])
+        except (ValueError, KeyError):
+            raise RuntimeError(f"Invalid rate limit '{value}' (expected e.g. '30/minute')")
+
+
+class RateLimitBackend:
+    """Interface dos backends: consome um token e retorna quantos segundos esperar (0 se permitido)."""
+
+    def hit(self, key: str, limit: RateLimit) -> float:
+        raise NotImplementedError
+
+
+class InMemoryRateLimitBackend(RateLimitBackend):
+    """Buckets locais do processo; cada worker do uvicorn aplica o limite separadamente."""
+
+    def __init__(self, maxsize: int = 100_000):
+        self.maxsize = maxsize
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def hit(self, key: str, limit: RateLimit) -> float:
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (limit.capacity, now))
+            tokens = min(limit.capacity, tokens + (now - updated) * limit.refill_rate)
+            if tokens >= 1:
+                tokens -= 1
+                wait = 0.0
+            else:
+                wait = (1 - tokens) / limit.refill_rate
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            # Bucket esquecido equivale a bucket cheio, então descartar os mais antigos é seguro
+            while len(self._buckets) > self.maxsize:
+                self._buckets.popitem(last=False)
+        return wait
+
+
+# Token bucket atômico no Redis: KEYS[1] = bucket; ARGV = capacidade, taxa/s, agora
+_REDIS_TOKEN_BUCKET = """
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local tokens = tonumber(bucket[1]) or capacity
+local updated = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated) * rate)
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return tostring(wait)
+"""
+
+
+class RedisRateLimitBackend(RateLimitBackend):
+    """Buckets compartilhados entre workers/instâncias. Requer o pacote redis."""
+
+    def __init__(self, url: str):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("RATE_LIMIT_BACKEND=redis requires the 'redis' package to be installed")
+        self._client = redis.Redis.from_url(url)
+        self._script = self._client.register_script(_REDIS_TOKEN_BUCKET)
+
+    def hit(self, key: str, limit: RateLimit) -> float:
+        wait = self._script(keys=[f"ratelimit:{key}"], args=[limit.capacity, limit.refill_rate, time.time()])
+        return float(wait)
+
+
+def create_rate_limit_backend() -> RateLimitBackend:
+    if settings.rate_limit_backend == "redis":
+        if not settings.cache_redis_url:
+            raise RuntimeError("RATE_LIMIT_BACKEND=redis requires CACHE_REDIS_URL")
+        return RedisRateLimitBackend(settings.cache_redis_url)
+    return InMemoryRateLimitBackend()
+
+
+_stats_lock = threading.Lock()
+_stats: dict[str, dict[str, int]] = {}
+
+
+def _count(route: str, outcome: str) -> None:
+    with _stats_lock:
+        counters = _stats.setdefault(route, {"allowed": 0, "rejected": 0, "backend_errors": 0})
+        counters[outcome] += 1
+
+
+def get_rate_limit_stats() -> dict:
+    with _stats_lock:
+        return {route: dict(counters) for route, counters in _stats.items()}
+
+
+class RateLimitMiddleware:
+    """
+    Middleware ASGI que aplica settings.rate_limits ("MÉTODO /caminho" -> "N/período").
+    Rotas sem regra passam direto, sem nenhum custo além de um lookup no dict.
+    Requisições sem ID token válido consomem do bucket do IP do cliente. Com token
+    (verificado aqui, pelo cache de tokens), consomem do bucket do uid do Firebase
+    e de um bucket do IP com rate_limit_authenticated_ip_factor vezes o limite:
+    usuários atrás do mesmo IP têm cotas separadas, mas um IP não escapa do limite
+    trocando de conta indefinidamente. Basta um bucket vazio para a resposta ser 429.
+    """
+
+    def __init__(self, app, rules: Optional[dict[str, str]] = None, backend: Optional[RateLimitBackend] = None):
+        self.app = app
+        rules = settings.rate_limits if rules is None else rules
+        self.rules = {
+            tuple(route.split(" ", 1)): RateLimit.parse(limit) for route, limit in rules.items()
+        }
+        self._backend = backend
+
+    @property
+    def backend(self) -> RateLimitBackend:
+        if self._backend is None:
+            self._backend = create_rate_limit_backend()
+        return self._backend
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.rate_limit_enabled:
+            return await self.app(scope, receive, send)
+
+        limit = self.rules.get((scope["method"], scope["path"]))
+        if limit is None:
+            return await self.app(scope, receive, send)
+
+        route = f"{scope['method']} {scope['path']}"
+        try:
+            buckets = await _client_buckets(scope, limit)
+            # Lista, não gerador: todos os buckets são cobrados mesmo se o primeiro já recusar
+            wait = max([self.backend.hit(f"{route}:{key}", bucket_limit) for key, bucket_limit in buckets])
+        except Exception as e:
+            # Backend fora do ar não derruba a API: a requisição passa sem limite
+            logger.error(f"Rate limit backend failed: {e}")
+            _count(route, "backend_errors")
+            return await self.app(scope, receive, send)
+
+        if wait <= 0:
+            _count(route, "allowed")
+            return await self.app(scope, receive, send)
+
+        _count(route, "rejected")
+        await send({
+            "type": "http.response.start",
+            "status": 429,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"retry-after", str(math.ceil(wait)).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": b'{"detail":"Too many requests"}'})
+
+
+async def _client_buckets(scope, limit: RateLimit) -> list[tuple[str, RateLimit]]:
+    """Buckets cobrados pela requisição: o do usuário autenticado ou, sem token válido, o do IP."""
+    headers = dict(scope["headers"])
+    ip_key = _client_ip_key(scope, headers)
+
+    authorization = headers.get(b"authorization", b"").decode("latin-1")
+    if authorization.startswith("Bearer "):
+        try:
+            claims = await run_in_threadpool(verify_id_token, authorization[7:])
+        except Exception:
+            # Token inválido conta como anônimo; a rota decide se aceita ou não
+            claims = None
+        if claims and claims.get("uid"):
+            factor = max(settings.rate_limit_authenticated_ip_factor, 1)
+            shared_ip = RateLimit(limit.capacity * factor, limit.capacity / limit.refill_rate)
+            return [(f"user:{claims['uid']}", limit), (f"users-{ip_key}", shared_ip)]
+    return [(ip_key, limit)]
+
+
+def _client_ip_key(scope, headers: dict) -> str:
+    hops = settings.rate_limit_trusted_proxy_hops
+    if hops > 0:
+        forwarded = headers.get(b"x-forwarded-for")
+        if forwarded:
+            # O começo da lista é escrito pelo cliente; só as entradas acrescentadas pelos
+            # nossos proxies (as últimas rate_limit_trusted_proxy_hops) são confiáveis
+            entries = [entry.strip() for entry in forwarded.decode("latin-1").split(",") if entry.strip()]
+            if entries:
+                return f"ip:{entries[-min(hops, len(entries))]}"
+
+    client = scope.get("client")
+    return f"ip:{client[0] if client else 'unknown'}"
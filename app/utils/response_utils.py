@@ -0,0 +1,31 @@
+import json
+from typing import Any, Optional
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # orjson é opcional: sem ele cai no json da stdlib
+    orjson = None
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse codificada com orjson. Resposta padrão da aplicação (ver main.py)."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def rows_response(items: list, headers: Optional[dict[str, str]] = None) -> FastJSONResponse:
+    """
+    Resposta de listagem já pronta: devolver um Response faz o FastAPI pular a
+    validação/serialização pelo response_model, que aqui só repetiria o trabalho
+    (as linhas vêm direto do banco, com tipos já compatíveis com JSON).
+    """
+    return FastJSONResponse(items, headers=headers)
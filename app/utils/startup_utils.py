@@ -0,0 +1,65 @@
+"""
+Relatório de startup: quanto tempo cada fase levou (importação dos módulos,
+threadpool, aquecimento do pool do banco, chaves do Firebase, worker de jobs).
+
+Registrado pelo lifespan de app.main, logado ao fim do startup e exposto em
+/stats/startup, junto com avisos de configuração detectados no startup.
+"""
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+logger = logging.getLogger("app.utils.startup_utils")
+
+_lock = threading.Lock()
+_phases: dict[str, float] = {}
+_warnings: list[str] = []
+_started_at: Optional[float] = None
+_ready_at: Optional[float] = None
+
+
+def mark_start(at: Optional[float] = None) -> None:
+    """Marca o início do processo (normalmente o topo de app.main, antes dos imports)."""
+    global _started_at
+    _started_at = at if at is not None else time.perf_counter()
+
+
+def record(phase: str, seconds: float) -> None:
+    with _lock:
+        _phases[phase] = seconds
+
+
+def warn(message: str) -> None:
+    """Configuração suspeita, mas que pode ser intencional: logada e listada no relatório."""
+    logger.warning(message)
+    with _lock:
+        if message not in _warnings:
+            _warnings.append(message)
+
+
+@contextmanager
+def timed(phase: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(phase, time.perf_counter() - start)
+
+
+def mark_ready() -> None:
+    global _ready_at
+    _ready_at = time.perf_counter()
+    report = get_startup_report()
+    logger.info("Startup finished", extra={"total_seconds": report["total_seconds"], **report["phases"]})
+
+
+def get_startup_report() -> dict:
+    with _lock:
+        phases = {phase: round(seconds, 4) for phase, seconds in _phases.items()}
+        warnings = list(_warnings)
+    total = None
+    if _started_at is not None and _ready_at is not None:
+        total = round(_ready_at - _started_at, 4)
+    return {"ready": _ready_at is not None, "total_seconds": total, "phases": phases, "warnings": warnings}
@@ -0,0 +1,65 @@
+from typing import Callable, Iterable, Iterator, Literal
+
+from fastapi.responses import StreamingResponse
+
+from app.db import SessionLocal
+from app.utils.response_utils import dumps
+
+ExportFormat = Literal["ndjson", "json"]
+
+EXPORT_BATCH_SIZE = 1000
+CHUNK_SIZE = 64 * 1024
+
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "json": "application/json",
+}
+
+
+def stream_rows(statement) -> Iterator:
+    """
+    Executa o SELECT com cursor no servidor (stream_results), trazendo as linhas
+    em lotes de EXPORT_BATCH_SIZE. Abre a própria sessão: a de get_db já foi
+    fechada quando o corpo da resposta começa a ser enviado.
+    """
+    db = SessionLocal()
+    try:
+        result = db.execute(
+            statement.execution_options(stream_results=True, yield_per=EXPORT_BATCH_SIZE)
+        )
+        yield from result
+    finally:
+        db.close()
+
+
+def _encode(items: Iterable[dict], fmt: ExportFormat) -> Iterator[bytes]:
+    # Agrupa as linhas em blocos de ~64KB para não mandar uma mensagem ASGI por linha
+    buffer = bytearray(b"[" if fmt == "json" else b"")
+    first = True
+
+    for item in items:
+        if fmt == "ndjson":
+            buffer += dumps(item) + b"\n"
+        else:
+            if not first:
+                buffer += b","
+            buffer += dumps(item)
+        first = False
+
+        if len(buffer) >= CHUNK_SIZE:
+            yield bytes(buffer)
+            buffer.clear()
+
+    if fmt == "json":
+        buffer += b"]"
+    if buffer:
+        yield bytes(buffer)
+
+
+def export_response(
+    statement,
+    fmt: ExportFormat,
+    to_items: Callable[[Iterator], Iterable[dict]] = lambda rows: (row._asdict() for row in rows)
+) -> StreamingResponse:
+    items = to_items(stream_rows(statement))
+    return StreamingResponse(_encode(items, fmt), media_type=MEDIA_TYPES[fmt])
@@ -0,0 +1,252 @@
+"""
+Tradução dos nomes de cidades, fora do caminho do upload.
+
+Uso para reprocessar as traduções existentes: python -m app.utils.translation_utils backfill
+"""
+import asyncio
+import logging
+import sys
+from typing import Optional
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select, tuple_
+from sqlalchemy.orm import Session
+
+from app.config.config import settings
+from app.db import SessionLocal
+from app.models.city import City, CityTranslation
+from app.models.translation_memo import TranslationMemo
+from app.utils.city_catalog import invalidate_city_catalog
+from app.utils.city_search import mark_cities_changed
+from app.utils.db_utils import dialect_insert
+from app.utils.http_utils import get_http_client, nominatim_throttle
+from app.utils.job_queue import enqueue, task
+from app.utils.metrics_utils import track_external_call
+
+logger = logging.getLogger("app.utils.translation_utils")
+
+TRANSLATE_CITIES = "translate_cities"
+
+# Os nomes vêm do Nominatim em inglês, então "en" nunca precisa de provedor
+SOURCE_LANGUAGE = "en"
+
+CityKey = tuple[str, str]  # (name, country)
+
+
+class TranslationProvider:
+    """Interface dos provedores: traduz vários nomes de cidade para um idioma."""
+
+    name = "base"
+
+    async def translate(self, cities: list[CityKey], language: str) -> dict[CityKey, str]:
+        raise NotImplementedError
+
+
+class IdentityTranslationProvider(TranslationProvider):
+    """Substituto offline: mantém o nome em inglês (comportamento original)."""
+
+    name = "identity"
+
+    async def translate(self, cities: list[CityKey], language: str) -> dict[CityKey, str]:
+        return {city: city[0] for city in cities}
+
+
+class NominatimTranslationProvider(TranslationProvider):
+    """
+    Usa os nomes localizados (namedetails) do OpenStreetMap via busca do Nominatim.
+    A política de uso pede no máximo 1 requisição por segundo e um User-Agent
+    identificável: as buscas passam pelo mesmo throttle do processo que a
+    geocodificação reversa (nominatim_throttle) e levam settings.nominatim_user_agent.
+    """
+
+    name = "nominatim"
+
+    async def translate(self, cities: list[CityKey], language: str) -> dict[CityKey, str]:
+        results = {}
+        for city in cities:
+            translated = await self._lookup(city, language)
+            if translated:
+                results[city] = translated
+        return results
+
+    async def _lookup(self, city: CityKey, language: str) -> Optional[str]:
+        params = {
+            "city": city[0],
+            "country": city[1],
+            "format": "json",
+            "limit": 1,
+            "namedetails": 1,
+            "accept-language": language,
+        }
+        try:
+            await nominatim_throttle.wait(settings.nominatim_min_interval_seconds)
+            with track_external_call("nominatim_search"):
+                response = await get_http_client().get(
+                    settings.nominatim_search_url,
+                    params=params,
+                    headers={"User-Agent": settings.nominatim_user_agent}
+                )
+                response.raise_for_status()
+            places = response.json()
+        except Exception as e:
+            logger.warning(f"Nominatim translation lookup failed for {city}: {e}")
+            return None
+        if not places:
+            return None
+        names = places[0].get("namedetails") or {}
+        return names.get(f"name:{language}")
+
+
+_providers = {
+    IdentityTranslationProvider.name: IdentityTranslationProvider,
+    NominatimTranslationProvider.name: NominatimTranslationProvider,
+}
+
+
+def get_translation_provider() -> TranslationProvider:
+    try:
+        return _providers[settings.translation_provider]()
+    except KeyError:
+        raise RuntimeError(f"Unknown TRANSLATION_PROVIDER: {settings.translation_provider}")
+
+
+def enqueue_city_translation(db: Session, city_ids: list[int]) -> None:
+    if city_ids:
+        enqueue(db, TRANSLATE_CITIES, {"city_ids": sorted(city_ids)})
+
+
+def _load_cities(db: Session, city_ids: list[int]) -> tuple[dict[int, CityKey], dict[tuple[int, str], str]]:
+    cities = {
+        row.id: (row.name, row.country)
+        for row in db.execute(select(City.id, City.name, City.country).where(City.id.in_(city_ids)))
+    }
+    existing = {
+        (row.city_id, row.language): row.translated_name
+        for row in db.execute(
+            select(CityTranslation.city_id, CityTranslation.language, CityTranslation.translated_name)
+            .where(CityTranslation.city_id.in_(city_ids))
+        )
+    }
+    return cities, existing
+
+
+def _load_memo(db: Session, keys: list[CityKey], language: str) -> dict[CityKey, str]:
+    if not keys:
+        return {}
+    rows = db.execute(
+        select(TranslationMemo.name, TranslationMemo.country, TranslationMemo.translated_name)
+        .where(
+            TranslationMemo.language == language,
+            tuple_(TranslationMemo.name, TranslationMemo.country).in_(keys)
+        )
+    )
+    return {(row.name, row.country): row.translated_name for row in rows}
+
+
+def _save(db: Session, memo_rows: list[dict], translation_rows: list[dict]) -> None:
+    if memo_rows:
+        db.execute(
+            dialect_insert(db, TranslationMemo)
+            .on_conflict_do_nothing(index_elements=["name", "country", "language"]),
+            memo_rows
+        )
+    if translation_rows:
+        statement = dialect_insert(db, CityTranslation)
+        db.execute(
+            statement.on_conflict_do_update(
+                index_elements=["city_id", "language"],
+                set_={"translated_name": statement.excluded.translated_name}
+            ),
+            translation_rows
+        )
+    db.commit()
+
+
+def _needs_translation(existing: dict, city_id: int, city: CityKey, language: str) -> bool:
+    # Linha ausente ou ainda com o nome em inglês copiado na criação
+    current = existing.get((city_id, language))
+    return current is None or (language != SOURCE_LANGUAGE and current == city[0])
+
+
+async def translate_cities(city_ids: list[int], provider: Optional[TranslationProvider] = None) -> int:
+    """
+    Traduz as cidades para todos os idiomas de settings.supported_languages.
+    Consulta primeiro a translation_memo; só o que falta vai ao provedor, em lotes.
+    Retorna o número de traduções gravadas.
+    """
+    provider = provider or get_translation_provider()
+    db = SessionLocal()
+    try:
+        cities, existing = await run_in_threadpool(_load_cities, db, city_ids)
+        translation_rows = []
+        memo_rows = []
+
+        for language in settings.supported_languages:
+            pending = {
+                city_id: city for city_id, city in cities.items()
+                if _needs_translation(existing, city_id, city, language)
+            }
+            if not pending:
+                continue
+
+            if language == SOURCE_LANGUAGE:
+                found = {city: city[0] for city in pending.values()}
+            else:
+                keys = list(set(pending.values()))
+                found = await run_in_threadpool(_load_memo, db, keys, language)
+                missing = [key for key in keys if key not in found]
+                for start in range(0, len(missing), settings.translation_batch_size):
+                    chunk = missing[start:start + settings.translation_batch_size]
+                    translated = await provider.translate(chunk, language)
+                    found.update(translated)
+                    # A identidade não é tradução de verdade: não vai para a memo
+                    if provider.name != IdentityTranslationProvider.name:
+                        memo_rows.extend(
+                            {"name": n, "country": c, "language": language,
+                             "translated_name": t, "provider": provider.name}
+                            for (n, c), t in translated.items()
+                        )
+
+            for city_id, city in pending.items():
+                translated_name = found.get(city, city[0])
+                if existing.get((city_id, language)) != translated_name:
+                    translation_rows.append(
+                        {"city_id": city_id, "language": language, "translated_name": translated_name}
+                    )
+
+        await run_in_threadpool(_save, db, memo_rows, translation_rows)
+    finally:
+        db.close()
+
+    if translation_rows:
+        mark_cities_changed({row["city_id"] for row in translation_rows})
+        invalidate_city_catalog()
+    return len(translation_rows)
+
+
+@task(TRANSLATE_CITIES)
+async def translate_cities_task(payload: dict) -> None:
+    await translate_cities(payload["city_ids"])
+
+
+def enqueue_translation_backfill() -> int:
+    """Enfileira a tradução de todas as cidades, em lotes de translation_batch_size."""
+    db = SessionLocal()
+    try:
+        city_ids = [row.id for row in db.execute(select(City.id).order_by(City.id))]
+        size = settings.translation_batch_size
+        for start in range(0, len(city_ids), size):
+            enqueue_city_translation(db, city_ids[start:start + size])
+        db.commit()
+        return len(city_ids)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    if sys.argv[1:] == ["backfill"]:
+        logger.info(f"Enqueued translation of {enqueue_translation_backfill()} cities")
+    else:
+        print("Usage: python -m app.utils.translation_utils backfill")
+        sys.exit(1)
@@ -0,0 +1,90 @@
+import secrets
+from typing import Optional
+
+from fastapi import HTTPException
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.models.user import User
+from app.models.user_provider import UserProvider
+from app.utils.db_utils import dialect_insert
+
+# Tentativas de gerar um username livre antes de desistir
+USERNAME_ATTEMPTS = 5
+
+# Coluna única violada -> mensagem de erro da API. firebase_uid vem antes de email
+# porque o nome da constraint/índice é o que identifica a coluna
+_UNIQUE_FIELDS = (
+    ("firebase_uid", "Firebase UID already exists"),
+    ("username", "Username already exists"),
+    ("email", "Email already exists"),
+)
+
+
+def unique_violation_field(error: IntegrityError) -> Optional[str]:
+    """
+    Descobre qual coluna única foi violada: pelo nome da constraint no Postgres
+    (ex.: ix_users_email) ou pela mensagem do SQLite ("UNIQUE constraint failed: users.email").
+    """
+    diag = getattr(error.orig, "diag", None)
+    source = (getattr(diag, "constraint_name", None) or str(error.orig)).lower()
+    for field, _ in _UNIQUE_FIELDS:
+        if field in source:
+            return field
+    return None
+
+
+def raise_for_unique_violation(error: IntegrityError) -> None:
+    field = unique_violation_field(error)
+    for name, message in _UNIQUE_FIELDS:
+        if name == field:
+            raise HTTPException(status_code=400, detail=message)
+    raise error
+
+
+def _username_candidates(username: Optional[str], base: str) -> list[tuple[str, bool]]:
+    # (username, gerado): o informado pelo cliente é tentado uma vez só
+    if username and username.strip():
+        return [(username, False)]
+    return [(base, True)] + [(f"{base}_{secrets.token_hex(2)}", True) for _ in range(USERNAME_ATTEMPTS - 1)]
+
+
+def insert_user(
+    db: Session,
+    email: str,
+    username: Optional[str],
+    username_base: str,
+    firebase_uid: Optional[str] = None,
+    provider: Optional[str] = None,
+    **values
+) -> tuple[int, str]:
+    """
+    Cria o usuário sem consultas prévias, contando com os índices únicos de User.
+    O conflito de username é tratado com ON CONFLICT DO NOTHING (e, se o username
+    foi gerado, nova tentativa com sufixo); email/firebase_uid duplicados viram
+    IntegrityError, mapeado para 400. Retorna (user_id, username) sem fazer commit.
+    """
+    for candidate, generated in _username_candidates(username, username_base):
+        statement = (
+            dialect_insert(db, User)
+            .values(email=email, username=candidate, firebase_uid=firebase_uid, **values)
+            .on_conflict_do_nothing(index_elements=["username"])
+            .returning(User.id)
+        )
+        try:
+            user_id = db.execute(statement).scalar()
+        except IntegrityError as e:
+            db.rollback()
+            raise_for_unique_violation(e)
+        if user_id is not None:
+            break
+        if not generated:
+            raise HTTPException(status_code=400, detail="Username already exists")
+    else:
+        raise HTTPException(status_code=409, detail="Could not generate a unique username, try again")
+
+    if provider:
+        db.execute(
+            dialect_insert(db, UserProvider).values(user_id=user_id, provider=provider, provider_uid=firebase_uid)
+        )
+    return user_id, candidate
@@ -0,0 +1,94 @@
+"""
+Teste de carga de uploads concorrentes (POST /photos) enquanto GET /cities é
+consultado em paralelo, para medir se o geocoding trava o resto da API.
+
+Uso (com a API já rodando apontando NOMINATIM_URL para o stub):
+    python -m benchmarks.load_upload --base-url http://127.0.0.1:8000 \\
+        --stub-nominatim-port 8081 --nominatim-delay 0.5 --uploads 400 --concurrency 100
+"""
+import argparse
+import asyncio
+import random
+import time
+
+import httpx
+
+from benchmarks.stats import summarize
+from benchmarks.stubs import make_nominatim_app, start_stub_server
+
+
+async def _upload(client: httpx.AsyncClient, base_url: str, latencies: list, errors: list):
+    payload = {
+        "image_url": "https://res.cloudinary.com/demo/image/upload/v1/travelapp/sample.jpg",
+        # Coordenadas espalhadas para não acertar o cache de geocoding
+        "latitude": random.uniform(-60, 60),
+        "longitude": random.uniform(-170, 170),
+        "user_id": 1,
+    }
+    start = time.perf_counter()
+    try:
+        response = await client.post(f"{base_url}/v1/api/photos", json=payload)
+    except httpx.HTTPError as e:
+        errors.append(type(e).__name__)
+        return
+    latencies.append(time.perf_counter() - start)
+    if response.status_code >= 400:
+        errors.append(response.status_code)
+
+
+async def _probe_cities(client: httpx.AsyncClient, base_url: str, latencies: list, stop: asyncio.Event):
+    while not stop.is_set():
+        start = time.perf_counter()
+        try:
+            await client.get(f"{base_url}/v1/api/cities")
+        except httpx.HTTPError:
+            pass
+        latencies.append(time.perf_counter() - start)
+        await asyncio.sleep(0.05)
+
+
+async def run(base_url: str, uploads: int, concurrency: int) -> dict:
+    upload_latencies, city_latencies, errors = [], [], []
+    semaphore = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency + 5)
+
+    async with httpx.AsyncClient(timeout=120, limits=limits) as client:
+        stop = asyncio.Event()
+        probe = asyncio.create_task(_probe_cities(client, base_url, city_latencies, stop))
+
+        async def bounded():
+            async with semaphore:
+                await _upload(client, base_url, upload_latencies, errors)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(bounded() for _ in range(uploads)))
+        elapsed = time.perf_counter() - start
+        stop.set()
+        await probe
+
+    return {
+        "uploads": summarize(upload_latencies, elapsed),
+        "upload_errors": errors,
+        "cities_during_load": summarize(city_latencies),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--uploads", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--stub-nominatim-port", type=int, default=None)
+    parser.add_argument("--nominatim-delay", type=float, default=0.5)
+    args = parser.parse_args()
+
+    if args.stub_nominatim_port:
+        start_stub_server(make_nominatim_app(args.nominatim_delay), args.stub_nominatim_port)
+
+    result = asyncio.run(run(args.base_url, args.uploads, args.concurrency))
+    for name, value in result.items():
+        print(f"{name}: {value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+Dados sintéticos para benchmarks: usuários, cidades (com traduções e city_stats)
+e fotos espalhadas em volta de cada cidade. Determinístico para uma mesma seed.
+
+Uso (cria as tabelas se preciso):
+    DATABASE_URL=sqlite:///bench.db python -m benchmarks.seed --scale small
+"""
+import argparse
+import random
+import time
+
+SCALES = {
+    # cidades, fotos, usuários
+    "tiny": (20, 2_000, 50),
+    "small": (100, 20_000, 500),
+    "medium": (1_000, 200_000, 5_000),
+    "large": (5_000, 1_000_000, 50_000),
+}
+
+CHUNK = 5_000
+
+
+def create_tables() -> None:
+    import importlib
+    import pkgutil
+
+    import app.models
+    from app.db import Base, engine
+
+    for module in pkgutil.iter_modules(app.models.__path__):
+        importlib.import_module(f"app.models.{module.name}")
+    Base.metadata.create_all(engine)
+
+
+def city_centers(cities: int, seed: int = 42) -> dict[int, tuple[float, float]]:
+    rng = random.Random(seed)
+    return {city_id: (rng.uniform(-55, 65), rng.uniform(-170, 170)) for city_id in range(1, cities + 1)}
+
+
+def seed_database(cities: int, photos: int, users: int, seed: int = 42) -> dict:
+    """Apaga e recria os dados de benchmark. Retorna os ids/coordenadas usados pelos cenários."""
+    from sqlalchemy import delete, func, insert, select, text, update
+
+    from app.config.config import settings
+    from app.db import SessionLocal
+    from app.models.city import City, CityTranslation
+    from app.models.city_stats import CityContributor, CityStats
+    from app.models.photo import Photo
+    from app.models.user import User
+    from app.models.user_provider import UserProvider
+    from app.utils.city_stats_utils import refresh_city_stats
+    from app.utils.geo_utils import PHOTO_GEOHASH_PRECISION, geohash_encode
+
+    rng = random.Random(seed + 1)
+    start = time.perf_counter()
+    db = SessionLocal()
+    try:
+        for model in (CityContributor, CityStats, CityTranslation, UserProvider, Photo, City, User):
+            db.execute(delete(model))
+        db.commit()
+
+        db.execute(insert(User), [
+            {"id": i, "username": f"user_{i}", "email": f"user_{i}@bench.local", "firebase_uid": f"uid-{i}"}
+            for i in range(1, users + 1)
+        ])
+        db.execute(insert(UserProvider), [
+            {"user_id": i, "provider": "email", "provider_uid": f"uid-{i}"} for i in range(1, users + 1)
+        ])
+
+        centers = city_centers(cities, seed)
+        city_rows, translation_rows = [], []
+        for city_id, (lat, lon) in centers.items():
+            # Mesma grade de 1 grau do stub do Nominatim (benchmarks.stubs)
+            name = f"City {int(lat)}_{int(lon)} #{city_id}"
+            city_rows.append({"id": city_id, "name": name, "country": f"Country {int(lat) // 10}"})
+            translation_rows.extend(
+                {"city_id": city_id, "language": lang, "translated_name": f"{name} ({lang})"}
+                for lang in settings.supported_languages
+            )
+        db.execute(insert(City), city_rows)
+        db.execute(insert(CityTranslation), translation_rows)
+
+        # Distribuição desigual (Zipf aproximado): poucas cidades concentram muitas fotos
+        weights = [1 / rank for rank in range(1, cities + 1)]
+        city_ids = list(centers)
+        for offset in range(0, photos, CHUNK):
+            rows = []
+            for photo_id in range(offset + 1, min(offset + CHUNK, photos) + 1):
+                city_id = rng.choices(city_ids, weights)[0]
+                lat = centers[city_id][0] + rng.gauss(0, 0.05)
+                lon = centers[city_id][1] + rng.gauss(0, 0.05)
+                rows.append({
+                    "id": photo_id,
+                    "image_url": f"https://res.cloudinary.com/demo/image/upload/v1/bench/{photo_id}.jpg",
+                    "city_id": city_id,
+                    "latitude": lat,
+                    "longitude": lon,
+                    "user_id": rng.randint(1, users),
+                    "geohash": geohash_encode(lat, lon, PHOTO_GEOHASH_PRECISION),
+                })
+            db.execute(insert(Photo), rows)
+        db.commit()
+
+        # Capa = primeira foto de cada cidade
+        first_photos = db.execute(select(Photo.city_id, func.min(Photo.id)).group_by(Photo.city_id)).all()
+        for city_id, photo_id in first_photos:
+            db.execute(update(City).where(City.id == city_id).values(cover_photo_id=photo_id))
+        db.commit()
+
+        if db.get_bind().dialect.name == "postgresql":
+            # Os ids foram inseridos explicitamente; as sequences precisam acompanhar
+            for table in ("users", "user_providers", "cities", "city_translations", "photos"):
+                db.execute(text(
+                    f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+                    f"(SELECT COALESCE(MAX(id), 1) FROM {table}))"
+                ))
+            db.commit()
+
+        refresh_city_stats(db)
+    finally:
+        db.close()
+
+    return {
+        "cities": cities,
+        "photos": photos,
+        "users": users,
+        "centers": centers,
+        "seed_seconds": round(time.perf_counter() - start, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", choices=SCALES, default="small")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    create_tables()
+    result = seed_database(*SCALES[args.scale], seed=args.seed)
+    print(f"Seeded {result['cities']} cities, {result['photos']} photos, "
+          f"{result['users']} users in {result['seed_seconds']}s")
+
+
+if __name__ == "__main__":
+    main()
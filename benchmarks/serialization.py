@@ -0,0 +1,85 @@
+"""
+Custo de CPU por linha para serializar respostas de listagem grandes (10k+ linhas):
+
+  - before: caminho antigo, linhas viram modelos Pydantic (PhotoResponse.from_orm /
+    list[PhotoResponse] como response_model), são validadas de novo e codificadas com json da stdlib
+  - after: linhas do SQLAlchemy viram dicts e vão direto para o orjson
+    (rows_response / FastJSONResponse)
+
+Uso:
+    python -m benchmarks.serialization --rows 10000 50000
+"""
+import argparse
+import json
+import os
+import random
+import time
+
+for _name in ("CLOUDINARY_CLOUD_NAME", "CLOUDINARY_API_KEY", "CLOUDINARY_API_SECRET"):
+    os.environ.setdefault(_name, "bench")
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from pydantic import TypeAdapter  # noqa: E402
+from sqlalchemy import create_engine, insert, select  # noqa: E402
+from sqlalchemy.orm import Session  # noqa: E402
+
+from app.models.photo import Photo  # noqa: E402
+from app.routers.photos import PHOTO_FIELDS  # noqa: E402
+from app.schemas.photo import PhotoResponse  # noqa: E402
+from app.utils.response_utils import dumps, orjson, rows_response  # noqa: E402
+
+
+def load_rows(count: int):
+    engine = create_engine("sqlite://")
+    Photo.__table__.create(engine)
+    rng = random.Random(42)
+    with Session(engine) as db:
+        db.execute(insert(Photo), [
+            {"image_url": f"https://res.cloudinary.com/demo/image/upload/v1/bench/{i}.jpg",
+             "city_id": rng.randint(1, 100), "latitude": rng.uniform(-90, 90),
+             "longitude": rng.uniform(-180, 180), "user_id": rng.randint(1, 1000), "geohash": None}
+            for i in range(count)
+        ])
+        db.commit()
+        return db.execute(select(*[getattr(Photo, f) for f in PHOTO_FIELDS]).order_by(Photo.id)).all()
+
+
+def before(rows) -> bytes:
+    # Objetos Pydantic por linha, revalidados pelo response_model e codificados pela stdlib
+    photos = [PhotoResponse.model_validate(row._asdict()) for row in rows]
+    adapter = TypeAdapter(list[PhotoResponse])
+    page = adapter.validate_python([p.model_dump(exclude_unset=True) for p in photos])
+    return json.dumps(jsonable_encoder(adapter.dump_python(page, mode="json", exclude_unset=True))).encode()
+
+
+def after(rows) -> bytes:
+    return rows_response([row._asdict() for row in rows]).body
+
+
+def cpu_per_row(fn, rows, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.process_time()
+        fn(rows)
+        best = min(best, time.process_time() - start)
+    return best / len(rows) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 50_000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"encoder: {'orjson ' + orjson.__version__ if orjson else 'stdlib json (orjson not installed)'}")
+    for count in args.rows:
+        rows = load_rows(count)
+        assert json.loads(before(rows)) == json.loads(after(rows)), "payloads differ"
+        old, new = cpu_per_row(before, rows, args.repeat), cpu_per_row(after, rows, args.repeat)
+        print(f"{count} rows: before {old:.2f} us/row, after {new:.2f} us/row "
+              f"({old / new:.1f}x), {len(dumps([r._asdict() for r in rows])) / count:.0f} bytes/row")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""Servidores falsos para rodar benchmarks sem rede."""
+import asyncio
+import json
+import threading
+import time
+from urllib.parse import parse_qs
+
+import uvicorn
+
+
+def make_nominatim_app(delay: float = 0.0):
+    """
+    App ASGI que imita /reverse do Nominatim. A cidade é derivada das coordenadas
+    (grade de 1 grau), então pontos próximos caem sempre na mesma cidade.
+    """
+    async def app(scope, receive, send):
+        if scope["type"] != "http":
+            return
+        query = parse_qs(scope.get("query_string", b"").decode())
+        lat = float(query.get("lat", ["0"])[0])
+        lon = float(query.get("lon", ["0"])[0])
+        if delay:
+            await asyncio.sleep(delay)
+        body = json.dumps({
+            "address": {
+                "city": f"City {int(lat)}_{int(lon)}",
+                "country": f"Country {int(lat) // 10}",
+            }
+        }).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [(b"content-type", b"application/json")],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+    return app
+
+
+def make_token(uid: str) -> str:
+    return f"bench-token:{uid}"
+
+
+def fake_token_verifier(id_token: str) -> dict:
+    """
+    Substitui a verificação do Firebase (ver firebase_utils.set_token_verifier):
+    aceita tokens gerados por make_token, válidos por uma hora.
+    """
+    prefix, _, uid = id_token.partition(":")
+    if prefix != "bench-token" or not uid:
+        raise ValueError("Invalid benchmark token")
+    now = int(time.time())
+    return {"uid": uid, "sub": uid, "email": f"{uid}@bench.local", "iat": now, "exp": now + 3600}
+
+
+def start_stub_server(app, port: int) -> uvicorn.Server:
+    """Sobe o app numa thread em 127.0.0.1:port e espera ficar pronto."""
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
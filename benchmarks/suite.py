@@ -0,0 +1,276 @@
+"""
+Suíte de benchmarks da API, reprodutível e offline: popula o banco com dados
+sintéticos, sobe um Nominatim falso, troca a verificação do Firebase por um
+verificador falso e mede:
+
+  - micro: funções isoladas (montagem do catálogo, paginação, geohash...)
+  - macro: requisições HTTP pela aplicação inteira (ASGI em processo), com
+    p50/p95/p99, vazão e queries SQL por requisição
+
+Uso:
+    python -m benchmarks.suite --scale small --output results.json
+    python -m benchmarks.suite --compare benchmarks/baseline_sqlite.json
+    DATABASE_URL=postgresql://localhost/travelapp_bench python -m benchmarks.suite
+
+Sem DATABASE_URL usa SQLite em benchmarks/bench.db. O banco informado é APAGADO e
+populado de novo; nunca aponte para um banco de verdade.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import time
+from pathlib import Path
+
+from benchmarks.seed import SCALES, city_centers, create_tables, seed_database
+from benchmarks.stats import summarize
+from benchmarks.stubs import fake_token_verifier, make_nominatim_app, make_token, start_stub_server
+
+DEFAULT_SQLITE_URL = f"sqlite:///{Path(__file__).parent / 'bench.db'}"
+
+
+def configure_environment(database_url: str, nominatim_port: int) -> None:
+    # Precisa rodar antes de qualquer import de app.*, que lê Settings na importação
+    os.environ["DATABASE_URL"] = database_url
+    os.environ["NOMINATIM_URL"] = f"http://127.0.0.1:{nominatim_port}/reverse"
+    os.environ["RATE_LIMIT_ENABLED"] = "false"
+    os.environ["JOB_WORKERS"] = "0"
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    for name in ("CLOUDINARY_CLOUD_NAME", "CLOUDINARY_API_KEY", "CLOUDINARY_API_SECRET"):
+        os.environ.setdefault(name, "bench")
+
+
+def _time_calls(fn, iterations: int) -> dict:
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(iterations):
+        call_start = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - call_start)
+    return summarize(latencies, time.perf_counter() - start)
+
+
+def run_micro(data: dict, iterations: int) -> dict:
+    from app.db import SessionLocal
+    from app.models.photo import Photo
+    from app.utils.city_catalog import build_city_catalog, build_localized_city_catalog
+    from app.utils.cloudinary_utils import build_variant_urls
+    from app.utils.firebase_utils import verify_id_token
+    from app.utils.geo_utils import geohash_encode
+    from app.utils.language_utils import parse_accept_language
+    from app.utils.pagination_utils import keyset_page
+
+    token = make_token("uid-1")
+    verify_id_token(token)
+    rng = random.Random(1)
+    db = SessionLocal()
+    try:
+        catalog_iterations = max(iterations // 20, 5)
+        return {
+            "build_city_catalog": _time_calls(lambda: build_city_catalog(db), catalog_iterations),
+            "build_localized_city_catalog": _time_calls(
+                lambda: build_localized_city_catalog(db, "pt"), catalog_iterations
+            ),
+            "keyset_page_photos_by_city": _time_calls(
+                lambda: keyset_page(db.query(Photo.id, Photo.image_url).filter(Photo.city_id == 1),
+                                    Photo.id, None, 100),
+                iterations
+            ),
+            "geohash_encode": _time_calls(
+                lambda: geohash_encode(rng.uniform(-90, 90), rng.uniform(-180, 180), 9), iterations * 10
+            ),
+            "build_variant_urls": _time_calls(
+                lambda: build_variant_urls(f"https://res.cloudinary.com/demo/image/upload/v1/bench/"
+                                           f"{rng.randint(1, data['photos'])}.jpg", "all"),
+                iterations * 10
+            ),
+            "verify_id_token_cached": _time_calls(lambda: verify_id_token(token), iterations * 10),
+            "parse_accept_language": _time_calls(
+                lambda: parse_accept_language("pt-BR,pt;q=0.9,en-US;q=0.8,en;q=0.7"), iterations * 10
+            ),
+        }
+    finally:
+        db.close()
+
+
+async def _run_scenario(client, make_request, requests: int, concurrency: int, before=None) -> dict:
+    from app.utils.metrics_utils import db_queries
+
+    latencies, errors = [], []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i: int):
+        async with semaphore:
+            if before:
+                before()
+            method, url, kwargs = make_request(i)
+            start = time.perf_counter()
+            response = await client.request(method, url, **kwargs)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                errors.append(response.status_code)
+
+    queries_before = db_queries.value()
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    elapsed = time.perf_counter() - start
+
+    summary = summarize(latencies, elapsed)
+    summary["queries_per_request"] = round((db_queries.value() - queries_before) / max(requests, 1), 2)
+    summary["errors"] = len(errors)
+    return summary
+
+
+async def run_macro(data: dict, requests: int, concurrency: int) -> dict:
+    import httpx
+
+    from app.main import app
+    from app.utils.city_catalog import invalidate_city_catalog
+    from app.utils.http_utils import close_http_client
+
+    rng = random.Random(2)
+    centers = data["centers"]
+    city_ids = list(centers)
+    users = data["users"]
+    prefix = "/v1/api"
+
+    def jitter(city_id: int) -> tuple[float, float]:
+        lat, lon = centers[city_id]
+        return lat + rng.gauss(0, 0.05), lon + rng.gauss(0, 0.05)
+
+    def upload(i):
+        # Metade em cidades existentes (cache/nearby), metade em pontos novos (Nominatim)
+        if i % 2:
+            lat, lon = jitter(rng.choice(city_ids))
+        else:
+            lat, lon = rng.uniform(-55, 65), rng.uniform(-170, 170)
+        return "POST", f"{prefix}/photos", {"json": {
+            "image_url": f"https://res.cloudinary.com/demo/image/upload/v1/bench/new_{i}.jpg",
+            "latitude": lat, "longitude": lon, "user_id": rng.randint(1, users),
+        }}
+
+    def nearest(i):
+        lat, lon = jitter(rng.choice(city_ids))
+        return "GET", f"{prefix}/photos/nearest?lat={lat}&lon={lon}&limit=20", {}
+
+    def clusters(i):
+        lat, lon = centers[rng.choice(city_ids)]
+        bbox = f"{lon - 5},{lat - 5},{lon + 5},{lat + 5}"
+        return "GET", f"{prefix}/photos/clusters?bbox={bbox}&zoom=6", {}
+
+    def current_user(i):
+        uid = f"uid-{rng.randint(1, users)}"
+        return "GET", f"{prefix}/users/current", {"headers": {"Authorization": f"Bearer {make_token(uid)}"}}
+
+    scenarios = {
+        "get_cities_cached": (lambda i: ("GET", f"{prefix}/cities", {}), None, concurrency),
+        "get_cities_uncached": (lambda i: ("GET", f"{prefix}/cities", {}), invalidate_city_catalog, 1),
+        "get_cities_localized": (lambda i: ("GET", f"{prefix}/cities?lang=pt", {}), None, concurrency),
+        # Prefixos curtos: muitas cidades casam e o ranking por fotos decide
+        "search_cities": (
+            lambda i: ("GET", f"{prefix}/cities/search?q=city+{rng.randint(-5, 6)}&lang=pt", {}), None, concurrency
+        ),
+        # Cidades 1-10 são as mais fotografadas (distribuição Zipf do seed)
+        "get_photos_by_city": (
+            lambda i: ("GET", f"{prefix}/photos/by_city/{rng.randint(1, 10)}?limit=100", {}), None, concurrency
+        ),
+        "get_photos_nearest": (nearest, None, concurrency),
+        "get_photo_clusters": (clusters, None, concurrency),
+        "get_users_page": (lambda i: ("GET", f"{prefix}/users?limit=100", {}), None, concurrency),
+        "get_current_user": (current_user, None, concurrency),
+        "create_photo": (upload, None, concurrency),
+    }
+
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+        for name, (make_request, before, scenario_concurrency) in scenarios.items():
+            # Aquecimento: caches e conexões do pool, fora da medição
+            await _run_scenario(client, make_request, min(10, requests), 1, before)
+            results[name] = await _run_scenario(client, make_request, requests, scenario_concurrency, before)
+    await close_http_client()
+    return results
+
+
+def compare(results: dict, baseline: dict) -> list[str]:
+    """Linhas com a variação de p50/p95 e queries por requisição em relação à baseline."""
+    lines = []
+    for section in ("micro", "macro"):
+        for name, current in results.get(section, {}).items():
+            previous = baseline.get(section, {}).get(name)
+            if not previous:
+                continue
+            parts = []
+            for metric in ("p50_ms", "p95_ms", "queries_per_request"):
+                if metric in current and previous.get(metric):
+                    change = (current[metric] - previous[metric]) / previous[metric] * 100
+                    parts.append(f"{metric} {previous[metric]} -> {current[metric]} ({change:+.0f}%)")
+            if parts:
+                lines.append(f"{section}.{name}: " + ", ".join(parts))
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", choices=SCALES, default="small")
+    parser.add_argument("--requests", type=int, default=200, help="requisições por cenário macro")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--iterations", type=int, default=200, help="iterações base dos micro-benchmarks")
+    parser.add_argument("--nominatim-port", type=int, default=8091)
+    parser.add_argument("--nominatim-delay", type=float, default=0.0)
+    parser.add_argument("--skip-seed", action="store_true", help="reaproveita os dados já populados")
+    parser.add_argument("--output", help="grava o resultado em JSON")
+    parser.add_argument("--compare", help="JSON de uma execução anterior para comparar")
+    args = parser.parse_args()
+
+    database_url = os.environ.get("DATABASE_URL") or DEFAULT_SQLITE_URL
+    configure_environment(database_url, args.nominatim_port)
+
+    from app.utils.firebase_utils import set_token_verifier
+
+    start_stub_server(make_nominatim_app(args.nominatim_delay), args.nominatim_port)
+    set_token_verifier(fake_token_verifier)
+    create_tables()
+
+    cities, photos, users = SCALES[args.scale]
+    if args.skip_seed:
+        data = {"cities": cities, "photos": photos, "users": users, "centers": city_centers(cities)}
+    else:
+        data = seed_database(cities, photos, users)
+        print(f"Seeded {cities} cities, {photos} photos, {users} users in {data['seed_seconds']}s")
+
+    results = {
+        "meta": {
+            "database": database_url.split(":", 1)[0],
+            "scale": args.scale,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+        },
+        "micro": run_micro(data, args.iterations),
+        "macro": asyncio.run(run_macro(data, args.requests, args.concurrency)),
+    }
+
+    for section in ("micro", "macro"):
+        print(f"\n{section}:")
+        for name, summary in results[section].items():
+            print(f"  {name}: {summary}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print(f"\ncompared with {args.compare}:")
+        for line in compare(results, baseline):
+            print(f"  {line}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+            f.write("\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,19 @@
+-- photos.geohash e índices das consultas por área/proximidade.
+--
+-- Obrigatório NO DEPLOY: todas as leituras de photos selecionam a coluna geohash,
+-- então sem ela qualquer rota de fotos falha. Ordem:
+--   1. rodar este arquivo (antes de subir o código novo)
+--   2. fazer o deploy
+--   3. preencher as fotos antigas: python -m app.utils.geohash_backfill
+--      (até lá elas só não aparecem em /photos/nearest e /photos/clusters)
+--
+-- Uso: psql "$DATABASE_URL" -f migrations/0001_photo_geohash.sql
+-- Sem --single-transaction: CREATE INDEX CONCURRENTLY não roda dentro de transação.
+
+ALTER TABLE photos ADD COLUMN IF NOT EXISTS geohash VARCHAR(12);
+
+-- text_pattern_ops: o índice atende "geohash LIKE 'prefixo%'"
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_photos_geohash ON photos (geohash text_pattern_ops);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_photos_lat_lon ON photos (latitude, longitude);
+-- Paginação por cursor em /photos/by_city: WHERE city_id = ? AND id > ? ORDER BY id
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_photos_city_id_id ON photos (city_id, id);
@@ -0,0 +1,62 @@
+-- Unicidade de cities (name, country).
+--
+-- Obrigatório NO DEPLOY: o upload cria cidades com INSERT ... ON CONFLICT (name, country),
+-- que falha no Postgres se não houver um índice único nessas colunas. Ordem:
+--   1. rodar este arquivo (antes de subir o código novo)
+--   2. fazer o deploy
+--   3. recalcular os agregados das cidades mescladas: python -m app.utils.city_stats_utils refresh
+--
+-- Antes de criar a constraint, as cidades duplicadas (criadas pela corrida que este
+-- deploy corrige) são mescladas na de menor id:
+--   - photos.city_id passa a apontar para ela
+--   - traduções em idiomas que ela ainda não tem são movidas; as demais são descartadas
+--   - ela herda a capa de uma duplicada se ainda não tiver uma
+--   - as duplicadas são apagadas (city_stats/city_contributors delas saem em cascata;
+--     o refresh do passo 3 refaz os agregados a partir das fotos)
+--
+-- Uso: psql "$DATABASE_URL" --single-transaction -f migrations/0002_city_unique_name_country.sql
+
+-- Impede que um upload crie outra duplicada enquanto a mescla roda
+LOCK TABLE cities IN SHARE ROW EXCLUSIVE MODE;
+
+CREATE TEMP TABLE city_merge ON COMMIT DROP AS
+SELECT id AS duplicate_id, keep_id
+FROM (SELECT id, min(id) OVER (PARTITION BY name, country) AS keep_id FROM cities) c
+WHERE id <> keep_id;
+
+UPDATE photos p
+SET city_id = m.keep_id
+FROM city_merge m
+WHERE p.city_id = m.duplicate_id;
+
+-- DISTINCT ON: duas duplicadas da mesma cidade podem ter o mesmo idioma
+INSERT INTO city_translations (city_id, language, translated_name)
+SELECT DISTINCT ON (m.keep_id, t.language) m.keep_id, t.language, t.translated_name
+FROM city_translations t
+JOIN city_merge m ON m.duplicate_id = t.city_id
+WHERE NOT EXISTS (
+    SELECT 1 FROM city_translations k WHERE k.city_id = m.keep_id AND k.language = t.language
+)
+ORDER BY m.keep_id, t.language, t.id;
+
+UPDATE cities c
+SET cover_photo_id = d.cover_photo_id
+FROM (
+    SELECT DISTINCT ON (m.keep_id) m.keep_id, dup.cover_photo_id
+    FROM city_merge m
+    JOIN cities dup ON dup.id = m.duplicate_id
+    WHERE dup.cover_photo_id IS NOT NULL
+    ORDER BY m.keep_id, m.duplicate_id
+) d
+WHERE c.id = d.keep_id AND c.cover_photo_id IS NULL;
+
+DELETE FROM city_translations t USING city_merge m WHERE t.city_id = m.duplicate_id;
+
+DELETE FROM cities c USING city_merge m WHERE c.id = m.duplicate_id;
+
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'uix_city_name_country') THEN
+        ALTER TABLE cities ADD CONSTRAINT uix_city_name_country UNIQUE (name, country);
+    END IF;
+END $$;
@@ -0,0 +1,35 @@
+-- Fila de jobs e photos.status.
+--
+-- Obrigatório NO DEPLOY, mesmo com PHOTO_BACKGROUND_ENRICHMENT desligado: todas as
+-- leituras de photos selecionam a coluna status. A tabela jobs passa a ser usada
+-- com PHOTO_BACKGROUND_ENRICHMENT, TRANSLATIONS_BACKGROUND ou JOB_WORKERS > 0. Ordem:
+--   1. rodar este arquivo (antes de subir o código novo)
+--   2. fazer o deploy
+--
+-- As fotos existentes recebem o default 'resolved' (já têm cidade).
+--
+-- Uso: psql "$DATABASE_URL" --single-transaction -f migrations/0003_jobs_and_photo_status.sql
+
+ALTER TABLE photos ADD COLUMN IF NOT EXISTS status VARCHAR(20) DEFAULT 'resolved' NOT NULL;
+
+CREATE TABLE IF NOT EXISTS jobs (
+    id SERIAL NOT NULL,
+    kind VARCHAR(50) NOT NULL,
+    payload JSON NOT NULL,
+    -- Evita enfileirar duas vezes a mesma tarefa (ex.: "resolve_photo_location:42")
+    dedupe_key VARCHAR(255),
+    status VARCHAR(20) DEFAULT 'pending' NOT NULL,
+    attempts INTEGER DEFAULT 0 NOT NULL,
+    max_attempts INTEGER DEFAULT 5 NOT NULL,
+    run_after TIMESTAMPTZ DEFAULT now() NOT NULL,
+    locked_at TIMESTAMPTZ,
+    last_error TEXT,
+    created_at TIMESTAMPTZ DEFAULT now(),
+    updated_at TIMESTAMPTZ DEFAULT now(),
+    PRIMARY KEY (id),
+    UNIQUE (dedupe_key)
+);
+
+CREATE INDEX IF NOT EXISTS ix_jobs_id ON jobs (id);
+-- Consulta dos workers: status = 'pending' AND run_after <= now()
+CREATE INDEX IF NOT EXISTS ix_jobs_status_run_after ON jobs (status, run_after);
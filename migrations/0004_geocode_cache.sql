@@ -0,0 +1,15 @@
+-- Cache persistente de geocodificação reversa, por célula geohash.
+--
+-- Necessário antes de ligar GEOCODE_PERSISTENT_CACHE (com a opção desligada a tabela
+-- não é consultada; se faltar com a opção ligada, o upload só perde o cache).
+--
+-- Uso: psql "$DATABASE_URL" --single-transaction -f migrations/0004_geocode_cache.sql
+
+CREATE TABLE IF NOT EXISTS geocode_cache (
+    -- Prefixo geohash da célula (precisão definida em GEOCODE_CACHE_PRECISION)
+    geohash VARCHAR(12) NOT NULL,
+    city VARCHAR NOT NULL,
+    country VARCHAR NOT NULL,
+    created_at TIMESTAMPTZ DEFAULT now(),
+    PRIMARY KEY (geohash)
+);
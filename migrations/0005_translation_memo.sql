@@ -0,0 +1,20 @@
+-- Memória das traduções de nomes de cidades já obtidas do provedor.
+--
+-- Necessário antes de ligar TRANSLATIONS_BACKGROUND ou rodar
+-- python -m app.utils.translation_utils backfill: toda tradução consulta e grava esta tabela.
+--
+-- Uso: psql "$DATABASE_URL" --single-transaction -f migrations/0005_translation_memo.sql
+
+CREATE TABLE IF NOT EXISTS translation_memo (
+    id SERIAL NOT NULL,
+    name VARCHAR NOT NULL,
+    country VARCHAR NOT NULL,
+    language VARCHAR NOT NULL,
+    translated_name VARCHAR NOT NULL,
+    provider VARCHAR(50) NOT NULL,
+    created_at TIMESTAMPTZ DEFAULT now(),
+    PRIMARY KEY (id),
+    CONSTRAINT uix_translation_memo_key UNIQUE (name, country, language)
+);
+
+CREATE INDEX IF NOT EXISTS ix_translation_memo_id ON translation_memo (id);
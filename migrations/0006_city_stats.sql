@@ -0,0 +1,33 @@
+-- Agregados por cidade (city_stats) e colaboradores distintos (city_contributors).
+--
+-- Obrigatório NO DEPLOY: /cities junta city_stats e o upload grava nas duas tabelas.
+-- Ordem:
+--   1. rodar este arquivo (antes de subir o código novo)
+--   2. fazer o deploy
+--   3. preencher os agregados das fotos existentes: python -m app.utils.city_stats_utils refresh
+--      (até lá as cidades aparecem com as contagens zeradas)
+--
+-- Uso: psql "$DATABASE_URL" --single-transaction -f migrations/0006_city_stats.sql
+
+CREATE TABLE IF NOT EXISTS city_stats (
+    city_id INTEGER NOT NULL,
+    photo_count INTEGER DEFAULT 0 NOT NULL,
+    contributor_count INTEGER DEFAULT 0 NOT NULL,
+    min_latitude FLOAT,
+    max_latitude FLOAT,
+    min_longitude FLOAT,
+    max_longitude FLOAT,
+    -- Somas para o centróide (média das coordenadas das fotos)
+    sum_latitude FLOAT DEFAULT 0 NOT NULL,
+    sum_longitude FLOAT DEFAULT 0 NOT NULL,
+    updated_at TIMESTAMPTZ DEFAULT now(),
+    PRIMARY KEY (city_id),
+    FOREIGN KEY (city_id) REFERENCES cities (id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS city_contributors (
+    city_id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    PRIMARY KEY (city_id, user_id),
+    FOREIGN KEY (city_id) REFERENCES cities (id) ON DELETE CASCADE
+);
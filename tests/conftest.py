@@ -0,0 +1,40 @@
+import os
+import tempfile
+
+# Settings é lido na importação de app.*: o ambiente de teste precisa vir antes
+_db_dir = tempfile.mkdtemp(prefix="travelapp-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_db_dir, 'test.db')}"
+os.environ.setdefault("CLOUDINARY_CLOUD_NAME", "demo")
+os.environ.setdefault("CLOUDINARY_API_KEY", "key")
+os.environ.setdefault("CLOUDINARY_API_SECRET", "secret")
+os.environ["RATE_LIMIT_ENABLED"] = "false"
+os.environ["JOB_WORKERS"] = "0"
+
+import importlib
+import pkgutil
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app.models
+from app.db import Base, SessionLocal, engine
+from app.main import app as fastapi_app
+
+for _module in pkgutil.iter_modules(app.models.__path__):
+    importlib.import_module(f"app.models.{_module.name}")
+
+
+@pytest.fixture
+def db():
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def client(db):
+    return TestClient(fastapi_app)
@@ -0,0 +1,112 @@
+import json
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from app.config.config import settings
+from app.db import Base, create_db_engine
+from app.models.city import City
+from app.models.city_stats import CityStats
+from app.utils import city_catalog
+from app.utils.cache_utils import get_cache_backend
+
+
+@pytest.fixture
+def replica_db(tmp_path, monkeypatch):
+    # "Réplica" atrasada: mesmo schema, ainda sem as cidades gravadas no primário
+    replica = create_db_engine(f"sqlite:///{tmp_path / 'replica.db'}")
+    Base.metadata.create_all(replica)
+    monkeypatch.setattr(city_catalog, "replicas", object())
+    session = sessionmaker(bind=replica)()
+    try:
+        yield session
+    finally:
+        session.close()
+        city_catalog.invalidate_city_catalog()
+        get_cache_backend().delete(city_catalog.INVALIDATED_KEY)
+        replica.dispose()
+
+
+def _city_names(body: bytes) -> list[str]:
+    return [city["name"] for city in json.loads(body)]
+
+
+def test_catalog_is_rebuilt_from_primary_after_invalidation(db, replica_db):
+    db.add(City(name="Lisbon", country="Portugal"))
+    db.commit()
+    city_catalog.invalidate_city_catalog()
+
+    body, _ = city_catalog.get_city_catalog(replica_db)
+
+    assert _city_names(body) == ["Lisbon"]
+
+
+def test_replica_catalog_is_not_cached_when_invalidated_during_build(db, replica_db, monkeypatch):
+    build = city_catalog._build_catalog
+
+    def build_then_invalidate(*args):
+        body = build(*args)
+        # Uma escrita no primário invalida o cache enquanto a réplica era lida
+        db.add(City(name="Lisbon", country="Portugal"))
+        db.commit()
+        city_catalog.invalidate_city_catalog()
+        return body
+
+    monkeypatch.setattr(city_catalog, "_build_catalog", build_then_invalidate)
+    body, _ = city_catalog.get_city_catalog(replica_db)
+    assert _city_names(body) == []
+
+    monkeypatch.setattr(city_catalog, "_build_catalog", build)
+    body, _ = city_catalog.get_city_catalog(replica_db)
+    assert _city_names(body) == ["Lisbon"]
+
+
+@pytest.fixture
+def catalog_cache():
+    yield
+    city_catalog.invalidate_city_catalog()
+    get_cache_backend().delete(city_catalog.STATS_CHANGED_KEY)
+
+
+def _photo_counts(body: bytes) -> list[int]:
+    return [city["stats"]["photo_count"] for city in json.loads(body)]
+
+
+def _lisbon_with_photos(db, count):
+    city = City(name="Lisbon", country="Portugal")
+    db.add(city)
+    db.flush()
+    db.merge(CityStats(city_id=city.id, photo_count=count, contributor_count=1,
+                       sum_latitude=38.7 * count, sum_longitude=-9.1 * count))
+    db.commit()
+    return city
+
+
+def test_catalog_keeps_serving_cache_until_stats_change(db, catalog_cache, monkeypatch):
+    monkeypatch.setattr(settings, "city_stats_max_age", 0)
+    city = _lisbon_with_photos(db, 1)
+    body, etag = city_catalog.get_city_catalog(db)
+    assert _photo_counts(body) == [1]
+
+    db.merge(CityStats(city_id=city.id, photo_count=2, contributor_count=1, sum_latitude=0, sum_longitude=0))
+    db.commit()
+    # Nada marcou city_stats como alterada: a entrada continua valendo, mesmo "velha"
+    assert city_catalog.get_city_catalog(db) == (body, etag)
+
+    city_catalog.mark_city_stats_changed()
+    body, new_etag = city_catalog.get_city_catalog(db)
+    assert _photo_counts(body) == [2]
+    assert new_etag != etag
+
+
+def test_recent_catalog_ignores_stats_changes(db, catalog_cache, monkeypatch):
+    monkeypatch.setattr(settings, "city_stats_max_age", 3600)
+    city = _lisbon_with_photos(db, 1)
+    city_catalog.get_city_catalog(db)
+
+    db.merge(CityStats(city_id=city.id, photo_count=2, contributor_count=1, sum_latitude=0, sum_longitude=0))
+    db.commit()
+    city_catalog.mark_city_stats_changed()
+
+    body, _ = city_catalog.get_city_catalog(db)
+    assert _photo_counts(body) == [1]
@@ -0,0 +1,58 @@
+import threading
+
+import pytest
+
+from app.utils import city_search
+from app.utils.city_search import CitySearchIndex, search_cities
+
+CITIES = {
+    1: ("São Paulo", "Brazil", {"en": "Sao Paulo"}),
+    2: ("Lisbon", "Portugal", {"pt": "Lisboa"}),
+    3: ("東京都", "Japan", {}),
+}
+
+
+@pytest.fixture
+def index(monkeypatch):
+    index = CitySearchIndex.from_cities(dict(CITIES))
+    index.photo_counts = {1: 5, 2: 10}
+    monkeypatch.setattr(city_search, "_index", index)
+    monkeypatch.setattr(city_search, "_thread", threading.current_thread())
+    ready = threading.Event()
+    ready.set()
+    monkeypatch.setattr(city_search, "_ready", ready)
+    return index
+
+
+def test_search_matches_prefixes_accents_and_cjk(index):
+    assert [city["id"] for city in search_cities("sao pau")] == [1]
+    assert [city["id"] for city in search_cities("京都")] == [3]
+    assert [city["display_name"] for city in search_cities("lisb", language="pt")] == ["Lisboa"]
+    # Mais fotografadas primeiro
+    assert [city["id"] for city in search_cities("p")] == [2, 1]
+
+
+def test_search_tolerates_one_typo(index):
+    assert [city["id"] for city in search_cities("lisbin")] == [2]
+
+
+def test_search_returns_city_data_taken_under_the_lock(index, monkeypatch):
+    # A thread do índice remove a cidade logo depois da busca: o resultado já a carrega
+    search = index.search
+
+    def search_then_remove(query, limit):
+        results = search(query, limit)
+        index.remove_city(2)
+        return results
+
+    monkeypatch.setattr(index, "search", search_then_remove)
+
+    assert [city["name"] for city in search_cities("lisbon")] == ["Lisbon"]
+    assert search_cities("lisbon") == []
+
+
+def test_fuzzy_pass_is_capped(monkeypatch):
+    index = CitySearchIndex.from_cities({n: (f"Berlin {n}", "Germany", {}) for n in range(1, 51)})
+    monkeypatch.setattr(city_search, "MAX_FUZZY_MATCHES", 10)
+
+    assert len(index._fuzzy_matches("berlon")) == 10
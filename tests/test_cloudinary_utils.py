@@ -0,0 +1,24 @@
+from app.utils.cloudinary_utils import _transformed_url
+
+BASE = "https://res.cloudinary.com/demo/image/upload/"
+
+
+def test_transformation_goes_before_version():
+    url = _transformed_url(f"{BASE}e_sepia/v1712/travelapp/abc.jpg", "w_200")
+
+    assert url == f"{BASE}e_sepia/w_200/v1712/travelapp/abc.jpg"
+
+
+def test_unversioned_url_keeps_existing_transformations_first():
+    url = _transformed_url(f"{BASE}c_crop,w_500/e_sepia/travelapp/abc.jpg", "w_200")
+
+    assert url == f"{BASE}c_crop,w_500/e_sepia/w_200/travelapp/abc.jpg"
+
+
+def test_unversioned_url_without_transformations():
+    assert _transformed_url(f"{BASE}my_photos/abc.jpg", "w_200") == f"{BASE}w_200/my_photos/abc.jpg"
+    assert _transformed_url(f"{BASE}abc.jpg", "w_200") == f"{BASE}w_200/abc.jpg"
+
+
+def test_non_cloudinary_url():
+    assert _transformed_url("https://example.com/abc.jpg", "w_200") is None
@@ -0,0 +1,40 @@
+import httpx
+
+from app.utils import firebase_utils
+from app.utils.firebase_utils import PublicKeyStore
+
+
+def _serve_keys(monkeypatch, *responses):
+    calls = []
+
+    def get(url, timeout):
+        calls.append(url)
+        keys = responses[min(len(calls), len(responses)) - 1]
+        return httpx.Response(200, json=keys, headers={"cache-control": "public, max-age=3600"},
+                              request=httpx.Request("GET", url))
+
+    monkeypatch.setattr(firebase_utils.httpx, "get", get)
+    return calls
+
+
+def test_unknown_kid_fetches_the_keys_again(monkeypatch):
+    calls = _serve_keys(monkeypatch, {"old": "pem-old"}, {"old": "pem-old", "new": "pem-new"})
+    store = PublicKeyStore("https://keys.example.com")
+
+    assert store.get_certs_for("old") == {"old": "pem-old"}
+    assert store.get_certs_for("new") == {"old": "pem-old", "new": "pem-new"}
+    assert len(calls) == 2
+
+
+def test_unknown_kid_refetch_is_rate_limited(monkeypatch):
+    calls = _serve_keys(monkeypatch, {"old": "pem-old"})
+    store = PublicKeyStore("https://keys.example.com")
+
+    for kid in ("forged-1", "forged-2", "forged-3"):
+        assert store.get_certs_for(kid) == {"old": "pem-old"}
+    # Download inicial + uma única nova tentativa
+    assert len(calls) == 2
+
+    monkeypatch.setattr(firebase_utils, "UNKNOWN_KID_REFETCH_SECONDS", 0)
+    store.get_certs_for("forged-4")
+    assert len(calls) == 3
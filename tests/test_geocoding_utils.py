@@ -0,0 +1,65 @@
+import asyncio
+import time
+
+import httpx
+
+from app.config.config import settings
+from app.models.city import City
+from app.models.photo import Photo
+from app.utils.geo_utils import bounding_box
+from app.utils import geocoding_utils
+from app.utils.geocoding_utils import _lookup_nearby_photo, geocode_cell, resolve_cells
+
+
+def _add_city_photos(db, name, country, points):
+    city = City(name=name, country=country)
+    db.add(city)
+    db.flush()
+    for latitude, longitude in points:
+        db.add(Photo(image_url="https://res.cloudinary.com/demo/image/upload/v1/p.jpg",
+                     city_id=city.id, latitude=latitude, longitude=longitude))
+    db.commit()
+
+
+def test_bounding_box_wraps_at_antimeridian():
+    min_lat, min_lon, max_lat, max_lon = bounding_box(0.0, 179.999, 1.0)
+
+    assert min_lon > max_lon
+    assert 179.9 < min_lon < 179.999
+    assert -180.0 < max_lon < -179.99
+
+
+def test_nearby_photo_prefers_closest_in_dense_area(db):
+    # Mais de 50 fotos no raio, todas mais longe que a da cidade certa, gravada por último
+    _add_city_photos(db, "Far", "Nowhere", [(-0.003, 0.0)] * 60)
+    _add_city_photos(db, "Near", "Somewhere", [(0.0001, 0.0)])
+
+    assert _lookup_nearby_photo(db, 0.0, 0.0) == ("Near", "Somewhere")
+
+
+def test_nearby_photo_across_antimeridian(db):
+    _add_city_photos(db, "Taveuni", "Fiji", [(-16.8, -179.999)])
+
+    assert _lookup_nearby_photo(db, -16.8, 179.999) == ("Taveuni", "Fiji")
+
+
+def test_batch_reverse_lookups_are_spaced_and_identified(monkeypatch):
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append((time.monotonic(), request.headers.get("user-agent")))
+        return httpx.Response(200, json={"address": {"city": "Ushuaia", "country": "Argentina"}})
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(geocoding_utils, "get_http_client", lambda: client)
+    monkeypatch.setattr(settings, "nominatim_min_interval_seconds", 0.05)
+    monkeypatch.setattr(settings, "nominatim_user_agent", "travelapp-tests (dev@example.com)")
+
+    points = [(-54.8 + n * 0.1, -68.3) for n in range(3)]
+    results = asyncio.run(resolve_cells({geocode_cell(*point): point for point in points}))
+
+    assert set(results.values()) == {("Ushuaia", "Argentina")}
+    assert len(requests) == 3
+    assert {agent for _, agent in requests} == {"travelapp-tests (dev@example.com)"}
+    times = [at for at, _ in requests]
+    assert all(later - earlier >= 0.045 for earlier, later in zip(times, times[1:]))
@@ -0,0 +1,120 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.config.config import settings
+from app.models.job import Job, JOB_DONE, JOB_FAILED, JOB_PENDING, JOB_RUNNING
+from app.models.photo import Photo, PHOTO_FAILED, PHOTO_PENDING
+from app.utils import job_queue, photo_tasks
+from app.utils.job_queue import claim_jobs, enqueue, run_job, unconsumed_job_settings
+
+
+def _job(db, dedupe_key=None, **values) -> Job:
+    enqueue(db, "test_job", {"n": 1}, dedupe_key=dedupe_key)
+    db.commit()
+    job = db.query(Job).order_by(Job.id.desc()).first()
+    for key, value in values.items():
+        setattr(job, key, value)
+    db.commit()
+    return job
+
+
+def test_enqueue_with_dedupe_key_is_idempotent(db):
+    _job(db, dedupe_key="same")
+    _job(db, dedupe_key="same")
+
+    assert db.query(Job).count() == 1
+
+
+def test_claim_takes_due_and_stale_jobs_only(db):
+    now = datetime.utcnow()
+    due = _job(db)
+    future = _job(db, run_after=now + timedelta(hours=1))
+    stale = _job(db, status=JOB_RUNNING, locked_at=now - timedelta(seconds=settings.job_lock_timeout_seconds + 1))
+    busy = _job(db, status=JOB_RUNNING, locked_at=now)
+
+    claimed = claim_jobs(db, limit=10)
+
+    assert {job["id"] for job in claimed} == {due.id, stale.id}
+    db.expire_all()
+    assert db.get(Job, due.id).status == JOB_RUNNING
+    assert db.get(Job, due.id).attempts == 1
+    assert db.get(Job, future.id).status == JOB_PENDING
+    assert db.get(Job, busy.id).attempts == 0
+
+
+@pytest.fixture
+def handlers(monkeypatch):
+    registered = {}
+    monkeypatch.setattr(job_queue, "_tasks", registered)
+    return registered
+
+
+def _run(db, job_id):
+    job = next(job for job in claim_jobs(db, limit=10) if job["id"] == job_id)
+    asyncio.run(run_job(job))
+    db.expire_all()
+    return db.get(Job, job_id)
+
+
+def test_failed_job_is_retried_with_exponential_backoff(db, handlers, monkeypatch):
+    monkeypatch.setattr(settings, "job_retry_base_seconds", 10.0)
+
+    async def fail(payload):
+        raise RuntimeError("boom")
+
+    handlers["test_job"] = (fail, None)
+    job = _job(db, max_attempts=5)
+
+    before = datetime.utcnow()
+    first = _run(db, job.id)
+    assert (first.status, first.attempts, first.last_error) == (JOB_PENDING, 1, "RuntimeError: boom")
+    assert first.run_after.replace(tzinfo=None) >= before + timedelta(seconds=10)
+
+    first.run_after = datetime.utcnow()
+    db.commit()
+    second = _run(db, job.id)
+    assert second.run_after.replace(tzinfo=None) >= before + timedelta(seconds=20)
+
+
+def test_successful_job_is_done(db, handlers):
+    seen = []
+
+    async def handle(payload):
+        seen.append(payload)
+
+    handlers["test_job"] = (handle, None)
+    job = _job(db)
+
+    assert _run(db, job.id).status == JOB_DONE
+    assert seen == [{"n": 1}]
+
+
+def test_pending_photo_is_marked_failed_after_last_attempt(db, handlers, monkeypatch):
+    handlers[photo_tasks.RESOLVE_PHOTO_LOCATION] = (photo_tasks.resolve_photo_location, photo_tasks._on_resolve_failure)
+
+    async def no_location(latitude, longitude, db=None):
+        return None
+
+    monkeypatch.setattr(photo_tasks, "get_city_and_country", no_location)
+    monkeypatch.setattr(settings, "job_max_attempts", 1)
+    photo = Photo(image_url="https://res.cloudinary.com/demo/image/upload/v1/p.jpg",
+                  latitude=0.0, longitude=-30.0, user_id=1, status=PHOTO_PENDING)
+    db.add(photo)
+    db.commit()
+    photo_tasks.enqueue_photo_resolution(db, photo.id)
+    db.commit()
+    job = db.query(Job).one()
+
+    assert _run(db, job.id).status == JOB_FAILED
+    assert db.get(Photo, photo.id).status == PHOTO_FAILED
+
+
+def test_background_enrichment_without_workers_is_reported(monkeypatch):
+    monkeypatch.setattr(settings, "photo_background_enrichment", True)
+    monkeypatch.setattr(settings, "job_workers", 0)
+    assert unconsumed_job_settings() == ["PHOTO_BACKGROUND_ENRICHMENT"]
+
+    monkeypatch.setattr(settings, "job_workers", 2)
+    assert unconsumed_job_settings() == []
@@ -0,0 +1,101 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.models.user import User
+from app.utils import last_login_utils
+from app.utils.last_login_utils import LastLoginBuffer, LastLoginFlusher
+
+T0 = datetime(2026, 1, 1, 12, 0, 0)
+
+
+@pytest.fixture
+def users(db):
+    db.add_all([User(id=1, username="ana", email="ana@example.com"),
+                User(id=2, username="bia", email="bia@example.com")])
+    db.commit()
+    return db
+
+
+def _last_login(db, user_id):
+    db.expire_all()
+    return db.get(User, user_id).last_login.replace(tzinfo=None)
+
+
+def test_logins_within_window_are_coalesced(users):
+    buffer = LastLoginBuffer(window_seconds=60, max_pending=100)
+
+    buffer.record(1, T0)
+    buffer.record(1, T0 + timedelta(seconds=30))
+    buffer.record(2, T0)
+
+    stats = buffer.stats()
+    assert (stats["recorded"], stats["coalesced"], stats["pending"]) == (2, 1, 2)
+    assert buffer.flush() == 2
+    assert _last_login(users, 1) == T0
+
+    # Fora da janela volta a ser registrado
+    buffer.record(1, T0 + timedelta(seconds=61))
+    assert buffer.flush() == 1
+    assert _last_login(users, 1) == T0 + timedelta(seconds=61)
+
+
+def test_flush_never_moves_last_login_backwards(users):
+    users.get(User, 1).last_login = T0
+    users.commit()
+    buffer = LastLoginBuffer(window_seconds=60, max_pending=100)
+
+    buffer.record(1, T0 - timedelta(hours=1))
+    buffer.flush()
+
+    assert _last_login(users, 1) == T0
+
+
+def test_failed_flush_keeps_the_batch(users, monkeypatch):
+    buffer = LastLoginBuffer(window_seconds=0, max_pending=100)
+    buffer.record(1, T0)
+    buffer.record(2, T0)
+
+    def fail(db, rows):
+        raise RuntimeError("database is down")
+
+    write = last_login_utils.write_last_logins
+    monkeypatch.setattr(last_login_utils, "write_last_logins", fail)
+    assert buffer.flush() == 0
+    # Um login mais novo chega enquanto o lote falhou: não pode ser sobrescrito pelo antigo
+    buffer.record(1, T0 + timedelta(minutes=5))
+    assert buffer.stats()["pending"] == 2
+    assert buffer.stats()["flush_failures"] == 1
+
+    monkeypatch.setattr(last_login_utils, "write_last_logins", write)
+    assert buffer.flush() == 2
+    assert _last_login(users, 1) == T0 + timedelta(minutes=5)
+    assert _last_login(users, 2) == T0
+
+
+def test_full_buffer_flushes_on_record(users):
+    buffer = LastLoginBuffer(window_seconds=60, max_pending=2)
+
+    buffer.record(1, T0)
+    buffer.record(2, T0)
+
+    assert buffer.stats()["pending"] == 0
+    assert _last_login(users, 2) == T0
+
+
+def test_flusher_writes_pending_logins_on_shutdown(users, monkeypatch):
+    buffer = LastLoginBuffer(window_seconds=60, max_pending=100)
+    monkeypatch.setattr(last_login_utils, "last_logins", buffer)
+
+    async def run():
+        # Intervalo longo: só o flush do stop grava
+        flusher = LastLoginFlusher(interval=3600)
+        flusher.start()
+        buffer.record(1, T0)
+        await flusher.stop()
+
+    asyncio.run(run())
+
+    assert buffer.stats()["pending"] == 0
+    assert _last_login(users, 1) == T0
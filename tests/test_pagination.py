@@ -0,0 +1,50 @@
+from app.models.photo import Photo
+from app.models.user import User
+
+
+def _add_photos(db, count):
+    for n in range(count):
+        db.add(Photo(image_url=f"https://res.cloudinary.com/demo/image/upload/v1/{n}.jpg",
+                     city_id=1, latitude=1.0, longitude=2.0, user_id=1))
+    db.commit()
+
+
+def test_photos_by_city_without_limit_returns_the_full_list(client, db):
+    _add_photos(db, 150)
+
+    response = client.get("/v1/api/photos/by_city/1")
+
+    assert response.status_code == 200
+    photos = response.json()
+    assert isinstance(photos, list) and len(photos) == 150
+    assert "x-next-cursor" not in response.headers
+
+
+def test_photos_by_city_pages_through_headers(client, db):
+    _add_photos(db, 5)
+
+    ids = []
+    params = {"limit": 2, "fields": "image_url"}
+    while True:
+        response = client.get("/v1/api/photos/by_city/1", params=params)
+        assert response.status_code == 200
+        ids += [photo["id"] for photo in response.json()]
+        cursor = response.headers.get("x-next-cursor")
+        if not cursor:
+            break
+        assert f"cursor={cursor}" in response.headers["link"]
+        params["cursor"] = cursor
+
+    assert ids == [1, 2, 3, 4, 5]
+
+
+def test_users_list_keeps_the_list_body(client, db):
+    for n in range(3):
+        db.add(User(username=f"user{n}", email=f"user{n}@example.com"))
+    db.commit()
+
+    response = client.get("/v1/api/users", params={"limit": 2})
+
+    assert [user["username"] for user in response.json()] == ["user0", "user1"]
+    assert response.headers["x-next-cursor"]
+    assert len(client.get("/v1/api/users").json()) == 3
@@ -0,0 +1,66 @@
+from app.models.city import City
+from app.models.photo import Photo
+from app.routers import photos as photos_router
+
+# Células (geohash) resolvidas pelo falso geocodificador; o resto fica sem cidade
+LISBON = (38.72, -9.14)
+PORTO = (41.15, -8.61)
+NOWHERE = (0.0, -30.0)
+
+
+def _fake_locations(monkeypatch):
+    known = {
+        photos_router.geocode_cell(*LISBON): ("Lisbon", "Portugal"),
+        photos_router.geocode_cell(*PORTO): ("Porto", "Portugal"),
+    }
+
+    async def resolve_cells(points, db=None):
+        return {cell: known.get(cell) for cell in points}
+
+    monkeypatch.setattr(photos_router, "resolve_cells", resolve_cells)
+
+
+def _item(n, point):
+    return {"image_url": f"https://res.cloudinary.com/demo/image/upload/v1/{n}.jpg",
+            "latitude": point[0], "longitude": point[1], "user_id": 7}
+
+
+def test_batch_results_follow_request_order(client, db, monkeypatch):
+    _fake_locations(monkeypatch)
+    points = [PORTO, LISBON, NOWHERE, PORTO, LISBON]
+
+    response = client.post("/v1/api/photos/batch", json={"items": [_item(n, p) for n, p in enumerate(points)]})
+
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["created"], body["failed"]) == (4, 1)
+    results = body["results"]
+    assert [r["index"] for r in results] == [0, 1, 2, 3, 4]
+    assert [r["status"] for r in results] == ["created", "created", "failed", "created", "created"]
+    # Cada item recebeu a própria foto (pela URL), não a de outra posição
+    for n, result in enumerate(results):
+        if result["status"] == "created":
+            assert result["photo"]["image_url"].endswith(f"/{n}.jpg")
+
+    cities = {city.name: city for city in db.query(City)}
+    assert set(cities) == {"Lisbon", "Porto"}
+    # Capa = primeira foto do lote em cada cidade
+    assert cities["Porto"].cover_photo_id == results[0]["photo"]["id"]
+    assert cities["Lisbon"].cover_photo_id == results[1]["photo"]["id"]
+
+
+def test_batch_failure_saves_nothing(client, db, monkeypatch):
+    _fake_locations(monkeypatch)
+
+    def fail(db, photos):
+        raise RuntimeError("stats table is locked")
+
+    monkeypatch.setattr(photos_router, "record_photos", fail)
+    response = client.post("/v1/api/photos/batch", json={"items": [_item(0, LISBON), _item(1, PORTO)]})
+
+    assert response.status_code == 200
+    assert response.json()["created"] == 0
+    assert {r["error"] for r in response.json()["results"]} == {"Error saving photo"}
+    db.expire_all()
+    assert db.query(Photo).count() == 0
+    assert db.query(City).count() == 0
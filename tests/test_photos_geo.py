@@ -0,0 +1,38 @@
+from app.models.photo import Photo
+from app.utils.geo_utils import PHOTO_GEOHASH_PRECISION, geohash_encode
+
+
+def _add_photos(db, points):
+    for photo_id, (latitude, longitude) in enumerate(points, 1):
+        db.add(Photo(
+            id=photo_id,
+            image_url=f"https://res.cloudinary.com/demo/image/upload/v1/{photo_id}.jpg",
+            latitude=latitude,
+            longitude=longitude,
+            geohash=geohash_encode(latitude, longitude, PHOTO_GEOHASH_PRECISION),
+        ))
+    db.commit()
+
+
+def test_within_orders_by_distance_across_antimeridian(client, db):
+    # Centro do retângulo 170..-170 é o próprio antimeridiano (0, 180)
+    _add_photos(db, [(0.0, 175.0), (0.0, -179.99), (0.0, 170.5), (0.0, -175.0)])
+
+    response = client.get("/v1/api/photos/within", params={
+        "min_lat": -5, "min_lon": 170, "max_lat": 5, "max_lon": -170, "limit": 3
+    })
+
+    assert response.status_code == 200
+    photos = response.json()
+    assert [p["longitude"] for p in photos] == [-179.99, 175.0, -175.0]
+    distances = [p["distance_km"] for p in photos]
+    assert distances == sorted(distances)
+
+
+def test_nearest_finds_photos_on_both_sides_of_antimeridian(client, db):
+    _add_photos(db, [(10.0, 179.95), (10.0, -179.95), (10.0, 170.0)])
+
+    response = client.get("/v1/api/photos/nearest", params={"lat": 10.0, "lon": 179.99, "limit": 2})
+
+    assert response.status_code == 200
+    assert [p["longitude"] for p in response.json()] == [179.95, -179.95]
@@ -0,0 +1,105 @@
+import asyncio
+import time
+
+import pytest
+
+from app.config.config import settings
+from app.utils.firebase_utils import set_token_verifier
+from app.utils.rate_limit_utils import InMemoryRateLimitBackend, RateLimit, RateLimitMiddleware, _client_buckets
+
+
+def _scope(forwarded: str = "", client: str = "10.0.0.1", token: str = "") -> dict:
+    headers = [(b"x-forwarded-for", forwarded.encode())] if forwarded else []
+    if token:
+        headers.append((b"authorization", f"Bearer {token}".encode()))
+    return {"type": "http", "method": "POST", "path": "/limited", "headers": headers, "client": (client, 1234)}
+
+
+def _keys(scope) -> list[str]:
+    return [key for key, _ in asyncio.run(_client_buckets(scope, RateLimit(2, 60)))]
+
+
+def test_forwarded_for_uses_entry_appended_by_trusted_proxy(monkeypatch):
+    monkeypatch.setattr(settings, "rate_limit_trusted_proxy_hops", 1)
+
+    # O cliente forja o primeiro IP; o proxy acrescenta o endereço real no fim
+    assert _keys(_scope("1.2.3.4, 203.0.113.7")) == ["ip:203.0.113.7"]
+    assert _keys(_scope("5.6.7.8, 203.0.113.7")) == ["ip:203.0.113.7"]
+
+
+def test_forwarded_for_counts_trusted_hops_from_the_right(monkeypatch):
+    monkeypatch.setattr(settings, "rate_limit_trusted_proxy_hops", 2)
+
+    assert _keys(_scope("1.2.3.4, 203.0.113.7, 10.1.1.1")) == ["ip:203.0.113.7"]
+
+
+def test_forwarded_for_ignored_without_trusted_proxies(monkeypatch):
+    monkeypatch.setattr(settings, "rate_limit_trusted_proxy_hops", 0)
+
+    assert _keys(_scope("1.2.3.4")) == ["ip:10.0.0.1"]
+
+
+def _call(middleware, scope) -> int:
+    statuses = []
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            statuses.append(message["status"])
+
+    asyncio.run(middleware(scope, receive, send))
+    return statuses[0]
+
+
+async def _ok_app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b""})
+
+
+@pytest.fixture
+def tokens():
+    # Token = uid; verificado pelo próprio middleware (não precisa estar no cache)
+    set_token_verifier(lambda token: {"uid": token, "exp": time.time() + 3600})
+    yield
+    set_token_verifier(None)
+
+
+def test_users_behind_one_ip_get_separate_quotas(monkeypatch, tokens):
+    monkeypatch.setattr(settings, "rate_limit_enabled", True)
+    middleware = RateLimitMiddleware(_ok_app, {"POST /limited": "2/minute"}, InMemoryRateLimitBackend())
+
+    assert [_call(middleware, _scope(token="uid-a")) for _ in range(3)] == [200, 200, 429]
+    assert [_call(middleware, _scope(token="uid-b")) for _ in range(3)] == [200, 200, 429]
+    # Anônimos no mesmo IP têm o próprio bucket
+    assert [_call(middleware, _scope()) for _ in range(3)] == [200, 200, 429]
+
+
+def test_same_user_changing_ip_is_limited(monkeypatch, tokens):
+    monkeypatch.setattr(settings, "rate_limit_enabled", True)
+    middleware = RateLimitMiddleware(_ok_app, {"POST /limited": "2/minute"}, InMemoryRateLimitBackend())
+
+    assert _call(middleware, _scope(client="10.0.0.2", token="uid-a")) == 200
+    assert _call(middleware, _scope(client="10.0.0.3", token="uid-a")) == 200
+    assert _call(middleware, _scope(client="10.0.0.4", token="uid-a")) == 429
+
+
+def test_one_ip_cycling_accounts_hits_the_shared_ip_bucket(monkeypatch, tokens):
+    monkeypatch.setattr(settings, "rate_limit_enabled", True)
+    monkeypatch.setattr(settings, "rate_limit_authenticated_ip_factor", 2)
+    middleware = RateLimitMiddleware(_ok_app, {"POST /limited": "2/minute"}, InMemoryRateLimitBackend())
+
+    statuses = [_call(middleware, _scope(token=f"uid-{n}")) for n in range(5)]
+    assert statuses == [200, 200, 200, 200, 429]
+
+
+def test_invalid_token_counts_as_anonymous(monkeypatch):
+    def reject(token):
+        raise ValueError("invalid token")
+
+    set_token_verifier(reject)
+    try:
+        assert _keys(_scope(token="forged")) == ["ip:10.0.0.1"]
+    finally:
+        set_token_verifier(None)
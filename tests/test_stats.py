@@ -0,0 +1,19 @@
+import pytest
+
+from app.config.config import settings
+
+
+@pytest.mark.parametrize("path", ["/v1/api/stats/db-pool", "/v1/api/stats/rate-limit", "/v1/api/stats/startup"])
+def test_stats_are_hidden_without_a_configured_token(client, monkeypatch, path):
+    monkeypatch.setattr(settings, "stats_token", None)
+
+    assert client.get(path, headers={"Authorization": "Bearer anything"}).status_code == 404
+
+
+def test_stats_require_the_token(client, monkeypatch):
+    monkeypatch.setattr(settings, "stats_token", "s3cret")
+
+    assert client.get("/v1/api/stats/db-pool").status_code == 401
+    assert client.get("/v1/api/stats/db-pool", headers={"Authorization": "Bearer wrong"}).status_code == 401
+    response = client.get("/v1/api/stats/db-pool", headers={"Authorization": "Bearer s3cret"})
+    assert response.status_code == 200
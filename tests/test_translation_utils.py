@@ -0,0 +1,37 @@
+import asyncio
+import time
+
+import httpx
+
+from app.config.config import settings
+from app.utils import translation_utils
+from app.utils.translation_utils import NominatimTranslationProvider
+
+
+def test_nominatim_calls_are_spaced_and_identified(monkeypatch):
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append((time.monotonic(), request.headers.get("user-agent")))
+        city = request.url.params["city"]
+        return httpx.Response(200, json=[{"namedetails": {"name:pt": f"{city} (pt)"}}])
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(translation_utils, "get_http_client", lambda: client)
+    monkeypatch.setattr(settings, "nominatim_min_interval_seconds", 0.05)
+    monkeypatch.setattr(settings, "nominatim_user_agent", "travelapp-tests (dev@example.com)")
+
+    async def translate_twice():
+        # Duas instâncias, como dois workers: o intervalo vale para o processo todo
+        return await asyncio.gather(
+            NominatimTranslationProvider().translate([("Lisbon", "Portugal"), ("Porto", "Portugal")], "pt"),
+            NominatimTranslationProvider().translate([("Tokyo", "Japan")], "pt"),
+        )
+
+    first, second = asyncio.run(translate_twice())
+
+    assert first == {("Lisbon", "Portugal"): "Lisbon (pt)", ("Porto", "Portugal"): "Porto (pt)"}
+    assert second == {("Tokyo", "Japan"): "Tokyo (pt)"}
+    assert {agent for _, agent in requests} == {"travelapp-tests (dev@example.com)"}
+    times = [at for at, _ in requests]
+    assert all(later - earlier >= 0.045 for earlier, later in zip(times, times[1:]))
@@ -0,0 +1,117 @@
+import time
+
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+from app.models.user import User
+from app.models.user_provider import UserProvider
+from app.utils import user_utils
+from app.utils.firebase_utils import set_token_verifier
+from app.utils.user_utils import unique_violation_field
+
+
+@pytest.fixture
+def tokens():
+    # Token = uid
+    set_token_verifier(lambda token: {"uid": token, "exp": time.time() + 3600})
+    yield
+    set_token_verifier(None)
+
+
+def _create(client, **body):
+    return client.post("/v1/api/users/create", json={"email": "ana@example.com", **body})
+
+
+def _create_from_firebase(client, uid, **body):
+    return client.post(
+        "/v1/api/users/create-from-firebase",
+        json={"email": f"{uid}@example.com", **body},
+        headers={"Authorization": f"Bearer {uid}"},
+    )
+
+
+def test_create_user_writes_user_and_provider(client, db):
+    response = _create(client, username="ana", firebase_uid="uid-ana")
+
+    assert response.status_code == 201
+    assert response.json()["username"] == "ana"
+    user_id = response.json()["user_id"]
+    assert db.get(User, user_id).email == "ana@example.com"
+    assert db.query(UserProvider).filter(UserProvider.user_id == user_id).count() == 1
+
+
+@pytest.mark.parametrize("duplicate, detail", [
+    ({"email": "ana@example.com", "username": "other", "firebase_uid": "uid-other"}, "Email already exists"),
+    ({"email": "other@example.com", "username": "ana", "firebase_uid": "uid-other"}, "Username already exists"),
+    ({"email": "other@example.com", "username": "other", "firebase_uid": "uid-ana"}, "Firebase UID already exists"),
+])
+def test_create_user_duplicates_are_rejected(client, db, duplicate, detail):
+    assert _create(client, username="ana", firebase_uid="uid-ana").status_code == 201
+
+    response = _create(client, **duplicate)
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == detail
+    assert db.query(User).count() == 1
+
+
+def test_create_from_firebase_duplicates_are_rejected(client, db, tokens):
+    assert _create_from_firebase(client, "uid-ana", username="ana").status_code == 201
+
+    same_uid = _create_from_firebase(client, "uid-ana", email="new@example.com", username="new")
+    same_email = _create_from_firebase(client, "uid-bia", email="uid-ana@example.com")
+    same_username = _create_from_firebase(client, "uid-bia", username="ana")
+
+    assert (same_uid.status_code, same_uid.json()["detail"]) == (400, "Firebase UID already exists")
+    assert (same_email.status_code, same_email.json()["detail"]) == (400, "Email already exists")
+    assert (same_username.status_code, same_username.json()["detail"]) == (400, "Username already exists")
+
+
+def test_generated_username_retries_with_suffix(client, db, tokens):
+    # Mesmo prefixo de uid (6 caracteres) gera o mesmo username base
+    first = _create_from_firebase(client, "abcdef-1")
+    second = _create_from_firebase(client, "abcdef-2")
+
+    assert first.status_code == second.status_code == 201
+    assert first.json()["username"] == "user_abcdef"
+    assert second.json()["username"].startswith("user_abcdef_")
+
+
+def test_generated_username_gives_up_after_attempts(client, db, tokens, monkeypatch):
+    monkeypatch.setattr(user_utils.secrets, "token_hex", lambda n: "0000")
+    assert _create_from_firebase(client, "abcdef-1").status_code == 201
+    assert _create_from_firebase(client, "abcdef-2").status_code == 201
+
+    response = _create_from_firebase(client, "abcdef-3")
+
+    assert response.status_code == 409
+    assert db.query(User).count() == 2
+
+
+def test_update_user_duplicate_username(client, db):
+    _create(client, username="ana", firebase_uid="uid-ana")
+    _create(client, email="bia@example.com", username="bia", firebase_uid="uid-bia")
+
+    response = client.patch("/v1/api/users/update", json={"username": "ana"}, headers={"firebase-uid": "uid-bia"})
+    assert (response.status_code, response.json()["detail"]) == (400, "Username already exists")
+
+    response = client.patch("/v1/api/users/update", json={"username": "bia2"}, headers={"firebase-uid": "uid-bia"})
+    assert (response.status_code, response.json()["username"]) == (200, "bia2")
+
+
+class _PostgresError(Exception):
+    def __init__(self, constraint_name):
+        super().__init__("duplicate key value violates unique constraint")
+        self.diag = type("Diag", (), {"constraint_name": constraint_name})()
+
+
+@pytest.mark.parametrize("constraint, field", [
+    ("ix_users_email", "email"),
+    ("ix_users_username", "username"),
+    ("ix_users_firebase_uid", "firebase_uid"),
+    ("users_pkey", None),
+])
+def test_unique_violation_field_uses_postgres_constraint_name(constraint, field):
+    error = IntegrityError("INSERT INTO users ...", {}, _PostgresError(constraint))
+
+    assert unique_violation_field(error) == field